@@ -145,6 +145,13 @@ STATIC_ROOT = "/vol/web/static"
 MEDIA_ROOT = "/vol/web/media"
 
 
+# Upload settings
+
+FILE_UPLOAD_PROBE_MAX_BYTES = int(
+    os.environ.get("FILE_UPLOAD_PROBE_MAX_BYTES", 1024 * 1024)
+)
+
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 
@@ -162,7 +169,7 @@ REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_AUTHENTICATION_CLASSES": (
         [
-            "rest_framework_simplejwt.authentication.JWTAuthentication",
+            "core.authentication.CachedJWTAuthentication",
         ]
     ),
 }
@@ -171,21 +178,105 @@ SPECTACULAR_SETTINGS = {
     "COMPONENT_SPLIT_REQUEST": True,
 }
 
+API_PAGE_SIZE = int(os.environ.get("API_PAGE_SIZE", 100))
+API_MAX_PAGE_SIZE = int(os.environ.get("API_MAX_PAGE_SIZE", 1000))
+
+
+# Server settings
+
+# "wsgi" serves the app with uWSGI, "asgi" with uvicorn, where the image
+# views run as coroutines (scripts/run.sh).
+SERVER_MODE = os.environ.get("SERVER_MODE", "wsgi")
+ASYNC_VIEW_THREADS = int(os.environ.get("ASYNC_VIEW_THREADS", 32))
+
 
 # Cache settings
 
-# CACHES = {
-#     "default": {
-#         "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
-#         "LOCATION": "/var/tmp/django_cache",
-#         "TIMEOUT": 30,
-#         "OPTIONS": {"MAX_ENTRIES": 1000},
-#     }
-# }
+# Local memory is per process; processes and containers that should see each
+# other's invalidations need a shared backend, e.g. FileBasedCache on a
+# shared volume or Redis.
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("CACHE_LOCATION", "image-resizer"),
+        "TIMEOUT": int(os.environ.get("CACHE_TIMEOUT", 300)),
+        "OPTIONS": {"MAX_ENTRIES": int(os.environ.get("CACHE_MAX_ENTRIES", 1000))},
+    }
+}
+
+RESPONSE_CACHE_ALIAS = "default"
+RESPONSE_CACHE_SECONDS = int(os.environ.get("RESPONSE_CACHE_SECONDS", 60))
+RESPONSE_CACHE_LOCK_SECONDS = int(os.environ.get("RESPONSE_CACHE_LOCK_SECONDS", 5))
+
+
+# Resized images cache settings
+
+RESIZED_CACHE_MAX_PER_IMAGE = int(os.environ.get("RESIZED_CACHE_MAX_PER_IMAGE", 20))
+
+# Seconds clients may keep the bytes of an ephemeral resize.
+RESIZE_EPHEMERAL_MAX_AGE = int(os.environ.get("RESIZE_EPHEMERAL_MAX_AGE", 3600))
+
+RESIZE_BATCH_MAX_SIZES = int(os.environ.get("RESIZE_BATCH_MAX_SIZES", 16))
+
+IMAGE_PYRAMID_LEVELS = int(os.environ.get("IMAGE_PYRAMID_LEVELS", 0))
 
-# CACHE_MIDDLEWARE_ALIAS = "default"
-# CACHE_MIDDLEWARE_SECONDS = 15
-# CACHE_MIDDLEWARE_KEY_PREFIX = ""
+RESIZE_NEGOTIATED_FORMATS = os.environ.get(
+    "RESIZE_NEGOTIATED_FORMATS", "AVIF,WEBP"
+).split(",")
+
+
+# Resize presets settings
+
+RESIZE_PRESETS = {
+    "thumb": {"width": 160, "height": None, "quality": 70, "format": "WEBP"},
+    "card": {"width": 640, "height": None, "quality": 80, "format": "WEBP"},
+    "hero": {"width": 1920, "height": None, "quality": 85, "format": "JPEG"},
+}
+RESIZE_PRESETS_EAGER = os.environ.get("RESIZE_PRESETS_EAGER", "1") == "1"
+
+
+# Pixel budget settings
+
+IMAGE_MAX_SOURCE_PIXELS = int(os.environ.get("IMAGE_MAX_SOURCE_PIXELS", 100_000_000))
+IMAGE_MAX_TARGET_PIXELS = int(os.environ.get("IMAGE_MAX_TARGET_PIXELS", 40_000_000))
+RESIZE_MEMORY_BUDGET = int(os.environ.get("RESIZE_MEMORY_BUDGET", 2 * 1024**3))
+RESIZE_BUDGET_RETRY_AFTER = int(os.environ.get("RESIZE_BUDGET_RETRY_AFTER", 2))
+RESIZE_BUDGET_OVERFLOW = os.environ.get("RESIZE_BUDGET_OVERFLOW", "reject")
+RESIZE_STRIP_THRESHOLD_PIXELS = int(
+    os.environ.get("RESIZE_STRIP_THRESHOLD_PIXELS", 50_000_000)
+)
+
+
+# Resize executor settings
+
+RESIZE_EXECUTOR_WORKERS = int(
+    os.environ.get("RESIZE_EXECUTOR_WORKERS", os.cpu_count() or 1)
+)
+# Web worker processes started by run.sh, sharing the executor limits.
+RESIZE_WEB_WORKERS = int(os.environ.get("RESIZE_WEB_WORKERS", 4))
+RESIZE_EXECUTOR_NAME = os.environ.get("RESIZE_EXECUTOR_NAME", "image-resizer")
+RESIZE_EXECUTOR_QUEUE_SIZE = int(os.environ.get("RESIZE_EXECUTOR_QUEUE_SIZE", 8))
+RESIZE_EXECUTOR_RETRY_AFTER = int(os.environ.get("RESIZE_EXECUTOR_RETRY_AFTER", 5))
+RESIZE_EXECUTOR_START_METHOD = os.environ.get("RESIZE_EXECUTOR_START_METHOD", "fork")
+# "process" or "thread". Forking a pool from a threaded ASGI worker can
+# deadlock, so ASGI mode uses threads unless told otherwise.
+RESIZE_EXECUTOR_BACKEND = os.environ.get(
+    "RESIZE_EXECUTOR_BACKEND", "thread" if SERVER_MODE == "asgi" else "process"
+)
+# Total for the decoded caches of every resizing process on the host.
+RESIZE_DECODED_CACHE_BYTES = int(
+    os.environ.get("RESIZE_DECODED_CACHE_BYTES", 256 * 1024**2)
+)
+
+
+# Shared decoded cache settings
+
+# Needs /dev/shm larger than RESIZE_SHARED_CACHE_BYTES, 0 turns it off.
+RESIZE_SHARED_CACHE_NAME = os.environ.get("RESIZE_SHARED_CACHE_NAME", "image-resizer")
+RESIZE_SHARED_CACHE_BYTES = int(os.environ.get("RESIZE_SHARED_CACHE_BYTES", 0))
+RESIZE_SHARED_CACHE_SLOTS = int(os.environ.get("RESIZE_SHARED_CACHE_SLOTS", 256))
 
 
 # JWT settings
@@ -194,3 +285,9 @@ SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
 }
+
+# Users resolved from tokens are cached per process and checked against a
+# version per user kept in a cache backend shared by every process.
+AUTH_USER_CACHE_ALIAS = "default"
+AUTH_USER_CACHE_SECONDS = int(os.environ.get("AUTH_USER_CACHE_SECONDS", 30))
+AUTH_USER_CACHE_SIZE = int(os.environ.get("AUTH_USER_CACHE_SIZE", 1024))
@@ -64,6 +64,33 @@ class UserAdmin(BaseUserAdmin):
     )
 
 
+class ImageAdmin(admin.ModelAdmin):
+    """Define the admin pages for images."""
+
+    ordering = ["-id"]
+    list_display = ["__str__", "user", "resolution", "format", "size"]
+    list_select_related = ["user"]
+    raw_id_fields = ["user"]
+
+    @admin.display(description="Resolution")
+    def resolution(self, obj):
+        return f"{obj.width}x{obj.height}px"
+
+
+class ResizedAdmin(admin.ModelAdmin):
+    """Define the admin pages for resized images. Rows name their image, so
+    the changelist joins it instead of loading it per row."""
+
+    ordering = ["-id"]
+    list_display = ["__str__", "user", "resolution", "format", "quality", "size"]
+    list_select_related = ["image", "user"]
+    raw_id_fields = ["user", "image"]
+
+    @admin.display(description="Resolution")
+    def resolution(self, obj):
+        return f"{obj.width}x{obj.height}px"
+
+
 admin.site.register(models.User, UserAdmin)
-admin.site.register(models.Image)
-admin.site.register(models.Resized)
+admin.site.register(models.Image, ImageAdmin)
+admin.site.register(models.Resized, ResizedAdmin)
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        import PIL.Image
+        from django.conf import settings
+
+        from core import signals  # noqa: F401
+
+        # Pillow refuses to open images over twice this limit.
+        PIL.Image.MAX_IMAGE_PIXELS = settings.IMAGE_MAX_SOURCE_PIXELS
@@ -0,0 +1,156 @@
+"""
+JWT authentication with a per-process cache of users.
+
+Every authenticated request used to load its user twice: JWTMiddleware
+checked that the user of the cookie token exists and JWTAuthentication
+loaded it again. Both now go through get_user, which keeps the field values
+of recently seen users in a bounded LRU cache for AUTH_USER_CACHE_SECONDS,
+so repeated requests of a user run no authentication queries. Every call
+builds a new User from those values, so a view changing request.user never
+changes the cached copy.
+
+Each entry is stored with the version of its user kept in the
+AUTH_USER_CACHE_ALIAS cache backend, which every process of the deployment
+shares. Saving or deleting a user replaces that version (core.signals), so
+every process drops its entry on the next lookup. Versions are random
+tokens, like the generations of the response cache. Writes that send no
+signals, such as queryset updates, are seen once the entry expires.
+"""
+
+import time
+import uuid
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import router
+from django.contrib.auth import get_user_model
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+
+def user_version_key(user_id):
+    return f"auth:{user_id}:version"
+
+
+def get_user_version(user_id):
+    """Return the shared version of a user, starting one if needed."""
+
+    cache = caches[settings.AUTH_USER_CACHE_ALIAS]
+    version = cache.get(user_version_key(user_id))
+    if version is None:
+        cache.add(user_version_key(user_id), uuid.uuid4().hex, None)
+        version = cache.get(user_version_key(user_id))
+
+    return version
+
+
+def bump_user_version(user_id):
+    """Invalidate the cached entries of a user in every process."""
+
+    caches[settings.AUTH_USER_CACHE_ALIAS].set(
+        user_version_key(user_id), uuid.uuid4().hex, None
+    )
+
+
+class UserCache:
+    """LRU cache of user field values that expire after a fixed time or when
+    the shared version of their user changes."""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id, version):
+        """Return the cached values of a user, or None when they are missing,
+        expired or cached at another version."""
+
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            values, expires, cached_version = entry
+            if expires <= time.monotonic() or cached_version != version:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return values
+
+    def put(self, user_id, values, version):
+        """Cache the values of a user read at a version, evicting the least
+        recently used entries above the size limit."""
+
+        max_entries = settings.AUTH_USER_CACHE_SIZE
+        seconds = settings.AUTH_USER_CACHE_SECONDS
+        if max_entries <= 0 or seconds <= 0:
+            return
+
+        with self._lock:
+            self._entries[user_id] = (values, time.monotonic() + seconds, version)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, user_id):
+        """Drop the entry of a user in this process and every other one."""
+
+        bump_user_version(user_id)
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = UserCache()
+
+
+def get_user_cache():
+    """Return the user cache of the current process."""
+
+    return _cache
+
+
+def get_user(user_id):
+    """Return the user of an id, from the cache when possible. Raises
+    User.DoesNotExist when there is no such user."""
+
+    user_model = get_user_model()
+    fields = [field.attname for field in user_model._meta.concrete_fields]
+
+    # The version is read before the user, so a change made in between is
+    # cached under the old version and dropped by the next lookup.
+    version = get_user_version(user_id)
+    values = _cache.get(user_id, version)
+    if values is not None:
+        return user_model.from_db(router.db_for_read(user_model), fields, values)
+
+    user = user_model.objects.get(id=user_id)
+    _cache.put(user_id, tuple(getattr(user, field) for field in fields), version)
+
+    return user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWT authentication resolving users through the user cache."""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        try:
+            user = get_user(user_id)
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        return user
@@ -0,0 +1,90 @@
+"""
+Django command to create the preset derivatives of existing images.
+"""
+
+import os
+import multiprocessing
+from itertools import groupby
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.models import Image
+from core.utils.functions import generate_presets, generate_presets_batch
+
+
+def backfill_images(image_ids):
+    """Create the missing presets of images with the same width, height and
+    format and return their ids."""
+
+    images = list(Image.objects.select_related("user").filter(id__in=image_ids))
+    if len(images) > 1:
+        generate_presets_batch(images)
+    else:
+        for image in images:
+            generate_presets(image)
+
+    return image_ids
+
+
+def batch_image_ids(batch_size):
+    """Return lists of up to batch_size ids of images with the same width,
+    height and format."""
+
+    rows = Image.objects.order_by("width", "height", "format", "id").values_list(
+        "width", "height", "format", "id"
+    )
+    batches = []
+    for _, group in groupby(rows, key=lambda row: row[:3]):
+        image_ids = [row[3] for row in group]
+        for start in range(0, len(image_ids), batch_size):
+            batches.append(image_ids[start:][:batch_size])
+
+    return batches
+
+
+class Command(BaseCommand):
+    """Django command creating the RESIZE_PRESETS derivatives of existing
+    images in a pool of processes. With --batch-size above 1, images with the
+    same width, height and format are resized together in one executor job."""
+
+    help = "Create the preset derivatives of existing images."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Number of worker processes, 1 runs in this process.",
+        )
+        parser.add_argument("--chunksize", type=int, default=1)
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1,
+            help="Maximum number of same-shape images resized together in "
+            "one executor job, 1 resizes every image on its own.",
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+
+        batches = batch_image_ids(max(1, options["batch_size"]))
+        count = sum(len(image_ids) for image_ids in batches)
+        self.stdout.write(f"Backfilling presets of {count} images...")
+
+        if options["processes"] > 1:
+            # Forked workers must open their own database connections.
+            connections.close_all()
+            with multiprocessing.get_context("fork").Pool(options["processes"]) as pool:
+                done = pool.imap_unordered(
+                    backfill_images, batches, options["chunksize"]
+                )
+                for image_ids in done:
+                    self.stdout.write(f"Images {image_ids} done.")
+        else:
+            for image_ids in batches:
+                backfill_images(image_ids)
+                self.stdout.write(f"Images {image_ids} done.")
+
+        self.stdout.write(self.style.SUCCESS("Presets backfilled!"))
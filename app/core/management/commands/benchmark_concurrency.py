@@ -0,0 +1,205 @@
+"""
+Django command to benchmark concurrent resizes under uWSGI and uvicorn.
+"""
+
+import os
+import time
+import shutil
+import socket
+import signal
+import itertools
+import subprocess
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.models import Image, Resized
+from core.management.commands.benchmark_downscale import create_source
+
+SERVERS = {
+    "wsgi": (
+        "uwsgi",
+        [
+            "--http",
+            "127.0.0.1:{port}",
+            "--workers",
+            "{workers}",
+            "--master",
+            "--enable-threads",
+            "--module",
+            "app.wsgi",
+        ],
+    ),
+    "asgi": (
+        "uvicorn",
+        [
+            "app.asgi:application",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            "{port}",
+            "--workers",
+            "{workers}",
+        ],
+    ),
+}
+
+
+def free_port():
+    """Return a TCP port nobody listens on."""
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values, fraction):
+    """Return the value below which a fraction of the sorted values fall."""
+
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    """Django command starting the app under each server mode, as run.sh
+    does, and firing concurrent on the fly resizes at it. Every request asks
+    for a new width, so each one resizes instead of hitting the cache."""
+
+    help = "Benchmark concurrent resize throughput of uWSGI against uvicorn."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--modes", nargs="+", default=["wsgi", "asgi"])
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--concurrency", type=int, nargs="+", default=[4, 16, 64])
+        parser.add_argument("--requests", type=int, default=128)
+        parser.add_argument("--width", type=int, default=3000)
+        parser.add_argument("--height", type=int, default=2000)
+        parser.add_argument("--startup-timeout", type=float, default=30)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+
+        for mode in options["modes"]:
+            if mode not in SERVERS:
+                raise CommandError(f"Unknown mode {mode}.")
+            if not shutil.which(SERVERS[mode][0]):
+                raise CommandError(f"{SERVERS[mode][0]} is not installed.")
+
+        width, height = options["width"], options["height"]
+        user = get_user_model().objects.create_user(
+            email=f"benchmark-{os.getpid()}@example.com",
+            name=f"benchmark-{os.getpid()}",
+            password=None,
+        )
+        data = create_source(width, height, "JPEG")
+        image = Image.objects.create(
+            user=user,
+            image=ContentFile(data, name="benchmark.jpg"),
+            name="benchmark.jpg",
+            width=width,
+            height=height,
+            format="JPEG",
+            size=len(data),
+        )
+        self.token = str(AccessToken.for_user(user))
+        self.path = reverse("image:resized-get", args=[image.id])
+        self.widths = itertools.count(100)
+
+        self.stdout.write(f"JPEG {width}x{height}, {options['workers']} workers")
+        try:
+            for mode in options["modes"]:
+                self.benchmark(mode, options)
+        finally:
+            for resized in Resized.objects.filter(user=user):
+                resized.delete()
+            image.delete()
+            user.delete()
+
+    def benchmark(self, mode, options):
+        """Start the server of a mode and report each concurrency level."""
+
+        port = free_port()
+        command, arguments = SERVERS[mode]
+        server = subprocess.Popen(
+            [command]
+            + [
+                argument.format(port=port, workers=options["workers"])
+                for argument in arguments
+            ],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, "SERVER_MODE": mode},
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        try:
+            self.wait_until_up(port, options["startup_timeout"])
+            for concurrency in options["concurrency"]:
+                rate, p50, p95, errors = self.run_level(
+                    port, concurrency, options["requests"]
+                )
+                self.stdout.write(
+                    f"  {mode} x{concurrency}: {rate:.1f} requests/s, "
+                    f"p50 {p50 * 1000:.0f} ms, p95 {p95 * 1000:.0f} ms, "
+                    f"{errors} errors"
+                )
+        finally:
+            # uWSGI reloads on SIGTERM; both servers stop on SIGINT.
+            os.killpg(server.pid, signal.SIGINT)
+            server.wait()
+
+    def wait_until_up(self, port, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                self.request(port, next(self.widths))
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError(f"Server on port {port} did not start.")
+
+    def request(self, port, width):
+        """Resize to a width and return the status code."""
+
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{port}{self.path}?width={width}",
+            headers={"Authorization": f"Bearer {self.token}"},
+        )
+        try:
+            with urllib.request.urlopen(request) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as error:
+            return error.code
+
+    def run_level(self, port, concurrency, count):
+        """Fire count requests at a concurrency and return the throughput,
+        the median and 95th percentile latency and the failed requests."""
+
+        def timed(width):
+            start = time.perf_counter()
+            code = self.request(port, width)
+            return time.perf_counter() - start, code
+
+        widths = [next(self.widths) for _ in range(count)]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(timed, widths))
+        elapsed = time.perf_counter() - start
+
+        latencies = sorted(latency for latency, _ in results)
+        errors = sum(1 for _, code in results if code != 200)
+
+        return (
+            count / elapsed,
+            percentile(latencies, 0.5),
+            percentile(latencies, 0.95),
+            errors,
+        )
@@ -0,0 +1,91 @@
+"""
+Django command to benchmark the fast downscale path against a full resize.
+"""
+
+import time
+from io import BytesIO
+
+import PIL.Image
+import PIL.ImageChops
+import PIL.ImageStat
+
+from django.core.management.base import BaseCommand
+
+from core.utils import processing
+
+
+def create_source(width, height, format):
+    """Create and return an encoded noisy gradient image."""
+
+    gradient = PIL.Image.radial_gradient("L").resize((width, height))
+    noise = PIL.Image.effect_noise((width, height), 24)
+    img = PIL.Image.merge(
+        "RGB",
+        (
+            gradient,
+            PIL.ImageChops.blend(gradient, noise, 0.3),
+            gradient.transpose(PIL.Image.FLIP_TOP_BOTTOM),
+        ),
+    )
+    buffer = BytesIO()
+    img.save(buffer, format=format, quality=90)
+
+    return buffer.getvalue()
+
+
+def best_time(function, repeat):
+    """Return the result and the best wall time of a function."""
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+
+    return result, min(timings)
+
+
+class Command(BaseCommand):
+    """Django command comparing processing.decode/downscale with a plain
+    full-resolution PIL.Image.open(...).resize(...)."""
+
+    help = "Benchmark the fast downscale path against a full resize."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--width", type=int, default=6000)
+        parser.add_argument("--height", type=int, default=4000)
+        parser.add_argument("--targets", type=int, nargs="+", default=[300, 1200])
+        parser.add_argument("--formats", nargs="+", default=["JPEG", "PNG"])
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+
+        width, height = options["width"], options["height"]
+        for format in options["formats"]:
+            data = create_source(width, height, format)
+            self.stdout.write(f"{format} {width}x{height}, {len(data)} bytes")
+
+            for new_width in options["targets"]:
+                new_height = max(1, int(height * new_width / width))
+
+                def full():
+                    return PIL.Image.open(BytesIO(data)).resize((new_width, new_height))
+
+                def fast():
+                    img = processing.decode(BytesIO(data), new_width, new_height)
+                    return processing.downscale(img, new_width, new_height)
+
+                reference, full_time = best_time(full, options["repeat"])
+                result, fast_time = best_time(fast, options["repeat"])
+                difference = PIL.ImageStat.Stat(
+                    PIL.ImageChops.difference(reference, result)
+                ).mean
+                error = sum(difference) / len(difference)
+
+                self.stdout.write(
+                    f"  {new_width}x{new_height}: full {full_time * 1000:.1f}ms, "
+                    f"fast {fast_time * 1000:.1f}ms, "
+                    f"speedup {full_time / fast_time:.1f}x, "
+                    f"mean error {error:.2f} (max {processing.MAX_MEAN_ERROR})"
+                )
@@ -0,0 +1,59 @@
+"""
+Django command to benchmark output formats on a fixed image corpus.
+"""
+
+import time
+import random
+
+from django.core.management.base import BaseCommand
+
+from core.utils import processing
+from core.management.commands.benchmark_downscale import create_source
+
+
+class Command(BaseCommand):
+    """Django command comparing encoded size and encode time of the output
+    formats against JPEG on a seeded synthetic corpus."""
+
+    help = "Benchmark the output formats on a fixed image corpus."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--images", type=int, default=8)
+        parser.add_argument("--width", type=int, default=1200)
+        parser.add_argument("--quality", type=int, default=75)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--formats", nargs="+", default=list(processing.OUTPUT_FORMATS)
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+
+        generator = random.Random(options["seed"])
+        corpus = []
+        for _ in range(options["images"]):
+            height = generator.randrange(options["width"] // 2, options["width"])
+            data = create_source(options["width"], height, "PNG")
+            corpus.append(processing.decode(data, options["width"], height))
+
+        results = {}
+        for format in options["formats"]:
+            if not processing.can_encode(format):
+                self.stdout.write(f"{format}: skipped, no encoder available")
+                continue
+
+            size = 0
+            start = time.perf_counter()
+            for img in corpus:
+                size += len(
+                    processing.encode(img, format, options["quality"]).getvalue()
+                )
+            results[format] = (size, time.perf_counter() - start)
+
+        baseline = results.get("JPEG", (None,))[0]
+        for format, (size, duration) in results.items():
+            ratio = f", {size / baseline * 100:.1f}% of JPEG" if baseline else ""
+            self.stdout.write(
+                f"{format}: {size} bytes{ratio}, "
+                f"{duration * 1000 / len(corpus):.1f}ms per image"
+            )
@@ -0,0 +1,50 @@
+"""
+Django command to run queued resize jobs.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.utils.functions import process_next_resize_job
+
+
+class Command(BaseCommand):
+    """Django command pulling resize jobs from the database queue. Any number
+    of workers can run next to each other."""
+
+    help = "Run queued resize jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit when the queue is empty or the host is busy instead of "
+            "polling.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=1.0,
+            help="Seconds to wait when the queue is empty or the host is busy.",
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        self.stdout.write("Waiting for resize jobs...")
+
+        while True:
+            job = process_next_resize_job()
+
+            if job and job.status != job.PENDING:
+                self.stdout.write(f"Resize job {job.id} {job.status}.")
+                continue
+            if job:
+                self.stdout.write(f"Resize job {job.id} deferred, the host is busy.")
+
+            if options["once"]:
+                break
+
+            time.sleep(options["sleep"])
+
+        self.stdout.write(self.style.SUCCESS("Resize queue empty!"))
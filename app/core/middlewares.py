@@ -1,54 +1,106 @@
 import time
 import base64
+import asyncio
 from binascii import Error
 
+from asgiref.sync import sync_to_async
+
 from django.shortcuts import redirect
 from django.http import Http404
-from django.contrib.auth import get_user_model
 from core.models import User
 
 from rest_framework_simplejwt.tokens import AccessToken, RefreshToken, TokenError
 
+from core.authentication import get_user
 from core.utils.functions import set_cookies, delete_cookies
 from core.utils import constants
 
 
-class JWTMiddleware:
-    """Middleware for checking, validating and updating jwt tokens
-    in httponly cookies."""
+class AsyncCapableMiddleware:
+    """Base of middlewares running without a thread switch in both sync and
+    async chains. Subclasses implement __call__ and __acall__."""
+
+    sync_capable = True
+    async_capable = True
 
     def __init__(self, get_response):
         self.get_response = get_response
+        if asyncio.iscoroutinefunction(self.get_response):
+            # Mark the instance as a coroutine function for Django's handler.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+        else:
+            self._is_coroutine = None
+
+
+class JWTMiddleware(AsyncCapableMiddleware):
+    """Middleware for checking, validating and updating jwt tokens
+    in httponly cookies."""
 
     def __call__(self, request):
+        if self._is_coroutine:
+            return self.__acall__(request)
+
+        access_token = request.COOKIES.get(constants.ACCESS_TOKEN, None)
+        refresh_token = request.COOKIES.get(constants.REFRESH_TOKEN, None)
+
+        if not access_token and not refresh_token:
+            return self.get_response(request)
+
+        tokens = self.authenticate(request, access_token, refresh_token)
         response = self.get_response(request)
+
+        return self.update_cookies(response, tokens)
+
+    async def __acall__(self, request):
         access_token = request.COOKIES.get(constants.ACCESS_TOKEN, None)
         refresh_token = request.COOKIES.get(constants.REFRESH_TOKEN, None)
 
         if not access_token and not refresh_token:
-            return response
+            return await self.get_response(request)
 
-        if not access_token:
+        tokens = await sync_to_async(self.authenticate)(
+            request, access_token, refresh_token
+        )
+        response = await self.get_response(request)
+
+        return self.update_cookies(response, tokens)
+
+    def update_cookies(self, response, tokens):
+        """Delete the cookies or set refreshed ones as authenticate
+        decided."""
+
+        if tokens is None:
             return delete_cookies(response)
 
+        if tokens:
+            set_cookies(response, *tokens)
+
+        return response
+
+    def authenticate(self, request, access_token, refresh_token):
+        """Validate the cookie tokens and inject the authorization header
+        before the view runs. Returns an empty tuple when the access token
+        is valid, a fresh (access, refresh) pair when it was refreshed and
+        None when the cookies should be deleted."""
+
+        if not access_token:
+            return None
+
         try:
             access_token_decoded = AccessToken(access_token)
-            get_user_model().objects.get(id=access_token_decoded.payload.get("user_id"))
+            get_user(access_token_decoded.payload.get("user_id"))
             request.META["HTTP_AUTHORIZATION"] = f"Bearer {access_token_decoded}"
-            auth_response = self.get_response(request)
 
-            return auth_response
+            return ()
 
         except TokenError:
             if not refresh_token:
-                return delete_cookies(response)
+                return None
 
             try:
                 decoded_refresh_token = RefreshToken(refresh_token)
 
-                user = get_user_model().objects.get(
-                    id=decoded_refresh_token.payload.get("user_id")
-                )
+                user = get_user(decoded_refresh_token.payload.get("user_id"))
                 user_id = user.id
                 refresh_token = RefreshToken()
                 access_token = AccessToken()
@@ -57,33 +109,40 @@ class JWTMiddleware:
 
                 request.META["HTTP_AUTHORIZATION"] = f"Bearer {access_token}"
 
-                auth_response = self.get_response(request)
-
-                set_cookies(auth_response, access_token, refresh_token)
+                return access_token, refresh_token
 
-                return auth_response
-
-            except TokenError:
-                return delete_cookies(response)
+            except (TokenError, User.DoesNotExist):
+                return None
         except User.DoesNotExist:
-            return delete_cookies(response)
+            return None
 
 
-class ExpiringLinkMiddleware:
+class ExpiringLinkMiddleware(AsyncCapableMiddleware):
     """Middleware for handling expiring links."""
 
-    def __init__(self, get_response):
-        self.get_response = get_response
-
     def __call__(self, request):
+        if self._is_coroutine:
+            return self.__acall__(request)
+
         if request.GET.get("exp") == "1":
-            if link := self.decode_link(request):
-                return redirect(link)
-            raise Http404("Invalid or expired link.")
+            return self.redirect_link(request)
 
         response = self.get_response(request)
         return response
 
+    async def __acall__(self, request):
+        if request.GET.get("exp") == "1":
+            return self.redirect_link(request)
+
+        return await self.get_response(request)
+
+    def redirect_link(self, request):
+        """Redirect an expiring link to its path while it is valid."""
+
+        if link := self.decode_link(request):
+            return redirect(link)
+        raise Http404("Invalid or expired link.")
+
     def decode_link(self, request):
         """URL decoding method."""
         try:
@@ -0,0 +1,22 @@
+# Generated by Django 4.1.13 on 2026-10-18 00:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0009_alter_resized_image"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="resized",
+            name="cache_key",
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="resized",
+            index=models.Index(fields=["cache_key"], name="resized_cache_key_idx"),
+        ),
+    ]
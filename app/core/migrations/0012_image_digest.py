@@ -0,0 +1,22 @@
+# Generated by Django 4.1.13 on 2026-10-18 00:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0011_resizejob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="image",
+            name="digest",
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="image",
+            index=models.Index(fields=["user", "digest"], name="image_digest_idx"),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.1.13 on 2026-10-18 00:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0012_image_digest"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="resized",
+            name="format",
+            field=models.TextField(max_length=4, null=True),
+        ),
+        migrations.AddField(
+            model_name="resizejob",
+            name="format",
+            field=models.TextField(max_length=4, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.13 on 2026-10-18 00:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0013_resized_format"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="resizejob",
+            name="max_bytes",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
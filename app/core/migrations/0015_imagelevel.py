@@ -0,0 +1,68 @@
+# Generated by Django 4.1.13 on 2026-10-18 01:00
+
+import core.models
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0014_resizejob_max_bytes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImageLevel",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "level",
+                    models.PositiveSmallIntegerField(
+                        validators=[django.core.validators.MinValueValidator(1)]
+                    ),
+                ),
+                (
+                    "level_image",
+                    models.ImageField(
+                        upload_to=core.models.image_file_path,
+                        validators=[
+                            django.core.validators.validate_image_file_extension
+                        ],
+                    ),
+                ),
+                (
+                    "width",
+                    models.PositiveIntegerField(
+                        validators=[django.core.validators.MinValueValidator(1)]
+                    ),
+                ),
+                (
+                    "height",
+                    models.PositiveIntegerField(
+                        validators=[django.core.validators.MinValueValidator(1)]
+                    ),
+                ),
+                (
+                    "image",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="levels",
+                        to="core.image",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["level"],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.1.13 on 2026-10-18 01:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0015_imagelevel"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="image",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="resized",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.1.13 on 2026-10-18 01:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0016_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="image",
+            index=models.Index(fields=["user", "id"], name="image_user_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="resized",
+            index=models.Index(fields=["user", "id"], name="resized_user_id_idx"),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.1.13 on 2026-10-18 02:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0017_user_id_indexes"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="resizejob",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("done", "Done"),
+                    ("failed", "Failed"),
+                ],
+                default="pending",
+                max_length=7,
+            ),
+        ),
+    ]
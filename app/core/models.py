@@ -93,6 +93,14 @@ class Image(models.Model):
     format = models.TextField(max_length=4)
     size = models.PositiveIntegerField(validators=[MinValueValidator(1)])
     description = models.TextField(max_length=255, null=True)
+    digest = models.CharField(max_length=64, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "digest"], name="image_digest_idx"),
+            models.Index(fields=["user", "id"], name="image_user_id_idx"),
+        ]
 
     def __str__(self):
         return f"{self.id}. {self.name}"
@@ -101,10 +109,61 @@ class Image(models.Model):
         return "original"
 
     def delete(self, *args, **kwargs):
-        os.remove(self.image.path)
+        """Delete the image, removing the stored file with its last reference."""
+
+        shared = (
+            self.digest
+            and Image.objects.filter(
+                user_id=self.user_id, digest=self.digest, image=self.image.name
+            )
+            .exclude(id=self.id)
+            .exists()
+        )
+        if not shared:
+            os.remove(self.image.path)
+        for level in self.levels.all():
+            level.delete()
         return super(Image, self).delete(*args, **kwargs)
 
 
+class ImageLevel(models.Model):
+    """Pyramid level model, a downscaled copy of an image used as a resize
+    source."""
+
+    image = models.ForeignKey("Image", on_delete=models.CASCADE, related_name="levels")
+    level = models.PositiveSmallIntegerField(validators=[MinValueValidator(1)])
+    level_image = models.ImageField(
+        upload_to=image_file_path, validators=[validate_image_file_extension]
+    )
+    width = models.PositiveIntegerField(validators=[MinValueValidator(1)])
+    height = models.PositiveIntegerField(validators=[MinValueValidator(1)])
+
+    class Meta:
+        ordering = ["level"]
+
+    def __str__(self):
+        return f"{self.id}. {self.image.name} level {self.level}"
+
+    def __repr__(self):
+        return "level"
+
+    @property
+    def user(self):
+        return self.image.user
+
+    def delete(self, *args, **kwargs):
+        """Delete the level, removing the stored file with its last reference."""
+
+        shared = (
+            ImageLevel.objects.filter(level_image=self.level_image.name)
+            .exclude(id=self.id)
+            .exists()
+        )
+        if not shared:
+            os.remove(self.level_image.path)
+        return super(ImageLevel, self).delete(*args, **kwargs)
+
+
 class Resized(models.Model):
     """Resized image model."""
 
@@ -119,6 +178,15 @@ class Resized(models.Model):
     width = models.PositiveIntegerField(validators=[MinValueValidator(1)])
     height = models.PositiveIntegerField(validators=[MinValueValidator(1)])
     size = models.PositiveIntegerField(validators=[MinValueValidator(1)])
+    format = models.TextField(max_length=4, null=True)
+    cache_key = models.CharField(max_length=64, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["cache_key"], name="resized_cache_key_idx"),
+            models.Index(fields=["user", "id"], name="resized_user_id_idx"),
+        ]
 
     def __str__(self):
         return f"{self.id}. {self.image.name}"
@@ -129,3 +197,39 @@ class Resized(models.Model):
     def delete(self, *args, **kwargs):
         os.remove(self.resized_image.path)
         return super(Resized, self).delete(*args, **kwargs)
+
+
+class ResizeJob(models.Model):
+    """Queued resize job model. A job stays pending while it runs, its row
+    locked by the worker running it."""
+
+    PENDING = "pending"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    user = models.ForeignKey("User", on_delete=models.CASCADE)
+    image = models.ForeignKey("Image", on_delete=models.CASCADE)
+    resized = models.ForeignKey("Resized", on_delete=models.SET_NULL, null=True)
+    quality = models.PositiveIntegerField(
+        validators=[MinValueValidator(1), MaxValueValidator(100)]
+    )
+    width = models.PositiveIntegerField(validators=[MinValueValidator(1)])
+    height = models.PositiveIntegerField(validators=[MinValueValidator(1)])
+    format = models.TextField(max_length=4, null=True)
+    max_bytes = models.PositiveIntegerField(null=True, blank=True)
+    cache_key = models.CharField(max_length=64, null=True, blank=True)
+    status = models.CharField(max_length=7, choices=STATUS_CHOICES, default=PENDING)
+    error = models.TextField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "id"], name="resizejob_status_idx")]
+
+    def __str__(self):
+        return f"{self.id}. {self.status}"
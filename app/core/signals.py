@@ -0,0 +1,35 @@
+"""
+Signal receivers of the core app.
+"""
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from core.models import User, Image, Resized
+from core.authentication import get_user_cache
+from core.utils.response_cache import bump_generation
+
+
+@receiver(post_save, sender=Image)
+@receiver(post_delete, sender=Image)
+@receiver(post_save, sender=Resized)
+@receiver(post_delete, sender=Resized)
+def invalidate_user_responses(sender, instance, **kwargs):
+    """Drop the cached responses of the owner of a changed row."""
+
+    bump_generation(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def invalidate_owner_responses(sender, instance, **kwargs):
+    """Drop the cached responses showing the name of a changed user."""
+
+    bump_generation(instance.id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Drop a changed or deleted user from the authentication cache."""
+
+    get_user_cache().discard(instance.id)
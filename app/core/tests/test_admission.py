@@ -0,0 +1,99 @@
+"""
+Tests for pixel budget admission control.
+"""
+
+import secrets
+import multiprocessing
+
+from django.test import SimpleTestCase, override_settings
+
+from core.utils import admission
+from core.utils.exceptions import BudgetExceeded, ImageTooLarge
+
+
+class PixelBudgetTests(SimpleTestCase):
+    """Test reserving and releasing the pixel budget."""
+
+    def test_reservation_released(self):
+        """Test a reservation is returned to the budget on exit."""
+
+        budget = admission.PixelBudget(100, 3)
+
+        with budget.reserve(60):
+            self.assertEqual(budget.stats()["in_use"], 60)
+
+        self.assertEqual(budget.stats()["in_use"], 0)
+        self.assertEqual(budget.stats()["peak"], 60)
+
+    def test_full_budget_rejects(self):
+        """Test a reservation above the free budget is rejected."""
+
+        budget = admission.PixelBudget(100, 3)
+
+        with budget.reserve(60):
+            with self.assertRaises(BudgetExceeded) as context:
+                with budget.reserve(60):
+                    pass
+
+        self.assertEqual(context.exception.retry_after, 3)
+        self.assertEqual(budget.stats()["rejected"], 1)
+        self.assertEqual(budget.stats()["in_use"], 0)
+
+    def test_budget_shared_by_processes(self):
+        """Test reservations of other processes on the host use up the
+        budget of the same name."""
+
+        name = f"test-{secrets.token_hex(8)}"
+        budget = admission.PixelBudget(100, 3, name)
+        context = multiprocessing.get_context("fork")
+        reserved, release = context.Event(), context.Event()
+
+        def hold():
+            with admission.PixelBudget(100, 3, name).reserve(60):
+                reserved.set()
+                release.wait(10)
+
+        process = context.Process(target=hold)
+        process.start()
+        try:
+            reserved.wait(10)
+            in_use = budget.stats()["in_use"]
+            with self.assertRaises(BudgetExceeded):
+                with budget.reserve(60):
+                    pass
+        finally:
+            release.set()
+            process.join(10)
+
+        self.assertEqual(in_use, 60)
+        with budget.reserve(60):
+            self.assertEqual(budget.stats()["in_use"], 60)
+
+    def test_cost_above_limit_is_too_large(self):
+        """Test a reservation above the whole budget is never admitted."""
+
+        budget = admission.PixelBudget(100, 3)
+
+        with self.assertRaises(ImageTooLarge):
+            with budget.reserve(101):
+                pass
+
+    def test_estimate_accounts_for_draft(self):
+        """Test JPEG sources are priced at their reduced decode size."""
+
+        jpeg = admission.estimate_cost(6000, 4000, "JPEG", [(300, 200)])
+        png = admission.estimate_cost(6000, 4000, "PNG", [(300, 200)])
+
+        self.assertEqual(jpeg, (750 * 500 + 2 * 300 * 200) * 4)
+        self.assertEqual(png, (6000 * 4000 + 2 * 300 * 200) * 4)
+
+    @override_settings(IMAGE_MAX_SOURCE_PIXELS=100, IMAGE_MAX_TARGET_PIXELS=50)
+    def test_check_pixels(self):
+        """Test the source and target pixel limits."""
+
+        admission.check_pixels(10, 10, [(5, 10)])
+
+        with self.assertRaises(ImageTooLarge):
+            admission.check_pixels(11, 10)
+        with self.assertRaises(ImageTooLarge):
+            admission.check_pixels(10, 10, [(10, 10)])
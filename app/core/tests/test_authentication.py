@@ -0,0 +1,139 @@
+"""
+Tests for the cached JWT authentication.
+"""
+
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core import authentication
+from core.authentication import get_user, get_user_cache
+from core.utils import constants
+
+ME_URL = reverse("user:me")
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    """Test users are resolved from the cache and dropped on changes."""
+
+    def setUp(self):
+        get_user_cache().clear()
+        self.user = get_user_model().objects.create_user(
+            email="test@example.com",
+            name="test",
+            password="test1234",
+        )
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}"
+        )
+
+    def tearDown(self):
+        get_user_cache().clear()
+
+    def test_cached_user_runs_no_queries(self):
+        """Test a repeated request authenticates without queries."""
+
+        self.client.get(ME_URL)
+        with self.assertNumQueries(0):
+            response = self.client.get(ME_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["name"], "test")
+
+    def test_cookie_and_header_share_user(self):
+        """Test the middleware and the view resolve the cookie user once."""
+
+        client = APIClient()
+        client.cookies[constants.ACCESS_TOKEN] = str(AccessToken.for_user(self.user))
+
+        with self.assertNumQueries(1):
+            response = client.get(ME_URL)
+        with self.assertNumQueries(0):
+            client.get(ME_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_update_drops_user(self):
+        """Test updating the user is seen by the next request."""
+
+        self.client.get(ME_URL)
+        response = self.client.patch(
+            ME_URL, "name=new", content_type="application/x-www-form-urlencoded"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(ME_URL)
+
+        self.assertEqual(response.data["name"], "new")
+
+    def test_deactivated_user_is_rejected(self):
+        """Test a user deactivated after being cached is rejected."""
+
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.client.get(ME_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_user_is_rejected(self):
+        """Test a user deleted after being cached is rejected."""
+
+        self.client.get(ME_URL)
+        self.client.delete(ME_URL)
+
+        response = self.client.get(ME_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_change_in_other_process_drops_user(self):
+        """Test a user changed by another process, which only replaces the
+        shared version of the user, is loaded again."""
+
+        get_user(self.user.id)
+        get_user_model().objects.filter(id=self.user.id).update(name="new")
+        authentication.bump_user_version(self.user.id)
+
+        with self.assertNumQueries(1):
+            user = get_user(self.user.id)
+
+        self.assertEqual(user.name, "new")
+
+    def test_entry_expires(self):
+        """Test a cached user is loaded again after the time limit."""
+
+        get_user(self.user.id)
+        with patch.object(authentication.time, "monotonic", return_value=1e12):
+            with self.assertNumQueries(1):
+                get_user(self.user.id)
+
+    @override_settings(AUTH_USER_CACHE_SIZE=1)
+    def test_size_is_bounded(self):
+        """Test the least recently used user is evicted above the limit."""
+
+        other = get_user_model().objects.create_user(
+            email="other@example.com",
+            name="other",
+            password="test1234",
+        )
+        get_user(self.user.id)
+        get_user(other.id)
+
+        with self.assertNumQueries(1):
+            get_user(self.user.id)
+
+    def test_cached_users_are_copies(self):
+        """Test changing a returned user leaves the cached one as it was."""
+
+        get_user(self.user.id).name = "changed"
+
+        self.assertEqual(get_user(self.user.id).name, "test")
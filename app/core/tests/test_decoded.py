@@ -0,0 +1,243 @@
+"""
+Tests for the decoded source cache.
+"""
+
+import os
+import tempfile
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core import models
+from core.utils import decoded, processing
+from core.utils.decoded import DecodedCache, get_decoded_cache
+from core.utils.executor import ResizeExecutor
+
+IMAGE_URL = reverse("image:image-list")
+METRICS_URL = reverse("image:metrics")
+RESIZED_CREATE_URL = reverse("image:resized-create")
+
+
+class DecodedCacheTests(SimpleTestCase):
+    """Test the LRU cache of decoded images."""
+
+    def test_least_recently_used_is_evicted(self):
+        """Test entries are evicted in LRU order to stay under the cap."""
+
+        cache = DecodedCache(100)
+        cache.put("a", 1, 40)
+        cache.put("b", 2, 40)
+        cache.get("a")
+        cache.put("c", 3, 40)
+
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+        stats = cache.stats()
+        self.assertEqual(stats["bytes"], 80)
+        self.assertEqual(stats["evictions"], 1)
+        self.assertEqual((stats["hits"], stats["misses"]), (3, 1))
+
+    def test_entry_above_cap_is_not_cached(self):
+        """Test an entry larger than the cap keeps the others."""
+
+        cache = DecodedCache(100)
+        cache.put("a", 1, 40)
+
+        self.assertFalse(cache.put("b", 2, 101))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.stats()["evictions"], 0)
+
+    def test_resize_evicts_above_new_cap(self):
+        """Test lowering the cap evicts entries."""
+
+        cache = DecodedCache(100)
+        cache.put("a", 1, 40)
+        cache.put("b", 2, 40)
+        cache.resize(50)
+
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("b"), 2)
+
+    def test_fits_rejects_entry(self):
+        """Test an entry failing fits is a miss."""
+
+        cache = DecodedCache(100)
+        cache.put("a", 1, 40)
+
+        self.assertIsNone(cache.get("a", lambda value: value > 1))
+        self.assertEqual(cache.stats()["misses"], 1)
+
+
+class DecodeCachedTests(SimpleTestCase):
+    """Test decoding through the cache."""
+
+    def setUp(self):
+        self.cache = get_decoded_cache()
+        self.cache.clear()
+        self.cache.resize(64 * 1024**2)
+        image_file = tempfile.NamedTemporaryFile(suffix=".jpg", delete=False)
+        Image.new("RGB", (1600, 1200), "red").save(image_file, format="JPEG")
+        image_file.close()
+        self.path = image_file.name
+
+    def tearDown(self):
+        self.cache.clear()
+        self.cache.resize(0)
+        os.remove(self.path)
+
+    def test_second_size_skips_decode(self):
+        """Test a smaller size reuses the decoded image."""
+
+        processing.render(self.path, [(400, 300, 80, None)], "JPEG")
+        with patch.object(
+            processing, "decode", wraps=processing.decode
+        ) as patched_decode:
+            [(data, _)] = processing.render(self.path, [(200, 150, 80, None)], "JPEG")
+
+        patched_decode.assert_not_called()
+        self.assertIsNotNone(data)
+
+    def test_larger_size_decodes_again(self):
+        """Test a draft decoded image is not used for a larger size."""
+
+        processing.render(self.path, [(100, 75, 80, None)], "JPEG")
+        with patch.object(
+            processing, "decode", wraps=processing.decode
+        ) as patched_decode:
+            processing.render(self.path, [(1200, 900, 80, None)], "JPEG")
+
+        patched_decode.assert_called_once()
+
+    def test_modified_file_decodes_again(self):
+        """Test a file with a new modification time is not served stale."""
+
+        processing.render(self.path, [(400, 300, 80, None)], "JPEG")
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        with patch.object(
+            processing, "decode", wraps=processing.decode
+        ) as patched_decode:
+            processing.render(self.path, [(400, 300, 80, None)], "JPEG")
+
+        patched_decode.assert_called_once()
+
+
+class DecodedCacheAPITests(TestCase):
+    """Test the decoded cache through the API."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_superuser(
+            email="admin@example.com",
+            name="admin",
+            password="test1234",
+        )
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        for resized in models.Resized.objects.filter(user=self.user):
+            resized.delete()
+        for image in models.Image.objects.filter(user=self.user):
+            image.delete()
+
+    @override_settings(RESIZE_EXECUTOR_WORKERS=0, RESIZE_PRESETS_EAGER=False)
+    def test_sizes_of_one_image_hit_cache(self):
+        """Test resizes of one image share a decode and report it."""
+
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as image_file:
+            Image.new("RGB", (400, 200)).save(image_file, format="JPEG")
+            image_file.seek(0)
+            response = self.client.post(
+                IMAGE_URL, {"image": image_file}, format="multipart"
+            )
+        url = reverse("image:resized-get", args=[response.data["id"]])
+
+        for width in (100, 80, 60):
+            response = self.client.get(f"{url}?width={width}", HTTP_HOST="testserver")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(METRICS_URL)
+
+        stats = response.data["decoded_cache"]
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hits"], 2)
+        self.assertEqual(stats["entries"], 1)
+
+    @override_settings(RESIZE_EXECUTOR_WORKERS=0, RESIZE_PRESETS_EAGER=False)
+    def test_uploads_skip_cache(self):
+        """Test resizing an upload leaves the decoded cache to stored images."""
+
+        cache = DecodedCache(64 * 1024**2)
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as image_file, patch.object(
+            decoded, "_cache", cache
+        ):
+            Image.new("RGB", (400, 200)).save(image_file, format="JPEG")
+            image_file.seek(0)
+            response = self.client.post(
+                f"{RESIZED_CREATE_URL}?width=100",
+                {"image": image_file},
+                format="multipart",
+                HTTP_HOST="testserver",
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(cache.stats()["entries"], 0)
+        self.assertEqual(cache.stats()["misses"], 0)
+
+    def test_pool_processes_report_counters(self):
+        """Test counters of pool processes are summed."""
+
+        executor = ResizeExecutor(1, 1, 5, cache_bytes=1024)
+        try:
+            executor.run(os.getpid)
+        finally:
+            executor.reset_pool()
+
+        stats = executor.cache_stats()
+        self.assertEqual(stats["processes"], 1)
+        self.assertEqual(stats["max_bytes"], 1024)
+
+    def test_sizes_of_one_image_hit_cache_in_pool(self):
+        """Test every size of a stored image is resized by the same pool
+        process, whose decoded cache serves all but the first."""
+
+        executor = ResizeExecutor(4, 1, 5, cache_bytes=64 * 1024**2)
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as image_file, patch.object(
+            decoded, "_cache", DecodedCache()
+        ):
+            Image.new("RGB", (400, 200)).save(image_file, format="JPEG")
+            image_file.flush()
+            try:
+                for width in (100, 80, 60, 40):
+                    processed = executor.run(
+                        processing.render,
+                        image_file.name,
+                        [(width, width // 2, 80, None)],
+                        "JPEG",
+                    )
+                    self.assertEqual(len(processed), 1)
+            finally:
+                executor.reset_pool()
+
+        stats = executor.cache_stats()
+        self.assertEqual(stats["processes"], 1)
+        self.assertEqual((stats["misses"], stats["hits"]), (1, 3))
+
+    def test_cap_split_between_processes(self):
+        """Test the cache cap is shared by every process keeping a cache."""
+
+        process = ResizeExecutor(8, 1, 5, cache_bytes=1024, web_workers=4)
+        thread = ResizeExecutor(
+            8, 1, 5, cache_bytes=1024, backend="thread", web_workers=4
+        )
+
+        self.assertEqual(process.process_cache_bytes, 128)
+        self.assertEqual(thread.process_cache_bytes, 256)
+        self.assertEqual(process.cache_stats()["max_bytes"], 1024)
@@ -0,0 +1,233 @@
+"""
+Tests for the resize executor.
+"""
+
+import os
+import time
+import secrets
+import threading
+import tempfile
+import multiprocessing
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core import models
+from core.utils.exceptions import ExecutorBusy
+from core.utils.executor import ResizeExecutor, get_executor
+
+IMAGE_URL = reverse("image:image-list")
+METRICS_URL = reverse("image:metrics")
+
+
+def wait_for(condition, timeout=5):
+    """Wait until condition returns True."""
+
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Condition not met in time.")
+        time.sleep(0.01)
+
+
+def hold_job(name, release):
+    """Run a job in an executor named name until release is set, like a web
+    worker process of the host resizing a large image."""
+
+    executor = ResizeExecutor(1, 1, 5, backend="thread", name=name)
+    try:
+        executor.run(release.wait, 10)
+    finally:
+        executor.reset_pool()
+
+
+class WebWorkers:
+    """Context manager starting processes that each hold a job of the
+    executor named name."""
+
+    def __init__(self, name, count):
+        context = multiprocessing.get_context("fork")
+        self.release = context.Event()
+        self.processes = [
+            context.Process(target=hold_job, args=(name, self.release))
+            for _ in range(count)
+        ]
+
+    def __enter__(self):
+        for process in self.processes:
+            process.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release.set()
+        for process in self.processes:
+            process.join(10)
+
+
+class ExecutorTests(SimpleTestCase):
+    """Test the bounded resize executor."""
+
+    def test_run_in_pool(self):
+        """Test jobs run in a separate process."""
+
+        executor = ResizeExecutor(1, 1, 5)
+        try:
+            pid = executor.run(os.getpid)
+        finally:
+            executor.reset_pool()
+
+        self.assertNotEqual(pid, os.getpid())
+
+    def test_run_in_thread_pool(self):
+        """Test the thread backend runs jobs in its threads of the process."""
+
+        executor = ResizeExecutor(2, 1, 5, backend="thread")
+        try:
+            pid, name = executor.run(
+                lambda: (os.getpid(), threading.current_thread().name)
+            )
+        finally:
+            executor.reset_pool()
+
+        self.assertEqual(pid, os.getpid())
+        self.assertTrue(name.startswith("resize"))
+        self.assertEqual(executor.stats()["backend"], "thread")
+
+    def test_full_queue_raises_busy(self):
+        """Test jobs above the queue size are rejected immediately."""
+
+        executor = ResizeExecutor(0, 1, 7)
+        started = threading.Event()
+        release = threading.Event()
+
+        def blocking():
+            started.set()
+            release.wait(5)
+
+        worker = threading.Thread(target=executor.run, args=(blocking,))
+        worker.start()
+        started.wait(5)
+
+        second_worker = threading.Thread(target=executor.run, args=(lambda: None,))
+        second_worker.start()
+        wait_for(lambda: executor.stats()["queue_depth"] == 1)
+
+        with self.assertRaises(ExecutorBusy) as context:
+            executor.run(lambda: None)
+        stats = executor.stats()
+
+        release.set()
+        worker.join()
+        second_worker.join()
+
+        self.assertEqual(context.exception.retry_after, 7)
+        self.assertEqual(stats["running"], 1)
+        self.assertEqual(stats["queue_depth"], 1)
+        self.assertEqual(stats["utilization"], 1)
+        self.assertEqual(stats["rejected"], 1)
+        self.assertEqual(executor.stats()["queue_depth"], 0)
+
+    def test_queue_is_shared_by_web_workers(self):
+        """Test jobs of other processes fill the queue of the host."""
+
+        name = f"test-{secrets.token_hex(8)}"
+        executor = ResizeExecutor(1, 1, 5, backend="thread", name=name)
+
+        with WebWorkers(name, 2):
+            wait_for(lambda: executor.stats()["queue_depth"] == 1)
+            with self.assertRaises(ExecutorBusy):
+                executor.run(lambda: None)
+            stats = executor.stats()
+
+        self.assertEqual(stats["running"], 1)
+        self.assertEqual(stats["rejected"], 1)
+        self.assertEqual(executor.run(lambda: 1), 1)
+
+    def test_pool_split_across_web_workers(self):
+        """Test each web worker gets its share of the cores."""
+
+        self.assertEqual(ResizeExecutor(8, 1, 5, web_workers=4).pool_size, 2)
+        self.assertEqual(ResizeExecutor(2, 1, 5, web_workers=4).pool_size, 1)
+        self.assertEqual(ResizeExecutor(0, 1, 5, web_workers=4).pool_size, 1)
+
+
+class ExecutorAPITests(TestCase):
+    """Test the executor through the API."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_superuser(
+            email="admin@example.com",
+            name="admin",
+            password="test1234",
+        )
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        for resized in models.Resized.objects.filter(user=self.user):
+            resized.delete()
+        for image in models.Image.objects.filter(user=self.user):
+            image.delete()
+
+    def test_busy_executor_returns_503(self):
+        """Test a full queue returns 503 with Retry-After."""
+
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as image_file:
+            Image.new("RGB", (40, 20)).save(image_file, format="JPEG")
+            image_file.seek(0)
+            response = self.client.post(
+                IMAGE_URL, {"image": image_file}, format="multipart"
+            )
+        url = reverse("image:resized-get", args=[response.data["id"]])
+
+        with patch.object(
+            ResizeExecutor, "run", side_effect=ExecutorBusy(retry_after=3)
+        ):
+            response = self.client.get(f"{url}?width=10", HTTP_HOST="testserver")
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response["Retry-After"], "3")
+        self.assertEqual(models.Resized.objects.count(), 0)
+
+    def test_busy_web_workers_return_503(self):
+        """Test a resize returns 503 when the jobs of the other web worker
+        processes fill the queue of the host."""
+
+        name = f"test-{secrets.token_hex(8)}"
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as image_file:
+            Image.new("RGB", (40, 20)).save(image_file, format="JPEG")
+            image_file.seek(0)
+            response = self.client.post(
+                IMAGE_URL, {"image": image_file}, format="multipart"
+            )
+        url = reverse("image:resized-get", args=[response.data["id"]])
+
+        with override_settings(
+            RESIZE_EXECUTOR_WORKERS=1,
+            RESIZE_EXECUTOR_QUEUE_SIZE=1,
+            RESIZE_EXECUTOR_RETRY_AFTER=3,
+            RESIZE_EXECUTOR_BACKEND="thread",
+            RESIZE_EXECUTOR_NAME=name,
+        ), WebWorkers(name, 2):
+            wait_for(lambda: get_executor().stats()["queue_depth"] == 1)
+            response = self.client.get(f"{url}?width=10", HTTP_HOST="testserver")
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response["Retry-After"], "3")
+        self.assertEqual(models.Resized.objects.count(), 0)
+
+    def test_metrics(self):
+        """Test the executor state is exposed to admins."""
+
+        response = self.client.get(METRICS_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("queue_depth", response.data["executor"])
+        self.assertIn("utilization", response.data["executor"])
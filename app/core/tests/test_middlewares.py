@@ -0,0 +1,173 @@
+"""
+Tests for custom middlewares.
+"""
+
+import asyncio
+
+from asgiref.sync import async_to_sync
+
+from django.test import TestCase, RequestFactory
+from django.http import HttpResponse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from core.middlewares import JWTMiddleware, ExpiringLinkMiddleware
+from core.utils import constants
+
+
+class CountingView:
+    """Fake downstream chain counting its invocations and writing a row."""
+
+    def __init__(self):
+        self.calls = 0
+        self.authorization = None
+
+    def __call__(self, request):
+        self.calls += 1
+        self.authorization = request.META.get("HTTP_AUTHORIZATION")
+        get_user_model().objects.create_user(
+            email=f"written{self.calls}@example.com",
+            name=f"written{self.calls}",
+            password="test1234",
+        )
+        return HttpResponse()
+
+
+class JWTMiddlewareTests(TestCase):
+    """Test that the JWT middleware runs the view exactly once."""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.user = get_user_model().objects.create_user(
+            email="test@example.com",
+            name="test",
+            password="test1234",
+        )
+        self.view = CountingView()
+        self.middleware = JWTMiddleware(self.view)
+
+    def _call(self, **cookies):
+        request = self.factory.get("/")
+        request.COOKIES.update(cookies)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.middleware(request)
+        inserts = [q for q in queries if q["sql"].startswith("INSERT")]
+        return response, len(inserts)
+
+    def test_no_cookies_runs_view_once(self):
+        """Test a request without cookies runs the view once."""
+
+        response, inserts = self._call()
+
+        self.assertEqual(self.view.calls, 1)
+        self.assertEqual(inserts, 1)
+        self.assertIsNone(self.view.authorization)
+
+    def test_valid_access_token_runs_view_once(self):
+        """Test a valid access cookie authenticates and runs the view once."""
+
+        access = AccessToken.for_user(self.user)
+        response, inserts = self._call(**{constants.ACCESS_TOKEN: str(access)})
+
+        self.assertEqual(self.view.calls, 1)
+        self.assertEqual(inserts, 1)
+        self.assertEqual(self.view.authorization, f"Bearer {access}")
+        self.assertNotIn(constants.ACCESS_TOKEN, response.cookies)
+
+    def test_expired_access_token_refreshes_and_runs_view_once(self):
+        """Test an invalid access cookie is refreshed before the view runs."""
+
+        refresh = RefreshToken.for_user(self.user)
+        response, inserts = self._call(
+            **{
+                constants.ACCESS_TOKEN: "invalid",
+                constants.REFRESH_TOKEN: str(refresh),
+            }
+        )
+
+        self.assertEqual(self.view.calls, 1)
+        self.assertEqual(inserts, 1)
+        self.assertTrue(self.view.authorization.startswith("Bearer "))
+        self.assertTrue(response.cookies[constants.ACCESS_TOKEN].value)
+        self.assertTrue(response.cookies[constants.REFRESH_TOKEN].value)
+
+    def test_invalid_tokens_delete_cookies_and_run_view_once(self):
+        """Test invalid cookies are deleted and the view runs once."""
+
+        response, inserts = self._call(
+            **{
+                constants.ACCESS_TOKEN: "invalid",
+                constants.REFRESH_TOKEN: "invalid",
+            }
+        )
+
+        self.assertEqual(self.view.calls, 1)
+        self.assertEqual(inserts, 1)
+        self.assertIsNone(self.view.authorization)
+        self.assertEqual(response.cookies[constants.ACCESS_TOKEN].value, "")
+
+    def test_refresh_only_deletes_cookies_and_runs_view_once(self):
+        """Test a missing access cookie deletes cookies and runs the view once."""
+
+        refresh = RefreshToken.for_user(self.user)
+        response, inserts = self._call(**{constants.REFRESH_TOKEN: str(refresh)})
+
+        self.assertEqual(self.view.calls, 1)
+        self.assertEqual(inserts, 1)
+        self.assertEqual(response.cookies[constants.REFRESH_TOKEN].value, "")
+
+
+class AsyncMiddlewareTests(TestCase):
+    """Test the middlewares run in async chains without adapting them."""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.user = get_user_model().objects.create_user(
+            email="test@example.com",
+            name="test",
+            password="test1234",
+        )
+        self.requests = []
+
+    async def get_response(self, request):
+        self.requests.append(request)
+        return HttpResponse()
+
+    def test_async_chain_makes_coroutines(self):
+        """Test the middlewares are coroutine functions in async chains only."""
+
+        for middleware_class in (JWTMiddleware, ExpiringLinkMiddleware):
+            self.assertTrue(
+                asyncio.iscoroutinefunction(middleware_class(self.get_response))
+            )
+            self.assertFalse(
+                asyncio.iscoroutinefunction(middleware_class(lambda request: None))
+            )
+
+    def test_async_access_token_authenticates(self):
+        """Test a valid access cookie authenticates in an async chain."""
+
+        access = AccessToken.for_user(self.user)
+        request = self.factory.get("/")
+        request.COOKIES[constants.ACCESS_TOKEN] = str(access)
+
+        response = async_to_sync(JWTMiddleware(self.get_response))(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.requests[0].META["HTTP_AUTHORIZATION"], f"Bearer {access}"
+        )
+
+    def test_async_invalid_tokens_delete_cookies(self):
+        """Test invalid cookies are deleted in an async chain."""
+
+        request = self.factory.get("/")
+        request.COOKIES[constants.ACCESS_TOKEN] = "invalid"
+
+        response = async_to_sync(JWTMiddleware(self.get_response))(request)
+
+        self.assertEqual(response.cookies[constants.ACCESS_TOKEN].value, "")
+        self.assertNotIn("HTTP_AUTHORIZATION", self.requests[0].META)
@@ -0,0 +1,119 @@
+"""
+Tests for image processing functions.
+"""
+
+from io import BytesIO
+
+import PIL.Image
+import PIL.ImageChops
+import PIL.ImageStat
+
+from django.test import SimpleTestCase
+
+from core.utils import processing
+
+
+def create_photo(width, height, format="JPEG"):
+    """Create and return an encoded image with smooth gradients."""
+
+    img = PIL.Image.radial_gradient("L").resize((width, height))
+    img = PIL.Image.merge("RGB", (img, img.transpose(PIL.Image.FLIP_LEFT_RIGHT), img))
+    buffer = BytesIO()
+    img.save(buffer, format=format, quality=90)
+    buffer.seek(0)
+
+    return buffer
+
+
+def mean_error(img_1, img_2):
+    """Return the mean absolute difference per channel of two images."""
+
+    difference = PIL.ImageChops.difference(img_1, img_2)
+
+    return sum(PIL.ImageStat.Stat(difference).mean) / len(difference.getbands())
+
+
+class ProcessingTests(SimpleTestCase):
+    """Test the fast downscale path."""
+
+    def test_jpeg_is_draft_decoded_for_downscale(self):
+        """Test a JPEG source is decoded at a reduced scale."""
+
+        img = processing.decode(create_photo(1600, 1200), 100, 75)
+
+        self.assertLess(img.size[0], 1600)
+        self.assertGreaterEqual(img.size[0], 100 * processing.REDUCING_GAP)
+        self.assertGreaterEqual(img.size[1], 75 * processing.REDUCING_GAP)
+
+    def test_jpeg_is_fully_decoded_for_small_ratio(self):
+        """Test a JPEG source is decoded in full when barely downscaled."""
+
+        img = processing.decode(create_photo(1600, 1200), 1200, 900)
+
+        self.assertEqual(img.size, (1600, 1200))
+
+    def test_png_is_fully_decoded(self):
+        """Test non JPEG sources are decoded in full."""
+
+        img = processing.decode(create_photo(1600, 1200, "PNG"), 100, 75)
+
+        self.assertEqual(img.size, (1600, 1200))
+
+    def test_fast_downscale_within_tolerance(self):
+        """Test the fast path stays within the documented tolerance."""
+
+        for format in ("JPEG", "PNG"):
+            source = create_photo(1600, 1200, format)
+            reference = PIL.Image.open(source).resize((150, 112))
+            source.seek(0)
+            img = processing.decode(source, 150, 112)
+            fast = processing.downscale(img, 150, 112)
+
+            self.assertEqual(fast.size, (150, 112))
+            self.assertLessEqual(mean_error(reference, fast), processing.MAX_MEAN_ERROR)
+
+    def test_upscale_uses_plain_resize(self):
+        """Test upscaling keeps working."""
+
+        img = processing.decode(create_photo(100, 50), 400, 200)
+        resized = processing.downscale(img, 400, 200)
+
+        self.assertEqual(resized.size, (400, 200))
+
+    def test_encode_within_finds_highest_fitting_quality(self):
+        """Test the byte budget search returns the best quality that fits."""
+
+        img = PIL.Image.effect_noise((200, 200), 64).convert("RGB")
+        max_bytes = len(processing.encode(img, "JPEG", 50).getvalue())
+
+        buffer, quality = processing.encode_within(img, "JPEG", 95, max_bytes)
+
+        self.assertLessEqual(len(buffer.getvalue()), max_bytes)
+        self.assertGreaterEqual(quality, 50)
+        self.assertGreater(
+            len(processing.encode(img, "JPEG", quality + 1).getvalue()), max_bytes
+        )
+
+    def test_encode_within_unreachable_budget(self):
+        """Test a budget below the lowest quality returns nothing."""
+
+        img = PIL.Image.effect_noise((200, 200), 64).convert("RGB")
+
+        self.assertEqual(processing.encode_within(img, "JPEG", 95, 10), (None, None))
+
+    def test_render_batch_every_size_of_every_source(self):
+        """Test a batch returns the encoded bytes per size and source."""
+
+        sources = [create_photo(800, 600).getvalue() for _ in range(3)]
+
+        rendered = processing.render_batch(
+            sources, [(80, 60, 80, "JPEG"), (40, 30, 70, "PNG")]
+        )
+
+        self.assertEqual([len(images) for images in rendered], [3, 3])
+        for images, size, format in zip(
+            rendered, ((80, 60), (40, 30)), ("JPEG", "PNG")
+        ):
+            for data in images:
+                img = PIL.Image.open(BytesIO(data))
+                self.assertEqual((img.size, img.format), (size, format))
@@ -0,0 +1,134 @@
+"""
+Tests for the shared memory cache of decoded images.
+"""
+
+import os
+import secrets
+from io import BytesIO
+import tempfile
+import multiprocessing
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.test import SimpleTestCase
+
+from core.utils import processing, shared_cache
+from core.utils.decoded import get_decoded_cache
+from core.utils.shared_cache import SharedDecodedCache
+
+
+def put_in_child(name, key):
+    """Cache a red image from a separate process."""
+
+    cache = SharedDecodedCache(name, 1024**2, 4)
+    cache.put(key, (Image.new("RGB", (20, 10), "red"), (200, 100), "JPEG"))
+
+
+def get_in_child(name, key, queue):
+    """Read a pixel of a cached image from a separate process."""
+
+    img, _, _ = SharedDecodedCache(name, 1024**2, 4).get(key)
+    queue.put((img.size, img.getpixel((0, 0))[:3]))
+
+
+class SharedCacheTests(SimpleTestCase):
+    """Test the host-wide cache of decoded images."""
+
+    def setUp(self):
+        self.name = f"irt-{secrets.token_hex(4)}"
+        self.cache = SharedDecodedCache(self.name, 3 * 20 * 10 * 4, 4)
+
+    def tearDown(self):
+        self.cache.clear()
+
+    def entry(self, color="red"):
+        return Image.new("RGB", (20, 10), color), (200, 100), "JPEG"
+
+    def test_entry_is_shared_between_processes(self):
+        """Test an image cached by a process that exited is mapped by
+        others."""
+
+        context = multiprocessing.get_context("fork")
+        writer = context.Process(target=put_in_child, args=(self.name, "a"))
+        writer.start()
+        writer.join()
+        queue = context.Queue()
+        reader = context.Process(target=get_in_child, args=(self.name, "a", queue))
+        reader.start()
+        result = queue.get(timeout=10)
+        reader.join()
+
+        self.assertEqual(result, ((20, 10), (255, 0, 0)))
+        img, source_size, format = self.cache.get("a")
+        self.assertTrue(img.readonly)
+        self.assertEqual((source_size, format), ((200, 100), "JPEG"))
+        self.assertEqual(self.cache.stats()["hits"], 2)
+
+    def test_least_recently_used_is_evicted(self):
+        """Test inserts above the byte cap evict the oldest entry."""
+
+        self.cache.put("a", self.entry())
+        self.cache.put("b", self.entry())
+        self.cache.put("c", self.entry())
+        self.cache.get("a")
+        self.cache.put("d", self.entry("blue"))
+
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.get("d")[0].getpixel((0, 0))[:3], (0, 0, 255))
+        stats = self.cache.stats()
+        self.assertEqual(stats["entries"], 3)
+        self.assertEqual(stats["bytes"], 3 * 20 * 10 * 4)
+        self.assertEqual(stats["evictions"], 1)
+
+    def test_slots_bound_entries(self):
+        """Test a full index evicts even below the byte cap."""
+
+        cache = SharedDecodedCache(self.name, 1024**2, 2)
+        for key in ("a", "b", "c"):
+            cache.put(key, (Image.new("L", (4, 4)), (4, 4), "PNG"))
+
+        self.assertEqual(cache.stats()["entries"], 2)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("c")[0].mode, "L")
+
+    def test_fits_rejects_entry(self):
+        """Test an entry without enough resolution is a miss."""
+
+        self.cache.put("a", self.entry())
+
+        self.assertIsNone(self.cache.get("a", lambda size, *_: size[0] > 20))
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+
+class SharedDecodeTests(SimpleTestCase):
+    """Test decoding through the shared cache."""
+
+    def setUp(self):
+        get_decoded_cache().clear()
+        shared_cache.configure_shared_cache(
+            f"irt-{secrets.token_hex(4)}", 64 * 1024**2, 8
+        )
+        image_file = tempfile.NamedTemporaryFile(suffix=".jpg", delete=False)
+        Image.new("RGB", (800, 600), "green").save(image_file, format="JPEG")
+        image_file.close()
+        self.path = image_file.name
+
+    def tearDown(self):
+        shared_cache.get_shared_cache().clear()
+        shared_cache.configure_shared_cache(None, 0, 0)
+        os.remove(self.path)
+
+    def test_second_resize_maps_shared_pixels(self):
+        """Test a resize reads a source cached by an earlier one."""
+
+        processing.render(self.path, [(200, 150, 80, None)], "PNG")
+        with patch.object(
+            processing, "decode", wraps=processing.decode
+        ) as patched_decode:
+            [(data, _)] = processing.render(self.path, [(100, 75, 80, None)], "PNG")
+
+        patched_decode.assert_not_called()
+        self.assertEqual(get_decoded_cache().stats()["entries"], 0)
+        with Image.open(BytesIO(data)) as img:
+            self.assertEqual((img.size, img.mode), ((100, 75), "RGB"))
@@ -0,0 +1,152 @@
+"""
+Tests for strip resizing of large uncompressed images.
+"""
+
+import os
+import sys
+import tempfile
+import subprocess
+from io import BytesIO
+from unittest.mock import patch
+
+import PIL.Image
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from core.utils import processing
+
+# VmHWM is the peak resident memory of this program only, ru_maxrss would
+# include the memory of the forked test runner.
+MEASURE_SCRIPT = """
+import sys
+
+from core.utils import processing
+
+threshold = None if sys.argv[2] == "none" else int(sys.argv[2])
+processing.render(sys.argv[1], [(200, 200, 75, None)], "JPEG", threshold)
+with open("/proc/self/status") as status:
+    for line in status:
+        if line.startswith("VmHWM:"):
+            print(line.split()[1])
+"""
+
+
+def write_ppm(path, width, height):
+    """Write a PPM image row by row, never holding it in memory."""
+
+    row = (bytes(range(256)) * (width * 3 // 256 + 1))[: width * 3]
+    with open(path, "wb") as file:
+        file.write(f"P6 {width} {height} 255\n".encode("ascii"))
+        for _ in range(height):
+            file.write(row)
+
+
+class StripResizeTests(SimpleTestCase):
+    """Test resizing uncompressed images band by band."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def save(self, img, format):
+        path = os.path.join(self.directory.name, f"source.{format.lower()}")
+        img.save(path, format=format)
+        return path
+
+    def test_strips_match_full_resize(self):
+        """Test strip resizing gives the same pixels as a full resize."""
+
+        img = PIL.Image.effect_noise((300, 400), 60).convert("RGB")
+        for format in ("PPM", "BMP", "TIFF"):
+            path = self.save(img, format)
+            with PIL.Image.open(path) as source:
+                layout = processing.strip_layout(source)
+                for new_size in ((30, 40), (150, 200), (450, 600)):
+                    resized = processing.resize_strips(
+                        path, source, layout, *new_size, strip_pixels=5000
+                    )
+
+                    self.assertEqual(resized.tobytes(), img.resize(new_size).tobytes())
+
+    def test_compressed_images_have_no_layout(self):
+        """Test compressed images are not resized in strips."""
+
+        path = self.save(PIL.Image.new("RGB", (30, 20)), "PNG")
+
+        with PIL.Image.open(path) as img:
+            self.assertIsNone(processing.strip_layout(img))
+
+    def test_render_uses_strips_above_threshold(self):
+        """Test render only resizes in strips above the threshold."""
+
+        path = self.save(PIL.Image.new("RGB", (30, 20), "red"), "PPM")
+
+        self.assertIsNotNone(processing.open_strips(path, 599))
+        self.assertIsNone(processing.open_strips(path, 600))
+        [(data, quality)] = processing.render(path, [(15, 10, 80, None)], "JPEG", 0)
+        with PIL.Image.open(BytesIO(data)) as resized:
+            self.assertEqual(resized.size, (15, 10))
+        self.assertEqual(quality, 80)
+
+    def test_pyramid_closes_every_level(self):
+        """Test the source and every level are closed once the next level is
+        made, with or without strips."""
+
+        for format, threshold in (("PPM", 0), ("GIF", None)):
+            with self.subTest(format=format):
+                path = self.save(PIL.Image.new("RGB", (64, 32), "red"), format)
+                made = []
+
+                def tracked(function):
+                    def make(*args, **kwargs):
+                        img = function(*args, **kwargs)
+                        made.append(img)
+                        return img
+
+                    return make
+
+                with patch.object(
+                    PIL.Image, "open", tracked(PIL.Image.open)
+                ), patch.object(
+                    PIL.Image.Image, "reduce", tracked(PIL.Image.Image.reduce)
+                ), patch.object(
+                    processing, "reducible", tracked(processing.reducible)
+                ), patch.object(
+                    processing, "resize_strips", tracked(processing.resize_strips)
+                ):
+                    rendered = processing.render_pyramid(path, 3, "PNG", threshold)
+
+                self.assertEqual(len(rendered), 3)
+                self.assertGreaterEqual(len(made), 4)
+                for img in made:
+                    with self.assertRaises(ValueError):
+                        img.load()
+
+    def measure(self, width, height, threshold):
+        path = os.path.join(self.directory.name, f"{width}x{height}.ppm")
+        write_ppm(path, width, height)
+        result = subprocess.run(
+            [sys.executable, "-c", MEASURE_SCRIPT, path, str(threshold).lower()],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+        os.remove(path)
+
+        return int(result.stdout.strip())
+
+    def test_peak_memory_constant_with_source_size(self):
+        """Test the peak memory of a strip resize does not grow with the
+        source, unlike a full decode."""
+
+        small = self.measure(2000, 2000, 0)
+        large = self.measure(5000, 5000, 0)
+        full = self.measure(5000, 5000, None)
+
+        # VmHWM is in kilobytes, the large source decodes to 75MB.
+        self.assertLess(large - small, 16 * 1024)
+        self.assertGreater(full - large, 48 * 1024)
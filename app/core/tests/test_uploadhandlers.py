@@ -0,0 +1,113 @@
+"""
+Tests for custom upload handlers.
+"""
+
+import os
+import hashlib
+import tempfile
+from unittest.mock import patch
+
+import PIL.Image
+
+from django.conf import settings
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core import models
+from core.uploadhandlers import StreamingImageUploadHandler
+
+IMAGE_URL = reverse("image:image-list")
+
+
+class StreamingUploadHandlerTests(TestCase):
+    """Test streaming, hashing and probing uploads in one pass."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="test@example.com",
+            name="test",
+            password="test1234",
+        )
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        for image in models.Image.objects.filter(user=self.user):
+            image.delete()
+
+    def test_upload_is_probed_without_reopening(self):
+        """Test the upload metadata comes from the streaming pass."""
+
+        with tempfile.NamedTemporaryFile(suffix=".png") as image_file:
+            PIL.Image.effect_noise((300, 200), 40).save(image_file, format="PNG")
+            image_file.seek(0)
+            content = image_file.read()
+            image_file.seek(0)
+
+            with patch(
+                "core.uploadhandlers.StreamingImageUploadHandler.file_complete",
+                autospec=True,
+                side_effect=StreamingImageUploadHandler.file_complete,
+            ) as patched_complete:
+                response = self.client.post(
+                    IMAGE_URL, {"image": image_file}, format="multipart"
+                )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        upload = patched_complete.call_args.args[0].file
+        self.assertEqual(upload.digest, hashlib.sha256(content).hexdigest())
+        self.assertEqual(upload.probe, (300, 200, "PNG"))
+
+        image = models.Image.objects.get(id=response.data["id"])
+        self.assertEqual((image.width, image.height, image.format), (300, 200, "PNG"))
+        self.assertEqual(image.size, len(content))
+        with open(image.image.path, "rb") as stored:
+            self.assertEqual(stored.read(), content)
+
+    def test_upload_is_spooled_under_media_root(self):
+        """Test the spooled upload is moved into place, not copied."""
+
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as image_file:
+            PIL.Image.new("RGB", (50, 50)).save(image_file, format="JPEG")
+            image_file.seek(0)
+            with patch("shutil.copyfileobj") as patched_copy:
+                response = self.client.post(
+                    IMAGE_URL, {"image": image_file}, format="multipart"
+                )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        patched_copy.assert_not_called()
+        spool = os.path.join(settings.MEDIA_ROOT, "uploads", "tmp")
+        self.assertEqual(os.listdir(spool), [])
+
+    def test_upload_not_an_image(self):
+        """Test files Pillow cannot read are still rejected."""
+
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as image_file:
+            image_file.write(b"not an image")
+            image_file.seek(0)
+            response = self.client.post(
+                IMAGE_URL, {"image": image_file}, format="multipart"
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(models.Image.objects.count(), 0)
+
+    def test_upload_truncated(self):
+        """Test uploads whose header probes fine but whose data is cut short
+        are rejected."""
+
+        with tempfile.NamedTemporaryFile(suffix=".png") as image_file:
+            PIL.Image.effect_noise((300, 200), 40).save(image_file, format="PNG")
+            image_file.truncate(image_file.tell() // 2)
+            image_file.seek(0)
+            response = self.client.post(
+                IMAGE_URL, {"image": image_file}, format="multipart"
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(models.Image.objects.count(), 0)
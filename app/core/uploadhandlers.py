@@ -0,0 +1,82 @@
+"""
+Custom upload handlers.
+"""
+
+import os
+import hashlib
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile, TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+
+import PIL.Image
+
+
+class ProbedUploadedFile(TemporaryUploadedFile):
+    """Uploaded file spooled under MEDIA_ROOT, so storing it is a rename, with
+    its content hash and header probe."""
+
+    def __init__(self, name, content_type, size, charset, content_type_extra=None):
+        directory = os.path.join(settings.MEDIA_ROOT, "uploads", "tmp")
+        os.makedirs(directory, exist_ok=True)
+        _, ext = os.path.splitext(name)
+        file = tempfile.NamedTemporaryFile(suffix=".upload" + ext, dir=directory)
+        UploadedFile.__init__(
+            self, file, name, content_type, size, charset, content_type_extra
+        )
+        self.digest = None
+        self.probe = None
+        self.oversized = False
+
+
+class StreamingImageUploadHandler(FileUploadHandler):
+    """Upload handler writing each chunk straight to disk while hashing it and
+    reading the image header, so the bytes are read once in constant memory."""
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.file = ProbedUploadedFile(
+            self.file_name, self.content_type, 0, self.charset, self.content_type_extra
+        )
+        self.hash = hashlib.sha256()
+        self.header = bytearray()
+        self.probe = None
+        self.oversized = False
+
+    def receive_data_chunk(self, raw_data, start):
+        self.file.write(raw_data)
+        self.hash.update(raw_data)
+        if self.probe is None and self.header is not None:
+            self.read_header(raw_data)
+
+    def read_header(self, raw_data):
+        """Parse the image header from the first bytes of the upload, giving up
+        after FILE_UPLOAD_PROBE_MAX_BYTES."""
+
+        self.header += raw_data
+        try:
+            img = PIL.Image.open(BytesIO(self.header))
+            self.probe = (img.size[0], img.size[1], img.format)
+            img.close()
+            self.header = None
+        except PIL.Image.DecompressionBombError:
+            self.oversized = True
+            self.header = None
+        except Exception:
+            if len(self.header) >= settings.FILE_UPLOAD_PROBE_MAX_BYTES:
+                self.header = None
+
+    def file_complete(self, file_size):
+        self.file.seek(0)
+        self.file.size = file_size
+        self.file.digest = self.hash.hexdigest()
+        self.file.probe = self.probe
+        self.file.oversized = self.oversized
+
+        return self.file
+
+    def upload_interrupted(self):
+        if hasattr(self, "file"):
+            self.file.close()
@@ -0,0 +1,172 @@
+"""
+Pixel budget admission control.
+
+What a resize costs in memory is set by pixel counts, not file sizes: a
+10MB PNG can decode to gigabytes. Every resize is priced from the header-only
+probe of its source before anything is decoded:
+
+- Sources above IMAGE_MAX_SOURCE_PIXELS and targets above
+  IMAGE_MAX_TARGET_PIXELS are refused with ImageTooLarge (413).
+- The decoded source plus two buffers per target is reserved from the
+  RESIZE_MEMORY_BUDGET of the host while the resize runs. Reservations are
+  host-wide slots (core.utils.host_slots) holding their bytes, so every web
+  worker process draws from the same budget. Requests that do not fit get
+  BudgetExceeded (429) with a Retry-After, or are queued as resize jobs
+  when RESIZE_BUDGET_OVERFLOW is "queue".
+- Uncompressed sources above RESIZE_STRIP_THRESHOLD_PIXELS are resized in
+  strips and priced at two strips instead of the whole source.
+"""
+
+import secrets
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.dispatch import receiver
+from django.test.signals import setting_changed
+
+from core.utils import processing
+from core.utils.exceptions import ImageTooLarge, BudgetExceeded
+from core.utils.host_slots import HostSlots
+
+BYTES_PER_PIXEL = 4
+
+
+def check_pixels(width, height, sizes=()):
+    """Raise ImageTooLarge if the source or any (width, height) target has
+    more pixels than allowed."""
+
+    if width * height > settings.IMAGE_MAX_SOURCE_PIXELS:
+        raise ImageTooLarge(
+            f"The image must not have more than "
+            f"{settings.IMAGE_MAX_SOURCE_PIXELS} pixels."
+        )
+
+    for new_width, new_height in sizes:
+        if new_width * new_height > settings.IMAGE_MAX_TARGET_PIXELS:
+            raise ImageTooLarge(
+                f"The resized image must not have more than "
+                f"{settings.IMAGE_MAX_TARGET_PIXELS} pixels."
+            )
+
+
+def estimate_cost(width, height, format, sizes):
+    """Return the estimated peak memory in bytes of rendering the sizes from a
+    source: the decoded source, reduced by JPEG draft mode or strips where
+    they apply, plus the resized image and the encode buffer of every size."""
+
+    decoded_width, decoded_height = processing.decoded_size(
+        (width, height),
+        format,
+        (max(size[0] for size in sizes), max(size[1] for size in sizes)),
+    )
+    pixels = decoded_width * decoded_height
+    if (
+        format in processing.STRIP_FORMATS
+        and width * height > settings.RESIZE_STRIP_THRESHOLD_PIXELS
+    ):
+        pixels = min(pixels, 2 * processing.STRIP_PIXELS)
+    pixels += sum(2 * new_width * new_height for new_width, new_height in sizes)
+
+    return pixels * BYTES_PER_PIXEL
+
+
+class PixelBudget:
+    """Memory budget shared by the resizes of every process on the host
+    using a budget of the same name. At most slots resizes hold a part of it
+    at once."""
+
+    def __init__(self, limit, retry_after, name=None, slots=64):
+        self.limit = limit
+        self.retry_after = retry_after
+        self.peak = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._reservations = HostSlots(
+            f"{name or f'resize-{secrets.token_hex(8)}'}-budget", slots
+        )
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def reserve(self, cost):
+        """Hold cost bytes of the budget, raising ImageTooLarge when it exceeds
+        the whole budget and BudgetExceeded when it exceeds the free part."""
+
+        if cost > self.limit:
+            with self._lock:
+                self.rejected += 1
+            raise ImageTooLarge("The image needs more memory than a resize may use.")
+
+        with self._reservations.guard():
+            in_use = sum(self._reservations.held())
+            reservation = None
+            if in_use + cost <= self.limit:
+                reservation = self._reservations.try_acquire(cost)
+        with self._lock:
+            if reservation is None:
+                self.rejected += 1
+                raise BudgetExceeded(retry_after=self.retry_after)
+            self.peak = max(self.peak, in_use + cost)
+            self.admitted += 1
+        try:
+            yield
+        finally:
+            reservation.release()
+
+    def stats(self):
+        """Return the current use of the host's budget and the peak use and
+        counters seen by this process."""
+
+        in_use = sum(self._reservations.held())
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "in_use": in_use,
+                "peak": self.peak,
+                "utilization": round(in_use / self.limit, 2),
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+            }
+
+
+@contextmanager
+def admit(width, height, format, sizes):
+    """Check the pixel limits of a resize and hold its cost of the budget."""
+
+    check_pixels(width, height, sizes)
+    with get_pixel_budget().reserve(estimate_cost(width, height, format, sizes)):
+        yield
+
+
+_budget = None
+_budget_lock = threading.Lock()
+
+
+def get_pixel_budget():
+    """Return the pixel budget of the host."""
+
+    global _budget
+
+    with _budget_lock:
+        if _budget is None:
+            _budget = PixelBudget(
+                settings.RESIZE_MEMORY_BUDGET,
+                settings.RESIZE_BUDGET_RETRY_AFTER,
+                settings.RESIZE_EXECUTOR_NAME,
+            )
+        return _budget
+
+
+@receiver(setting_changed)
+def reset_pixel_budget(setting, **kwargs):
+    """Rebuild the budget when its settings are overridden."""
+
+    global _budget
+
+    if setting in (
+        "RESIZE_MEMORY_BUDGET",
+        "RESIZE_BUDGET_RETRY_AFTER",
+        "RESIZE_EXECUTOR_NAME",
+    ):
+        with _budget_lock:
+            _budget = None
@@ -0,0 +1,68 @@
+"""
+Views served as coroutines under ASGI.
+
+DRF views are synchronous. Served over ASGI, Django runs each of them in a
+thread of its own, so a burst of slow resizes starts a thread per request.
+as_async_view turns a view into a coroutine that runs it in one pool of
+ASYNC_VIEW_THREADS threads instead: the event loop keeps accepting requests
+while the pool bounds how many views run at once, and the Pillow work they
+hand to the resize executor runs outside of it.
+
+The ORM is only used in the pool threads, never on the event loop. Each
+thread keeps its own database connection; like Django does around every
+request, connections that are broken or past CONN_MAX_AGE are closed before
+and after each view.
+"""
+
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.db import close_old_connections
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_view_pool():
+    """Return the thread pool running views of the current process."""
+
+    global _pool
+
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=settings.ASYNC_VIEW_THREADS, thread_name_prefix="view"
+            )
+        return _pool
+
+
+def run_view(view, request, *args, **kwargs):
+    """Run a view and render its response in the calling thread."""
+
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if callable(getattr(response, "render", None)):
+            response = response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def as_async_view(view):
+    """Return a coroutine running a view in the view pool when SERVER_MODE
+    is "asgi", or the view itself otherwise."""
+
+    if settings.SERVER_MODE != "asgi":
+        return view
+
+    @functools.wraps(view)
+    async def async_view(request, *args, **kwargs):
+        run = sync_to_async(run_view, thread_sensitive=False, executor=get_view_pool())
+        return await run(view, request, *args, **kwargs)
+
+    return async_view
@@ -0,0 +1,110 @@
+"""
+Decoded source cache.
+
+Clients usually ask for several sizes of one image within a few seconds.
+Every process that resizes keeps the sources it decoded last in an LRU cache
+bounded by their pixel bytes. Entries are keyed by the file path and its
+modification time, so a replaced file is never served from the cache. The
+least recently used entries are evicted until a new one fits under the cap;
+an image larger than the whole cap is not cached.
+
+The caches live in the resize executor's pool processes, which split
+RESIZE_DECODED_CACHE_BYTES between them and get every job on one file sent
+to the same process. Their counters travel back with every result and the
+executor reports their sum.
+"""
+
+import threading
+from collections import OrderedDict
+
+BYTES_PER_PIXEL = 4
+
+
+def image_bytes(img):
+    """Return the memory held by the pixels of a decoded image."""
+
+    return img.width * img.height * BYTES_PER_PIXEL
+
+
+class DecodedCache:
+    """LRU cache of decoded images bounded by their total pixel bytes."""
+
+    def __init__(self, max_bytes=0):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, fits=None):
+        """Return the cached value of a key, or None when it is missing or
+        fits(value) is false."""
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (fits is not None and not fits(entry[0])):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size):
+        """Cache a value taking size bytes, evicting the least recently used
+        entries until it fits. Returns whether the value was cached."""
+
+        with self._lock:
+            self._discard(key)
+            if size > self.max_bytes:
+                return False
+            self._evict(self.max_bytes - size)
+            self._entries[key] = (value, size)
+            self.bytes += size
+            return True
+
+    def resize(self, max_bytes):
+        """Change the cap, evicting entries above it."""
+
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict(max_bytes)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        """Return the size and counters of the cache."""
+
+        with self._lock:
+            return {
+                "max_bytes": self.max_bytes,
+                "bytes": self.bytes,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[1]
+
+    def _evict(self, max_bytes):
+        while self._entries and self.bytes > max_bytes:
+            _, (_, size) = self._entries.popitem(last=False)
+            self.bytes -= size
+            self.evictions += 1
+
+
+_cache = DecodedCache()
+
+
+def get_decoded_cache():
+    """Return the decoded cache of the current process."""
+
+    return _cache
@@ -0,0 +1,43 @@
+"""
+Custom exceptions.
+"""
+
+
+class ResizeRejected(Exception):
+    """Base exception for resize requests rejected before any processing."""
+
+    status_code = 503
+    message = "The server cannot resize images right now."
+
+    def __init__(self, message=None, retry_after=None):
+        self.message = message or self.message
+        self.retry_after = retry_after
+        super().__init__(self.message)
+
+
+class ExecutorBusy(ResizeRejected):
+    """Raised when the resize executor queue is full."""
+
+    status_code = 503
+    message = "Too many resize requests in progress, try again later."
+
+
+class ByteBudgetUnreachable(ResizeRejected):
+    """Raised when no quality fits the requested max_bytes."""
+
+    status_code = 422
+    message = "The image cannot be encoded within the requested max_bytes."
+
+
+class ImageTooLarge(ResizeRejected):
+    """Raised when a source or resized image has more pixels than allowed."""
+
+    status_code = 413
+    message = "The image has too many pixels."
+
+
+class BudgetExceeded(ResizeRejected):
+    """Raised when a resize does not fit in the free pixel budget."""
+
+    status_code = 429
+    message = "Too many large images are being resized, try again later."
@@ -0,0 +1,281 @@
+"""
+Resize executor.
+
+Resizing runs in pool processes, so a few large images cannot hold every
+web worker thread. Each web worker process owns a pool, created lazily after
+uWSGI forks the workers, with RESIZE_EXECUTOR_WORKERS divided by
+RESIZE_WEB_WORKERS processes, so the pools of the host add up to the cores.
+
+The limits are kept in host-wide slots (core.utils.host_slots) shared by
+every process of the host: at most RESIZE_EXECUTOR_WORKERS jobs run at once,
+at most RESIZE_EXECUTOR_QUEUE_SIZE more wait for them, and callers above
+that get ExecutorBusy immediately instead of queueing forever. Pool workers
+of batch commands wait for a queue slot instead, since nobody is waiting on
+them. The web worker still waits for the result of its own job.
+
+With RESIZE_EXECUTOR_BACKEND set to "thread" the pool is a thread pool of
+the same size instead. Pillow releases the GIL while it decodes, resizes and
+encodes, so threads resize in parallel without copying sources and results
+between processes, and no process is forked from a threaded ASGI server.
+
+The pool of a process backend is made of single-process pools. A job on a
+stored file goes to the one picked by a hash of its path, so every size of
+an image resized by one web worker finds the source in the decoded cache of
+the same process; other jobs take turns. RESIZE_DECODED_CACHE_BYTES caps the
+decoded caches of the whole host and is split evenly between the processes
+that keep one: the pool processes of every web worker, or the web workers
+themselves with the thread backend.
+
+Every job reports the decoded cache counters of the process that ran it, so
+the executor can sum the caches of its pool processes.
+"""
+
+import os
+import hashlib
+import secrets
+import itertools
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.dispatch import receiver
+from django.test.signals import setting_changed
+
+from core.utils.decoded import get_decoded_cache
+from core.utils.exceptions import ExecutorBusy
+from core.utils.host_slots import HostSlots
+from core.utils.shared_cache import configure_shared_cache, get_shared_cache
+
+
+def call(function, args, cache_bytes, shared_cache=None):
+    """Run a function with the decoded cache of the process capped at
+    cache_bytes and the shared cache set up from its (name, max_bytes, slots)
+    and return its result with the process id and decoded cache stats."""
+
+    cache = get_decoded_cache()
+    if cache.max_bytes != cache_bytes:
+        cache.resize(cache_bytes)
+    configure_shared_cache(*(shared_cache or (None, 0, 0)))
+
+    return function(*args), (os.getpid(), cache.stats())
+
+
+class ResizeExecutor:
+    """Process or thread pool with a queue bounded across the host. Executors
+    with the same name share their limits."""
+
+    def __init__(
+        self,
+        workers,
+        queue_size,
+        retry_after,
+        start_method="fork",
+        cache_bytes=0,
+        shared_cache=None,
+        backend="process",
+        name=None,
+        web_workers=1,
+    ):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.retry_after = retry_after
+        self.start_method = start_method
+        self.cache_bytes = cache_bytes
+        self.shared_cache = shared_cache
+        self.backend = backend
+        self.name = name or f"resize-{secrets.token_hex(8)}"
+        self.pool_size = max(1, -(-workers // max(web_workers, 1)))
+        processes = max(web_workers, 1)
+        if backend == "process" and workers >= 1:
+            processes *= self.pool_size
+        self.process_cache_bytes = cache_bytes // processes
+        self.rejected = 0
+        self._cache_stats = {}
+        self._queue = HostSlots(f"{self.name}-queue", max(workers, 1) + queue_size)
+        self._running = HostSlots(f"{self.name}-running", max(workers, 1))
+        self._lock = threading.Lock()
+        self._pools = {}
+        self._turns = itertools.count()
+
+    @property
+    def inline(self):
+        """Run jobs in the calling thread without a pool. Daemonic processes,
+        like multiprocessing pool workers, cannot start their own children."""
+
+        return self.workers < 1 or multiprocessing.current_process().daemon
+
+    def pool_index(self, args):
+        """Return the pool process a job on args runs in: the one of the
+        stored file it reads, or the next one in turn."""
+
+        if self.backend == "thread":
+            return 0
+        if args and isinstance(args[0], str):
+            digest = hashlib.sha256(args[0].encode()).digest()
+            return int.from_bytes(digest[:8], "big") % self.pool_size
+
+        return next(self._turns) % self.pool_size
+
+    def get_pool(self, index=0):
+        with self._lock:
+            pool = self._pools.get(index)
+            if pool is None and self.backend == "thread":
+                pool = ThreadPoolExecutor(
+                    max_workers=self.pool_size, thread_name_prefix="resize"
+                )
+            elif pool is None:
+                pool = ProcessPoolExecutor(
+                    max_workers=1,
+                    mp_context=multiprocessing.get_context(self.start_method),
+                )
+            self._pools[index] = pool
+            return pool
+
+    def reset_pool(self):
+        with self._lock:
+            pools, self._pools = self._pools, {}
+        for pool in pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, function, *args):
+        """Run a function in the pool once a host-wide running slot is free
+        and return its result, raising ExecutorBusy when the queue of the host
+        is full."""
+
+        if multiprocessing.current_process().daemon:
+            queued = self._queue.acquire()
+        else:
+            queued = self._queue.try_acquire()
+        if queued is None:
+            with self._lock:
+                self.rejected += 1
+            raise ExecutorBusy(retry_after=self.retry_after)
+
+        running = None
+        try:
+            running = self._running.acquire()
+            if self.inline:
+                result, (pid, cache_stats) = call(
+                    function, args, self.process_cache_bytes, self.shared_cache
+                )
+            else:
+                result, (pid, cache_stats) = (
+                    self.get_pool(self.pool_index(args))
+                    .submit(
+                        call,
+                        function,
+                        args,
+                        self.process_cache_bytes,
+                        self.shared_cache,
+                    )
+                    .result()
+                )
+            with self._lock:
+                self._cache_stats[pid] = cache_stats
+            return result
+        except BrokenProcessPool:
+            self.reset_pool()
+            raise
+        finally:
+            if running is not None:
+                running.release()
+            queued.release()
+
+    def stats(self):
+        """Return the queue depth and worker utilization of the host and the
+        jobs this process rejected."""
+
+        running = len(self._running.held())
+        queued = len(self._queue.held())
+        with self._lock:
+            rejected = self.rejected
+        workers = max(self.workers, 1)
+
+        return {
+            "backend": self.backend,
+            "workers": self.workers,
+            "pool_size": self.pool_size,
+            "running": running,
+            "queue_depth": max(0, queued - running),
+            "queue_size": self.queue_size,
+            "utilization": round(running / workers, 2),
+            "rejected": rejected,
+        }
+
+    def cache_stats(self):
+        """Return the decoded cache counters summed over the processes that
+        ran jobs, as last reported by each of them."""
+
+        with self._lock:
+            reported = list(self._cache_stats.values())
+        totals = {
+            key: sum(stats[key] for stats in reported)
+            for key in ("bytes", "entries", "hits", "misses", "evictions")
+        }
+        lookups = totals["hits"] + totals["misses"]
+
+        return {
+            "max_bytes": self.cache_bytes,
+            "process_max_bytes": self.process_cache_bytes,
+            "processes": len(reported),
+            **totals,
+            "hit_ratio": round(totals["hits"] / lookups, 2) if lookups else 0,
+        }
+
+    def shared_cache_stats(self):
+        """Return the host-wide state of the shared cache, or None when it is
+        turned off."""
+
+        configure_shared_cache(*(self.shared_cache or (None, 0, 0)))
+        shared = get_shared_cache()
+
+        return shared.stats() if shared else None
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the resize executor of the current process."""
+
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ResizeExecutor(
+                settings.RESIZE_EXECUTOR_WORKERS,
+                settings.RESIZE_EXECUTOR_QUEUE_SIZE,
+                settings.RESIZE_EXECUTOR_RETRY_AFTER,
+                settings.RESIZE_EXECUTOR_START_METHOD,
+                settings.RESIZE_DECODED_CACHE_BYTES,
+                (
+                    settings.RESIZE_SHARED_CACHE_NAME,
+                    settings.RESIZE_SHARED_CACHE_BYTES,
+                    settings.RESIZE_SHARED_CACHE_SLOTS,
+                ),
+                settings.RESIZE_EXECUTOR_BACKEND,
+                settings.RESIZE_EXECUTOR_NAME,
+                settings.RESIZE_WEB_WORKERS,
+            )
+        return _executor
+
+
+@receiver(setting_changed)
+def reset_executor(setting, **kwargs):
+    """Rebuild the executor and empty the decoded cache when their settings
+    are overridden."""
+
+    global _executor
+
+    if setting.startswith("RESIZE_EXECUTOR_") or setting in (
+        "RESIZE_WEB_WORKERS",
+        "RESIZE_DECODED_CACHE_BYTES",
+    ):
+        with _executor_lock:
+            executor, _executor = _executor, None
+        if executor is not None:
+            executor.reset_pool()
+        get_decoded_cache().clear()
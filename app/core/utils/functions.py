@@ -2,18 +2,40 @@
 Helper functions.
 """
 
+import os
 from io import BytesIO
+import hashlib
+import logging
 
 from django.conf import settings
-from django.core.files import File
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.core.files.base import ContentFile
+from django.db.models.fields.files import FieldFile
 
 from rest_framework import status
 from rest_framework.response import Response
 
 import PIL.Image
 
-from core.utils import constants
-from core.models import Resized
+from core.utils import constants, processing
+from core.utils.executor import get_executor
+from core.utils.admission import admit
+from core.utils.response_cache import bump_generation
+from core.utils.exceptions import (
+    BudgetExceeded,
+    ByteBudgetUnreachable,
+    ExecutorBusy,
+    ResizeRejected,
+    ImageTooLarge,
+)
+from core.models import Image, ImageLevel, Resized, ResizeJob
+
+logger = logging.getLogger(__name__)
+
+JOB_FAILED_MESSAGE = "The image could not be resized."
 
 
 def set_cookies(response, access_val, refresh_val):
@@ -78,6 +100,10 @@ def validate_new_size(parameters):
         if not parameters["height"].isdigit():
             return value_error_response
 
+    if parameters.get("max_bytes"):
+        if not parameters["max_bytes"].isdigit():
+            return value_error_response
+
     return
 
 
@@ -110,25 +136,225 @@ def cast_new_size(parameters):
                 {"error": "Height must be greater or equal to 1."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+    if parameters.get("max_bytes"):
+        parameters["max_bytes"] = int(parameters["max_bytes"])
+        if parameters["max_bytes"] < 1:
+            return Response(
+                {"error": "Max bytes must be greater or equal to 1."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
     return parameters
 
 
-def resize_image(
-    image,
+def validate_max_bytes(max_bytes, format):
+    """Helper function rejecting a byte budget for lossless output formats,
+    where the quality does not change the encoded size."""
+
+    if max_bytes and format not in processing.LOSSY_FORMATS:
+        return Response(
+            {
+                "error": "Max bytes requires one of the output formats: "
+                f"{', '.join(processing.LOSSY_FORMATS)}."
+            },
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    return
+
+
+def clamp_quality(quality):
+    """Helper function limiting the quality passed to the encoder."""
+
+    if quality > 95:
+        return 95
+    return quality
+
+
+def calculate_new_size(width, height, parameters):
+    """Helper function calculating the new size of an image from the cast
+    percent, width and height parameters."""
+
+    if parameters["percent"]:
+        new_width = int(width * (parameters["percent"] / 100))
+        new_height = int(height * (parameters["percent"] / 100))
+
+    if parameters["width"] and not parameters["height"]:
+        new_width = int(parameters["width"])
+        new_height = int(height * (new_width / width))
+
+    if parameters["height"] and not parameters["width"]:
+        new_height = int(parameters["height"])
+        new_width = int(width * (new_height / height))
+
+    if parameters["width"] and parameters["height"]:
+        new_width = int(parameters["width"])
+        new_height = int(parameters["height"])
+
+    return max(new_width, 1), max(new_height, 1)
+
+
+def accepted_media_types(accept):
+    """Helper function returning the media types of an Accept header that are
+    not excluded with q=0."""
+
+    media_types = set()
+    for media_range in accept.split(","):
+        media_type, *media_parameters = media_range.split(";")
+        quality = 1.0
+        for media_parameter in media_parameters:
+            key, _, value = media_parameter.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            media_types.add(media_type.strip().lower())
+
+    return media_types
+
+
+def negotiate_format(requested, accept, source_format):
+    """Helper function choosing the output format of a resize. An explicit
+    format parameter wins, then a format from RESIZE_NEGOTIATED_FORMATS the
+    Accept header names explicitly, then the source format."""
+
+    if requested:
+        format = requested.upper()
+        if format == "JPG":
+            format = "JPEG"
+        available = [
+            output_format
+            for output_format in processing.OUTPUT_FORMATS
+            if processing.can_encode(output_format)
+        ]
+        if format not in available:
+            return Response(
+                {"error": f"Format must be one of: {', '.join(available)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return format
+
+    media_types = accepted_media_types(accept)
+    for format in settings.RESIZE_NEGOTIATED_FORMATS:
+        media_type = processing.OUTPUT_FORMATS[format][0]
+        if media_type in media_types and processing.can_encode(format):
+            return format
+
+    return source_format
+
+
+def get_source(image):
+    """Helper function returning what the resize executor reads an image from:
+    its path when it is stored on disk, its bytes otherwise."""
+
+    if hasattr(image, "temporary_file_path"):
+        return image.temporary_file_path()
+    try:
+        return image.path
+    except (AttributeError, NotImplementedError, ValueError):
+        image.seek(0)
+        return image.read()
+
+
+def rejected_response(exc):
+    """Helper function building the response of a rejected resize request."""
+
+    response = Response({"error": exc.message}, status=exc.status_code)
+    if exc.retry_after:
+        response["Retry-After"] = str(exc.retry_after)
+
+    return response
+
+
+def probe_image(image):
+    """Helper function returning the width, height and format of an image from
+    its header. Reuses the probe made by the streaming upload handler or the
+    PIL image attached by upload validation."""
+
+    probe = getattr(image, "probe", None)
+    if probe:
+        return probe
+
+    img = getattr(image, "image", None)
+    if img is None:
+        source = get_source(image)
+        try:
+            img = PIL.Image.open(
+                BytesIO(source) if isinstance(source, bytes) else source
+            )
+        except PIL.Image.DecompressionBombError:
+            raise ImageTooLarge()
+        img.close()
+
+    return img.size[0], img.size[1], img.format
+
+
+def render_resized(
+    image, new_width, new_height, format, proper_quality, max_bytes=None
+):
+    """Helper function decoding, resizing and encoding an image in the resize
+    executor. Returns the encoded bytes and the quality used, which is the
+    highest one fitting max_bytes when a byte budget is given. Only stored
+    images go through the decoded caches; uploads are never read again."""
+
+    with admit(*probe_image(image), [(new_width, new_height)]):
+        [(data, quality)] = get_executor().run(
+            processing.render,
+            get_source(image),
+            [(new_width, new_height, proper_quality, max_bytes)],
+            format,
+            settings.RESIZE_STRIP_THRESHOLD_PIXELS,
+            isinstance(image, FieldFile),
+        )
+    if data is None:
+        raise ByteBudgetUnreachable()
+
+    return data, quality
+
+
+def ephemeral_response(data, format):
+    """Helper function returning encoded bytes as the image response of an
+    ephemeral resize. Clients may keep it, shared caches may not, since it
+    is only served to authenticated users."""
+
+    if format in processing.OUTPUT_FORMATS:
+        content_type = processing.OUTPUT_FORMATS[format][0]
+    else:
+        PIL.Image.init()
+        content_type = PIL.Image.MIME.get(format, "application/octet-stream")
+
+    response = HttpResponse(data, content_type=content_type)
+    patch_cache_control(
+        response, private=True, max_age=settings.RESIZE_EPHEMERAL_MAX_AGE
+    )
+
+    return response
+
+
+def resized_name(name, format):
+    """Helper function giving a resized image the extension of its format."""
+
+    if format not in processing.OUTPUT_FORMATS:
+        return name
+
+    return f"{os.path.splitext(name)[0]}.{processing.OUTPUT_FORMATS[format][1]}"
+
+
+def save_resized(
+    data,
+    name,
     quality,
-    proper_quality,
     new_width,
     new_height,
     format,
     user_obj,
     image_obj=None,
+    cache_key=None,
 ):
-    img = PIL.Image.open(image)
-    img_resized = img.resize((new_width, new_height))
-    temp_img = BytesIO()
-    img_resized.save(temp_img, format=format, quality=proper_quality)
-    img_resized.seek(0)
+    """Helper function storing encoded bytes as a new resized image."""
+
     resized = Resized()
     resized.user = user_obj
     resized.quality = quality
@@ -136,10 +362,492 @@ def resize_image(
         resized.image = image_obj
     resized.width = new_width
     resized.height = new_height
-    resized.size = temp_img.tell()
-    resized.resized_image.save(image.name, File(temp_img))
+    resized.size = len(data)
+    resized.format = format
+    resized.cache_key = cache_key
+    resized.resized_image.save(
+        resized_name(name, format), ContentFile(data), save=False
+    )
     resized.save()
-    img_resized.close()
-    temp_img.flush()
 
     return resized
+
+
+def resize_image(
+    image,
+    quality,
+    proper_quality,
+    new_width,
+    new_height,
+    format,
+    user_obj,
+    image_obj=None,
+    cache_key=None,
+    max_bytes=None,
+):
+    data, encoded_quality = render_resized(
+        image, new_width, new_height, format, proper_quality, max_bytes
+    )
+    # Derivatives are shared by the qualities clamping to the same value, so
+    # they store the quality they were encoded at.
+    quality = encoded_quality
+
+    return save_resized(
+        data,
+        image.name,
+        quality,
+        new_width,
+        new_height,
+        format,
+        user_obj,
+        image_obj,
+        cache_key,
+    )
+
+
+def get_digest(image):
+    """Helper function returning the SHA-256 digest of an uploaded image,
+    reusing the one computed by the streaming upload handler."""
+
+    digest = getattr(image, "digest", None)
+    if digest:
+        return digest
+
+    content_hash = hashlib.sha256()
+    for chunk in image.chunks():
+        content_hash.update(chunk)
+    image.seek(0)
+
+    return content_hash.hexdigest()
+
+
+def find_duplicate_image(user_obj, digest):
+    """Helper function returning an image of the user with identical bytes."""
+
+    return Image.objects.filter(user=user_obj, digest=digest).order_by("id").first()
+
+
+def build_pyramid(image_obj, duplicate=None):
+    """Helper function storing IMAGE_PYRAMID_LEVELS downscaled copies of an
+    image, each half the size of the previous one. A duplicate reuses the
+    levels of the image it shares the stored blob with. When the executor is
+    busy or Pillow cannot render the levels the image is left without a
+    pyramid and resizes read the original."""
+
+    if settings.IMAGE_PYRAMID_LEVELS < 1:
+        return []
+
+    if duplicate:
+        levels = [
+            ImageLevel(
+                image=image_obj,
+                level=level.level,
+                level_image=level.level_image.name,
+                width=level.width,
+                height=level.height,
+            )
+            for level in duplicate.levels.all()
+        ]
+        return ImageLevel.objects.bulk_create(levels)
+
+    format = image_obj.format
+    if format not in processing.OUTPUT_FORMATS or not processing.can_encode(format):
+        format = "PNG"
+
+    try:
+        with admit(
+            image_obj.width,
+            image_obj.height,
+            image_obj.format,
+            [(image_obj.width // 2, image_obj.height // 2)],
+        ):
+            rendered = get_executor().run(
+                processing.render_pyramid,
+                get_source(image_obj.image),
+                settings.IMAGE_PYRAMID_LEVELS,
+                format,
+                settings.RESIZE_STRIP_THRESHOLD_PIXELS,
+            )
+    except (ResizeRejected, OSError, ValueError):
+        return []
+
+    levels = []
+    for level, (width, height, data) in enumerate(rendered, start=1):
+        image_level = ImageLevel(
+            image=image_obj, level=level, width=width, height=height
+        )
+        image_level.level_image.save(
+            resized_name(image_obj.image.name, format), ContentFile(data), save=False
+        )
+        levels.append(image_level)
+
+    return ImageLevel.objects.bulk_create(levels)
+
+
+def get_resize_source(image_obj, new_width, new_height):
+    """Helper function returning the smallest pyramid level of an image that
+    is still at least the new size, or the original image."""
+
+    if settings.IMAGE_PYRAMID_LEVELS < 1:
+        return image_obj.image
+
+    level = (
+        image_obj.levels.filter(width__gte=new_width, height__gte=new_height)
+        .order_by("-level")
+        .first()
+    )
+    if level:
+        return level.level_image
+
+    return image_obj.image
+
+
+def derivative_cache_key(image_obj, width, height, quality, format, max_bytes=None):
+    """Helper function building the cache key of a derivative from its source
+    image and the normalized transform parameters. Images sharing a stored
+    blob share their derivatives."""
+
+    if image_obj.digest:
+        source = f"{image_obj.user_id}:{image_obj.digest}"
+    else:
+        source = image_obj.id
+    parameters = f"{source}:{width}x{height}:q{quality}:{format.upper()}"
+    if max_bytes:
+        parameters = f"{parameters}:b{max_bytes}"
+
+    return hashlib.sha256(parameters.encode("utf-8")).hexdigest()
+
+
+def get_cached_resized(cache_key):
+    """Helper function returning a cached derivative or None."""
+
+    return Resized.objects.filter(cache_key=cache_key).order_by("-id").first()
+
+
+def evict_cached_resized(image_obj):
+    """Helper function keeping at most RESIZED_CACHE_MAX_PER_IMAGE cached
+    derivatives of an image. The oldest entries only lose their cache key,
+    the resized images themselves stay available to the user."""
+
+    limit = settings.RESIZED_CACHE_MAX_PER_IMAGE
+    cached = Resized.objects.filter(image=image_obj, cache_key__isnull=False)
+    evicted = list(cached.order_by("-id").values_list("id", flat=True)[limit:])
+    if evicted:
+        Resized.objects.filter(id__in=evicted).update(cache_key=None)
+
+
+def resize_image_batch(image_obj, sizes, format, user_obj):
+    """Helper function decoding an image once and creating all requested
+    derivatives with a single bulk insert. Each size is a dict with quality,
+    proper_quality, width, height, max_bytes and cache_key. Returns the resized images
+    in the order of the sizes, reusing cached derivatives. Sizes whose
+    qualities clamp to the same value share one derivative, which stores the
+    quality it was encoded at."""
+
+    cached = {
+        resized.cache_key: resized
+        for resized in Resized.objects.filter(
+            cache_key__in=[size["cache_key"] for size in sizes]
+        ).order_by("id")
+    }
+    missing = {
+        size["cache_key"]: size for size in sizes if size["cache_key"] not in cached
+    }
+
+    if missing:
+        source = get_resize_source(
+            image_obj,
+            max(size["width"] for size in missing.values()),
+            max(size["height"] for size in missing.values()),
+        )
+        with admit(
+            *probe_image(source),
+            [(size["width"], size["height"]) for size in missing.values()],
+        ):
+            rendered = get_executor().run(
+                processing.render,
+                get_source(source),
+                [
+                    (
+                        size["width"],
+                        size["height"],
+                        size["proper_quality"],
+                        size.get("max_bytes"),
+                    )
+                    for size in missing.values()
+                ],
+                format,
+                settings.RESIZE_STRIP_THRESHOLD_PIXELS,
+            )
+        if any(data is None for data, _ in rendered):
+            raise ByteBudgetUnreachable()
+
+        new_resized = []
+        for size, (data, quality) in zip(missing.values(), rendered):
+            resized = Resized(
+                user=user_obj,
+                image=image_obj,
+                quality=quality,
+                width=size["width"],
+                height=size["height"],
+                size=len(data),
+                format=format,
+                cache_key=size["cache_key"],
+            )
+            resized.resized_image.save(
+                resized_name(image_obj.image.name, format),
+                ContentFile(data),
+                save=False,
+            )
+            new_resized.append(resized)
+
+        for resized in Resized.objects.bulk_create(new_resized):
+            cached[resized.cache_key] = resized
+        # bulk_create sends no post_save signals.
+        bump_generation(user_obj.id)
+        evict_cached_resized(image_obj)
+
+    return [cached[size["cache_key"]] for size in sizes]
+
+
+def enqueue_resize(
+    image_obj,
+    quality,
+    new_width,
+    new_height,
+    format,
+    cache_key,
+    user_obj,
+    max_bytes=None,
+):
+    """Helper function queueing a resize for the resize_worker command."""
+
+    return ResizeJob.objects.create(
+        user=user_obj,
+        image=image_obj,
+        quality=quality,
+        width=new_width,
+        height=new_height,
+        format=format,
+        max_bytes=max_bytes,
+        cache_key=cache_key,
+    )
+
+
+def process_next_resize_job():
+    """Helper function running the oldest pending resize job. The job row stays
+    locked while it runs, so concurrent workers skip it and a crashed worker
+    leaves it pending. A job rejected because the host is busy stays pending
+    too, for a later try. Returns the job or None when the queue is empty."""
+
+    with transaction.atomic():
+        job = (
+            ResizeJob.objects.select_for_update(skip_locked=True, of=("self",))
+            .select_related("image", "image__user")
+            .filter(status=ResizeJob.PENDING)
+            .order_by("id")
+            .first()
+        )
+        if not job:
+            return None
+
+        image = job.image
+        try:
+            with transaction.atomic():
+                resized = None
+                if job.cache_key:
+                    resized = get_cached_resized(job.cache_key)
+                if not resized:
+                    resized = resize_image(
+                        get_resize_source(image, job.width, job.height),
+                        job.quality,
+                        clamp_quality(job.quality),
+                        job.width,
+                        job.height,
+                        job.format or image.format,
+                        image.user,
+                        image,
+                        job.cache_key,
+                        job.max_bytes,
+                    )
+                    evict_cached_resized(image)
+            job.resized = resized
+            job.status = ResizeJob.DONE
+        except (ExecutorBusy, BudgetExceeded):
+            return job
+        except ResizeRejected as exc:
+            job.status = ResizeJob.FAILED
+            job.error = exc.message
+        except Exception:
+            logger.exception("Resize job %s failed.", job.id)
+            job.status = ResizeJob.FAILED
+            job.error = JOB_FAILED_MESSAGE
+        job.finished_at = timezone.now()
+        job.save()
+
+    return job
+
+
+def preset_size(image_obj, name):
+    """Helper function returning the output format and the batch size dict of
+    a preset from RESIZE_PRESETS for an image. A preset format Pillow cannot
+    write falls back to the image format."""
+
+    preset = settings.RESIZE_PRESETS[name]
+    format = (preset.get("format") or image_obj.format).upper()
+    if not processing.can_encode(format):
+        format = image_obj.format
+
+    quality = preset.get("quality", 75)
+    proper_quality = clamp_quality(quality)
+    new_width, new_height = calculate_new_size(
+        image_obj.width,
+        image_obj.height,
+        {
+            "percent": None,
+            "width": preset.get("width"),
+            "height": preset.get("height"),
+        },
+    )
+
+    return format, {
+        "quality": quality,
+        "proper_quality": proper_quality,
+        "width": new_width,
+        "height": new_height,
+        "cache_key": derivative_cache_key(
+            image_obj, new_width, new_height, proper_quality, format
+        ),
+    }
+
+
+def generate_presets(image_obj, names=None):
+    """Helper function returning the derivatives of the given presets, or all
+    presets, of an image by name. Missing ones are created with one decode per
+    output format."""
+
+    formats = {}
+    for name in names or settings.RESIZE_PRESETS:
+        format, size = preset_size(image_obj, name)
+        formats.setdefault(format, []).append((name, size))
+
+    resized = {}
+    for format, presets in formats.items():
+        resized_images = resize_image_batch(
+            image_obj, [size for _, size in presets], format, image_obj.user
+        )
+        for (name, _), resized_image in zip(presets, resized_images):
+            resized[name] = resized_image
+
+    return resized
+
+
+def generate_presets_batch(image_objs, names=None):
+    """Helper function creating the missing presets of images with the same
+    width, height and format in one executor job under one pixel budget
+    reservation. Returns the new resized images."""
+
+    names = list(names or settings.RESIZE_PRESETS)
+    presets = {
+        image_obj.id: [preset_size(image_obj, name) for name in names]
+        for image_obj in image_objs
+    }
+    cached = set(
+        Resized.objects.filter(
+            cache_key__in=[
+                size["cache_key"] for sizes in presets.values() for _, size in sizes
+            ]
+        ).values_list("cache_key", flat=True)
+    )
+    missing = []
+    covered = set(cached)
+    for image_obj in image_objs:
+        cache_keys = {size["cache_key"] for _, size in presets[image_obj.id]}
+        if not cache_keys <= covered:
+            missing.append(image_obj)
+            covered |= cache_keys
+    if not missing:
+        return []
+
+    # Images of one width, height and format share their preset sizes, and
+    # render_batch decodes them one after another, so one image's cost
+    # covers the batch.
+    first = missing[0]
+    sizes = [
+        (size["width"], size["height"], size["proper_quality"], format)
+        for format, size in presets[first.id]
+    ]
+    with admit(
+        first.width,
+        first.height,
+        first.format,
+        [size[:2] for size in sizes],
+    ):
+        rendered = get_executor().run(
+            processing.render_batch,
+            [get_source(image_obj.image) for image_obj in missing],
+            sizes,
+            settings.RESIZE_STRIP_THRESHOLD_PIXELS,
+        )
+
+    created = set()
+    new_resized = []
+    for index, images_data in enumerate(rendered):
+        for image_obj, data in zip(missing, images_data):
+            format, size = presets[image_obj.id][index]
+            if size["cache_key"] in created or size["cache_key"] in cached:
+                continue
+            created.add(size["cache_key"])
+            resized = Resized(
+                user=image_obj.user,
+                image=image_obj,
+                quality=size["quality"],
+                width=size["width"],
+                height=size["height"],
+                size=len(data),
+                format=format,
+                cache_key=size["cache_key"],
+            )
+            resized.resized_image.save(
+                resized_name(image_obj.image.name, format),
+                ContentFile(data),
+                save=False,
+            )
+            new_resized.append(resized)
+
+    new_resized = Resized.objects.bulk_create(new_resized)
+    # bulk_create sends no post_save signals.
+    for user_id in {image_obj.user_id for image_obj in missing}:
+        bump_generation(user_id)
+    for image_obj in missing:
+        evict_cached_resized(image_obj)
+
+    return new_resized
+
+
+def enqueue_presets(image_obj):
+    """Helper function queueing the missing presets of an image for the
+    resize_worker command."""
+
+    presets = [preset_size(image_obj, name) for name in settings.RESIZE_PRESETS]
+    cached = set(
+        Resized.objects.filter(
+            cache_key__in=[size["cache_key"] for _, size in presets]
+        ).values_list("cache_key", flat=True)
+    )
+
+    return ResizeJob.objects.bulk_create(
+        [
+            ResizeJob(
+                user=image_obj.user,
+                image=image_obj,
+                quality=size["quality"],
+                width=size["width"],
+                height=size["height"],
+                format=format,
+                cache_key=size["cache_key"],
+            )
+            for format, size in presets
+            if size["cache_key"] not in cached
+        ]
+    )
@@ -0,0 +1,101 @@
+"""
+Host-wide slots.
+
+uWSGI runs several web worker processes, so limits kept in one process's
+memory do not limit the host. HostSlots is a fixed number of slots shared by
+every process on the host: each slot is a file in a directory named after
+the slots and is held with an exclusive fcntl lock on it. The kernel drops
+the lock when its holder closes the file or dies, so a crashed worker never
+leaks a slot. A holder may write a value, like the bytes it reserved, into
+its slot for the others to read.
+
+Locks belong to an open file, so threads of one process holding slots
+through their own files exclude each other like separate processes do.
+"""
+
+import os
+import time
+import fcntl
+import tempfile
+from contextlib import contextmanager
+
+POLL_SECONDS = 0.01
+
+
+class Slot:
+    """A held slot, released by release() or when its process exits."""
+
+    def __init__(self, file):
+        self.file = file
+
+    def release(self):
+        self.file.truncate(0)
+        fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+
+
+class HostSlots:
+    """Fixed number of slots shared by every process on the host."""
+
+    def __init__(self, name, count):
+        self.name = name
+        self.count = count
+        self.path = os.path.join(tempfile.gettempdir(), name)
+        os.makedirs(self.path, exist_ok=True)
+
+    def slot_path(self, slot):
+        return os.path.join(self.path, f"{slot}.slot")
+
+    @contextmanager
+    def guard(self):
+        """Hold the lock of the slots, so reading the held values and taking
+        a slot happen as one step."""
+
+        with open(os.path.join(self.path, "guard"), "a") as guard_file:
+            fcntl.flock(guard_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(guard_file, fcntl.LOCK_UN)
+
+    def try_acquire(self, value=0):
+        """Take a free slot holding value, or return None when all are held."""
+
+        for slot in range(self.count):
+            slot_file = open(self.slot_path(slot), "a+")
+            try:
+                fcntl.flock(slot_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                slot_file.close()
+                continue
+            slot_file.truncate(0)
+            slot_file.write(str(value))
+            slot_file.flush()
+            return Slot(slot_file)
+
+        return None
+
+    def acquire(self, value=0):
+        """Take a slot holding value, waiting until one is free."""
+
+        while True:
+            slot = self.try_acquire(value)
+            if slot is not None:
+                return slot
+            time.sleep(POLL_SECONDS)
+
+    def held(self):
+        """Return the values of the held slots."""
+
+        values = []
+        for slot in range(self.count):
+            with open(self.slot_path(slot), "a+") as slot_file:
+                try:
+                    fcntl.flock(slot_file, fcntl.LOCK_SH | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    slot_file.seek(0)
+                    values.append(int(slot_file.read() or 0))
+                else:
+                    fcntl.flock(slot_file, fcntl.LOCK_UN)
+
+        return values
@@ -0,0 +1,392 @@
+"""
+Image processing functions.
+
+Downscaling uses two shortcuts chosen from the scale ratio and the source
+format:
+
+- JPEG sources are decoded with draft mode, letting libjpeg scale the DCT
+  coefficients by 1/2, 1/4 or 1/8 so the full resolution is never decoded.
+- The remaining reduction is done with an integer-factor reduce followed by
+  the resampling filter (Pillow's reducing_gap).
+
+Both shortcuts keep at least REDUCING_GAP times the target resolution before
+the final filter runs. On photographic content the output stays within
+MAX_MEAN_ERROR of a full-resolution resize (mean absolute difference per
+channel, 0-255 scale).
+
+Sources stored uncompressed (PPM, BMP, uncompressed TIFF) above a pixel
+threshold are never decoded whole. They are read in horizontal bands of
+about STRIP_PIXELS pixels, each band is resampled into its rows of the
+output, and the band is released before the next one is read. Every band
+carries the filter support around its output rows, so the result matches a
+full resize.
+
+Sources read from files are decoded through the decoded cache of the
+process (core.utils.decoded) and the shared memory cache of the host
+(core.utils.shared_cache), so the next size of the same image skips the
+decode when a cached copy has enough resolution for it.
+"""
+
+import os
+import math
+from io import BytesIO
+
+import PIL.Image
+import PIL.features
+
+from core.utils.decoded import get_decoded_cache, image_bytes
+from core.utils.shared_cache import get_shared_cache
+
+REDUCING_GAP = 2.0
+MAX_MEAN_ERROR = 2.0
+PYRAMID_QUALITY = 95
+
+OUTPUT_FORMATS = {
+    "JPEG": ("image/jpeg", "jpg"),
+    "PNG": ("image/png", "png"),
+    "WEBP": ("image/webp", "webp"),
+    "AVIF": ("image/avif", "avif"),
+}
+STRIP_PIXELS = 4_000_000
+STRIP_FORMATS = ("PPM", "BMP")
+STRIP_MODES = ("L", "RGB", "RGBA")
+STRIP_SUPPORT = 2.0
+
+LOSSY_FORMATS = ("JPEG", "WEBP", "AVIF")
+JPEG_MODES = ("1", "L", "RGB", "CMYK")
+
+
+def is_downscale(size, new_size, ratio=REDUCING_GAP):
+    """Check if the new size is at least ratio times smaller on both axes."""
+
+    return size[0] >= new_size[0] * ratio and size[1] >= new_size[1] * ratio
+
+
+def decoded_size(size, format, new_size):
+    """Return the size decode produces for a downscale to the new size."""
+
+    if format != "JPEG" or not is_downscale(size, new_size):
+        return size
+
+    scale = 1
+    while scale < 8 and is_downscale(
+        (size[0] // (scale * 2), size[1] // (scale * 2)), new_size
+    ):
+        scale *= 2
+
+    return -(-size[0] // scale), -(-size[1] // scale)
+
+
+def decode(image, new_width, new_height):
+    """Open and decode an image, skipping the resolution a downscale to the new
+    size does not need."""
+
+    if isinstance(image, bytes):
+        image = BytesIO(image)
+
+    img = PIL.Image.open(image)
+    if img.format == "JPEG" and is_downscale(img.size, (new_width, new_height)):
+        img.draft(
+            img.mode,
+            (int(new_width * REDUCING_GAP), int(new_height * REDUCING_GAP)),
+        )
+    img.load()
+
+    return img
+
+
+def covers(decoded, size, format, new_size):
+    """Check if an image decoded at the decoded size from a source of the
+    given size and format has the resolution decode would produce for the
+    new size."""
+
+    decoded_width, decoded_height = decoded_size(size, format, new_size)
+
+    return decoded[0] >= decoded_width and decoded[1] >= decoded_height
+
+
+def decode_cached(source, new_width, new_height):
+    """Decode a source through the decoded cache of the process, then the
+    shared cache of the host, when it is a file. Returns the image and
+    whether it is cached; a cached image is shared with later resizes, so it
+    must not be closed or modified."""
+
+    cache = get_decoded_cache()
+    shared = get_shared_cache()
+    if not isinstance(source, str) or not (cache.max_bytes or shared):
+        return decode(source, new_width, new_height), False
+
+    new_size = (new_width, new_height)
+    key = (source, os.stat(source).st_mtime_ns)
+    if cache.max_bytes:
+        entry = cache.get(
+            key, lambda entry: covers(entry[0].size, *entry[1:], new_size)
+        )
+        if entry:
+            return entry[0], True
+    if shared:
+        entry = shared.get(key, lambda *entry: covers(*entry, new_size))
+        if entry:
+            return entry[0], True
+
+    img = decode(source, new_width, new_height)
+    with PIL.Image.open(source) as original:
+        entry = (img, original.size, original.format)
+    # Sources in the shared cache are not held a second time per process.
+    if shared and shared.put(key, entry):
+        return img, False
+
+    return img, bool(cache.max_bytes) and cache.put(key, entry, image_bytes(img))
+
+
+def downscale(img, new_width, new_height):
+    """Resize a decoded image, reducing it by an integer factor first when the
+    new size is small enough."""
+
+    if is_downscale(img.size, (new_width, new_height)):
+        resized = img.resize((new_width, new_height), reducing_gap=REDUCING_GAP)
+    else:
+        resized = img.resize((new_width, new_height))
+
+    # Images mapped from the shared cache keep RGB pixels padded to RGBX.
+    return resized.convert("RGB") if resized.mode == "RGBX" else resized
+
+
+def strip_layout(img):
+    """Return the offset, raw mode, row stride and row order of an opened
+    image whose pixels are stored uncompressed in one block, or None."""
+
+    if len(img.tile) != 1 or img.mode not in STRIP_MODES:
+        return None
+
+    decoder, box, offset, args = img.tile[0]
+    if decoder != "raw" or tuple(box) != (0, 0) + img.size:
+        return None
+
+    if isinstance(args, str):
+        args = (args,)
+    rawmode, stride, ystep = (tuple(args) + (0, 1))[:3]
+    if not stride:
+        stride = len(PIL.Image.new(img.mode, (img.width, 1)).tobytes("raw", rawmode))
+
+    return offset, rawmode, stride, ystep
+
+
+def read_band(path, img, layout, top, bottom):
+    """Read the rows from top to bottom of an uncompressed image."""
+
+    offset, rawmode, stride, ystep = layout
+    first = top if ystep > 0 else img.height - bottom
+    with open(path, "rb") as file:
+        file.seek(offset + first * stride)
+        data = file.read((bottom - top) * stride)
+
+    return PIL.Image.frombuffer(
+        img.mode, (img.width, bottom - top), data, "raw", rawmode, stride, ystep
+    )
+
+
+def resize_strips(path, img, layout, new_width, new_height, strip_pixels=STRIP_PIXELS):
+    """Resize an uncompressed image band by band, holding one band of about
+    strip_pixels source pixels and the output in memory."""
+
+    scale = img.height / new_height
+    margin = STRIP_SUPPORT * max(scale, 1.0) + 1
+    band_rows = max(1, strip_pixels // img.width)
+    rows = max(1, int((band_rows - 2 * margin) / scale))
+
+    resized = PIL.Image.new(img.mode, (new_width, new_height))
+    for top in range(0, new_height, rows):
+        bottom = min(top + rows, new_height)
+        source_top, source_bottom = top * scale, bottom * scale
+        band_top = max(0, int(source_top - margin))
+        band_bottom = min(img.height, math.ceil(source_bottom + margin))
+        band = read_band(path, img, layout, band_top, band_bottom)
+        resized.paste(
+            band.resize(
+                (new_width, bottom - top),
+                box=(0, source_top - band_top, img.width, source_bottom - band_top),
+            ),
+            (0, top),
+        )
+        band.close()
+
+    return resized
+
+
+def open_strips(source, strip_threshold):
+    """Open a source for a strip resize, returning the image and its layout
+    when it is a file above strip_threshold pixels stored uncompressed, or
+    None."""
+
+    if strip_threshold is None or not isinstance(source, str):
+        return None
+
+    img = PIL.Image.open(source)
+    if img.width * img.height > strip_threshold:
+        layout = strip_layout(img)
+        if layout:
+            return img, layout
+    img.close()
+
+    return None
+
+
+def can_encode(format):
+    """Check if Pillow can write the format. WebP needs libwebp, AVIF needs a
+    plugin such as pillow-avif-plugin."""
+
+    if format == "WEBP":
+        return PIL.features.check("webp")
+
+    PIL.Image.init()
+    return format in PIL.Image.SAVE
+
+
+def encode(img, format, quality):
+    """Encode an image into an in-memory buffer."""
+
+    if format == "JPEG" and img.mode not in JPEG_MODES:
+        img = img.convert("RGB")
+
+    buffer = BytesIO()
+    img.save(buffer, format=format, quality=quality)
+
+    return buffer
+
+
+def encode_within(img, format, max_quality, max_bytes):
+    """Encode an image at the highest quality up to max_quality whose output
+    fits in max_bytes, bisecting over in-memory encodes of the same pixels.
+    Returns the buffer and the quality, or (None, None) if nothing fits."""
+
+    buffer = encode(img, format, max_quality)
+    if buffer.getbuffer().nbytes <= max_bytes:
+        return buffer, max_quality
+
+    best = (None, None)
+    low, high = 1, max_quality - 1
+    while low <= high:
+        quality = (low + high) // 2
+        buffer = encode(img, format, quality)
+        if buffer.getbuffer().nbytes <= max_bytes:
+            best = (buffer, quality)
+            low = quality + 1
+        else:
+            high = quality - 1
+
+    return best
+
+
+def render(source, sizes, format, strip_threshold=None, cacheable=True):
+    """Decode a source once and return the encoded bytes and quality of every
+    size, given as (width, height, quality, max_bytes) tuples. With max_bytes
+    the quality is the highest one fitting the budget and the bytes are None
+    if no quality does. Files stored uncompressed above strip_threshold pixels
+    are resized in strips. Sources that are not cacheable, like uploads read
+    once from their spool file, skip the decoded caches. Runs inside the
+    resize executor, so it takes and returns plain picklable values."""
+
+    strips = open_strips(source, strip_threshold)
+    cached = False
+    new_width = max(size[0] for size in sizes)
+    new_height = max(size[1] for size in sizes)
+    if strips:
+        img, layout = strips
+    elif cacheable:
+        img, cached = decode_cached(source, new_width, new_height)
+    else:
+        img = decode(source, new_width, new_height)
+    rendered = []
+    for new_width, new_height, quality, max_bytes in sizes:
+        if strips:
+            img_resized = resize_strips(source, img, layout, new_width, new_height)
+        else:
+            img_resized = downscale(img, new_width, new_height)
+        if max_bytes:
+            buffer, quality = encode_within(img_resized, format, quality, max_bytes)
+        else:
+            buffer = encode(img_resized, format, quality)
+        rendered.append((buffer.getvalue() if buffer else None, quality))
+        img_resized.close()
+    if not cached:
+        img.close()
+
+    return rendered
+
+
+def render_batch(sources, sizes, strip_threshold=None):
+    """Return, for every size given as (width, height, quality, format), the
+    encoded bytes of every source, rendering each source once per format with
+    render. Lets a batch of images take one executor job."""
+
+    rendered = [[None] * len(sources) for _ in sizes]
+    formats = {}
+    for index, (new_width, new_height, quality, format) in enumerate(sizes):
+        formats.setdefault(format, []).append(index)
+    for position, source in enumerate(sources):
+        for format, indexes in formats.items():
+            results = render(
+                source,
+                [
+                    (sizes[index][0], sizes[index][1], sizes[index][2], None)
+                    for index in indexes
+                ],
+                format,
+                strip_threshold,
+            )
+            for index, (data, _) in zip(indexes, results):
+                rendered[index][position] = data
+
+    return rendered
+
+
+def reducible(img):
+    """Return an image in a mode reduce supports, converting palette, bilevel
+    and 16-bit images without losing colours, transparency or depth."""
+
+    if img.mode in ("P", "PA"):
+        transparent = img.mode == "PA" or "transparency" in img.info
+        return img.convert("RGBA" if transparent else "RGB")
+    if img.mode == "1":
+        return img.convert("L")
+    if img.mode.startswith("I;16"):
+        return img.convert("I")
+
+    return img
+
+
+def render_pyramid(source, levels, format, strip_threshold=None):
+    """Decode a source once and return the encoded bytes of up to levels
+    copies, each halving the previous one, as (width, height, bytes) tuples.
+    Stops early when a level would be smaller than one pixel. Files stored
+    uncompressed above strip_threshold pixels are halved in strips first."""
+
+    strips = open_strips(source, strip_threshold)
+    if strips:
+        img, layout = strips
+    else:
+        opened = PIL.Image.open(
+            BytesIO(source) if isinstance(source, bytes) else source
+        )
+        opened.load()
+        img = reducible(opened)
+        if img is not opened:
+            opened.close()
+    rendered = []
+    for _ in range(levels):
+        if img.width < 2 or img.height < 2:
+            break
+        if strips:
+            level = resize_strips(source, img, layout, img.width // 2, img.height // 2)
+            strips = None
+        else:
+            level = img.reduce(2)
+        img.close()
+        img = level
+        rendered.append(
+            (img.width, img.height, encode(img, format, PYRAMID_QUALITY).getvalue())
+        )
+    img.close()
+
+    return rendered
@@ -0,0 +1,90 @@
+"""
+Per-user response cache.
+
+Cached responses are keyed on the user, a generation of that user and the
+view, path, query string and renderer of the request, so one user's data is
+never served to another. Every write to a user's images or resized images
+replaces the generation (core.signals), which orphans all their cached
+responses at once; orphans expire after RESPONSE_CACHE_SECONDS. Generations
+are random tokens rather than counters, so a generation evicted from the
+cache can never come back with the value of an older one.
+
+On a miss only one request per key builds the response. It holds a lock
+added with cache.add, the others poll for its result for up to
+RESPONSE_CACHE_LOCK_SECONDS before building it themselves.
+"""
+
+import time
+import uuid
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+
+POLL_SECONDS = 0.05
+
+
+def get_cache():
+    """Return the cache backend of the response cache."""
+
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def generation_key(user_id):
+    return f"response:{user_id}:generation"
+
+
+def get_generation(user_id):
+    """Return the current generation of a user, starting one if needed."""
+
+    cache = get_cache()
+    generation = cache.get(generation_key(user_id))
+    if generation is None:
+        cache.add(generation_key(user_id), uuid.uuid4().hex, None)
+        generation = cache.get(generation_key(user_id))
+
+    return generation
+
+
+def bump_generation(user_id):
+    """Invalidate every cached response of a user."""
+
+    get_cache().set(generation_key(user_id), uuid.uuid4().hex, None)
+
+
+def response_key(user_id, *parts):
+    """Return the cache key of a response of a user identified by parts."""
+
+    digest = hashlib.sha256(repr(parts).encode()).hexdigest()
+
+    return f"response:{user_id}:{get_generation(user_id)}:{digest}"
+
+
+def get_or_build(key, build):
+    """Return the cached value of a key and True, or build it and return it
+    with False. build returns the value and whether it may be cached. One
+    caller per key builds at a time; the others wait for its value."""
+
+    cache = get_cache()
+    value = cache.get(key)
+    if value is not None:
+        return value, True
+
+    lock_key = f"{key}:lock"
+    locked = cache.add(lock_key, 1, settings.RESPONSE_CACHE_LOCK_SECONDS)
+    if not locked:
+        deadline = time.monotonic() + settings.RESPONSE_CACHE_LOCK_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(POLL_SECONDS)
+            value = cache.get(key)
+            if value is not None:
+                return value, True
+
+    try:
+        value, cacheable = build()
+        if cacheable:
+            cache.set(key, value, settings.RESPONSE_CACHE_SECONDS)
+        return value, False
+    finally:
+        if locked:
+            cache.delete(lock_key)
@@ -0,0 +1,312 @@
+"""
+Shared memory cache of decoded images.
+
+uWSGI runs several worker processes, each with its own resize pool, so the
+per-process decoded cache holds the same sources many times and hits
+rarely. This cache keeps decoded pixels in POSIX shared memory that every
+process on the host maps without copying:
+
+- Every image is one segment holding its raw pixels: L, RGBA, or RGB padded
+  to RGBX, which are the layouts Pillow maps in place.
+- A small index segment has a header with the host-wide counters and a
+  fixed table of slots, one per cached image. It is only read and written
+  under an exclusive fcntl lock on a file next to it.
+- Inserts evict the least recently used slots until the image fits under
+  the byte cap. Evicted segments are unlinked; processes still reading one
+  keep their mapping until they let it go.
+- Segments outlive the process that created them, so they are removed from
+  the multiprocessing resource tracker, which would unlink them at exit.
+"""
+
+import os
+import fcntl
+import struct
+import hashlib
+import secrets
+import tempfile
+import threading
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+
+import PIL.Image
+
+HEADER = struct.Struct("<4sIQQQQQ")
+SLOT = struct.Struct("<32s64sIIQQII8s4s")
+MAGIC = b"IRC1"
+MODES = {"L": ("L", 1), "RGBA": ("RGBA", 4), "RGB": ("RGBX", 4)}
+
+
+class Segment(shared_memory.SharedMemory):
+    """Shared memory segment that stays mapped while images still read it."""
+
+    def __del__(self):
+        try:
+            self.close()
+        except BufferError:
+            pass
+
+
+def create_segment(name, size):
+    """Create a segment that stays until it is unlinked."""
+
+    segment = Segment(name, create=True, size=size)
+    resource_tracker.unregister(segment._name, "shared_memory")
+
+    return segment
+
+
+def attach_segment(name):
+    """Map an existing segment without tracking it."""
+
+    segment = Segment(name)
+    resource_tracker.unregister(segment._name, "shared_memory")
+
+    return segment
+
+
+def unlink_segment(name):
+    """Remove a segment, ignoring one that is already gone."""
+
+    try:
+        segment = shared_memory.SharedMemory(name)
+    except FileNotFoundError:
+        return
+    segment.close()
+    segment.unlink()
+
+
+class SharedDecodedCache:
+    """Host-wide LRU cache of decoded images in shared memory."""
+
+    def __init__(self, name, max_bytes, slots):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.slots = slots
+        self.lock_path = os.path.join(tempfile.gettempdir(), f"{name}.lock")
+        self._index = None
+        self._attached = {}
+        self._thread_lock = threading.Lock()
+
+    @contextmanager
+    def locked(self):
+        """Hold the index lock of the host and yield the mapped index."""
+
+        with self._thread_lock, open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield self._open_index()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def get(self, key, fits=None):
+        """Return the cached (image, source size, source format) entry of a
+        key, or None when it is missing or fits(size, source size, source
+        format) is false. The image maps the shared pixels, so it is
+        read-only."""
+
+        digest = hashlib.sha256(repr(key).encode()).digest()
+        with self.locked() as index:
+            magic, slots, hits, misses, evictions, used, clock = self._header(index)
+            table = [self._slot(index, slot) for slot in range(slots)]
+            found = next(
+                (
+                    slot
+                    for slot, fields in enumerate(table)
+                    if fields[0] == digest and fields[4]
+                ),
+                None,
+            )
+            entry = None if found is None else self._entry(table[found])
+            if entry is None or (fits is not None and not fits(*entry[2:])):
+                self._write_header(index, hits, misses + 1, evictions, used, clock)
+                return None
+            fields = table[found]
+            self._write_header(index, hits + 1, misses, evictions, used, clock + 1)
+            self._write_slot(index, found, *fields[:5], clock + 1, *fields[6:])
+            segment = self._attach(fields[1].rstrip(b"\0").decode())
+            self._sweep(table)
+
+        mode, rawmode, size, source_size, format = entry
+        img = PIL.Image.frombuffer(mode, size, segment.buf, "raw", rawmode, 0, 1)
+
+        return img, source_size, format
+
+    def put(self, key, entry):
+        """Cache an (image, source size, source format) entry, evicting the
+        least recently used ones until it fits. Returns whether it was
+        cached."""
+
+        img, source_size, format = entry
+        if img.mode not in MODES:
+            return False
+        rawmode, pixel_bytes = MODES[img.mode]
+        size = img.width * img.height * pixel_bytes
+        if size > self.max_bytes:
+            return False
+
+        digest = hashlib.sha256(repr(key).encode()).digest()
+        name = f"{self.name}-{secrets.token_hex(8)}"
+        segment = create_segment(name, size)
+        segment.buf[:size] = img.tobytes("raw", rawmode)
+        segment.close()
+
+        with self.locked() as index:
+            magic, slots, hits, misses, evictions, used, clock = self._header(index)
+            table = [self._slot(index, slot) for slot in range(slots)]
+            if any(fields[0] == digest and fields[4] for fields in table):
+                unlink_segment(name)
+                return True
+
+            free = [slot for slot, fields in enumerate(table) if not fields[4]]
+            by_age = sorted(
+                (fields[5], slot) for slot, fields in enumerate(table) if fields[4]
+            )
+            while by_age and (not free or used + size > self.max_bytes):
+                _, slot = by_age.pop(0)
+                unlink_segment(table[slot][1].rstrip(b"\0").decode())
+                used -= table[slot][4]
+                evictions += 1
+                self._write_slot(index, slot, *self._empty_slot())
+                free.append(slot)
+
+            self._write_slot(
+                index,
+                free[0],
+                digest,
+                name.encode(),
+                img.width,
+                img.height,
+                size,
+                clock + 1,
+                *source_size,
+                (format or "").encode(),
+                img.mode.encode(),
+            )
+            self._write_header(index, hits, misses, evictions, used + size, clock + 1)
+            self._sweep([self._slot(index, slot) for slot in range(slots)])
+
+        return True
+
+    def stats(self):
+        """Return the size and host-wide counters of the cache."""
+
+        with self.locked() as index:
+            magic, slots, hits, misses, evictions, used, clock = self._header(index)
+            entries = sum(1 for slot in range(slots) if self._slot(index, slot)[4])
+
+        return {
+            "max_bytes": self.max_bytes,
+            "bytes": used,
+            "entries": entries,
+            "slots": slots,
+            "hits": hits,
+            "misses": misses,
+            "evictions": evictions,
+        }
+
+    def clear(self):
+        """Unlink every segment of the cache, including its index."""
+
+        with self.locked() as index:
+            slots = self._header(index)[1]
+            for slot in range(slots):
+                fields = self._slot(index, slot)
+                if fields[4]:
+                    unlink_segment(fields[1].rstrip(b"\0").decode())
+            self._index = None
+            index.close()
+            unlink_segment(f"{self.name}-index")
+        self._sweep([])
+
+    def _open_index(self):
+        if self._index is not None:
+            return self._index
+
+        size = HEADER.size + self.slots * SLOT.size
+        try:
+            index = create_segment(f"{self.name}-index", size)
+            index.buf[: HEADER.size] = HEADER.pack(MAGIC, self.slots, 0, 0, 0, 0, 0)
+        except FileExistsError:
+            index = attach_segment(f"{self.name}-index")
+        self._index = index
+
+        return index
+
+    def _header(self, index):
+        return HEADER.unpack_from(index.buf, 0)
+
+    def _write_header(self, index, hits, misses, evictions, used, clock):
+        slots = self._header(index)[1]
+        HEADER.pack_into(
+            index.buf, 0, MAGIC, slots, hits, misses, evictions, used, clock
+        )
+
+    def _slot(self, index, slot):
+        return SLOT.unpack_from(index.buf, HEADER.size + slot * SLOT.size)
+
+    def _write_slot(self, index, slot, *fields):
+        SLOT.pack_into(index.buf, HEADER.size + slot * SLOT.size, *fields)
+
+    def _empty_slot(self):
+        return b"", b"", 0, 0, 0, 0, 0, 0, b"", b""
+
+    def _entry(self, fields):
+        _, _, width, height, _, _, source_width, source_height, format, mode = fields
+        mode = mode.rstrip(b"\0").decode()
+        if mode not in MODES:
+            return None
+
+        return (
+            mode,
+            MODES[mode][0],
+            (width, height),
+            (source_width, source_height),
+            format.rstrip(b"\0").decode() or None,
+        )
+
+    def _attach(self, name):
+        segment = self._attached.get(name)
+        if segment is None:
+            segment = self._attached[name] = attach_segment(name)
+
+        return segment
+
+    def _sweep(self, table):
+        """Let go of mapped segments that were evicted and are not read."""
+
+        names = {fields[1].rstrip(b"\0").decode() for fields in table if fields[4]}
+        for name in list(self._attached):
+            if name in names:
+                continue
+            try:
+                self._attached[name].close()
+            except BufferError:
+                continue
+            del self._attached[name]
+
+
+_cache = None
+_config = None
+_cache_lock = threading.Lock()
+
+
+def configure_shared_cache(name, max_bytes, slots):
+    """Set up the shared cache of the current process; no name or no bytes
+    turns it off."""
+
+    global _cache, _config
+
+    with _cache_lock:
+        if _config == (name, max_bytes, slots):
+            return
+        _config = (name, max_bytes, slots)
+        _cache = (
+            SharedDecodedCache(name, max_bytes, slots) if name and max_bytes else None
+        )
+
+
+def get_shared_cache():
+    """Return the shared cache of the current process, or None when it is
+    turned off."""
+
+    return _cache
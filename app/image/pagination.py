@@ -0,0 +1,20 @@
+"""
+Pagination for the image API.
+"""
+
+from django.conf import settings
+
+from rest_framework.pagination import CursorPagination
+
+
+class IdCursorPagination(CursorPagination):
+    """Keyset pagination over the id of the rows of one user, newest first.
+    Every page is a range scan of the (user, id) index, however deep the
+    cursor goes."""
+
+    ordering = "-id"
+    page_size_query_param = "page_size"
+
+    def __init__(self):
+        self.page_size = settings.API_PAGE_SIZE
+        self.max_page_size = settings.API_MAX_PAGE_SIZE
@@ -2,16 +2,57 @@
 Serilizers for image API.
 """
 
+from django.conf import settings
+from django.db import models
+
 from rest_framework import serializers
-from core.models import Image, Resized
+from core.models import Image, Resized, ResizeJob
+from core.utils.exceptions import ImageTooLarge
 
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema_field
 
 
+class ProbedImageField(serializers.ImageField):
+    """Image field rejecting uploads the header probe of the streaming upload
+    handler found too large before Pillow verifies the rest."""
+
+    def to_internal_value(self, data):
+        if getattr(data, "oversized", False):
+            raise ImageTooLarge()
+
+        return super().to_internal_value(data)
+
+
+class SparseFieldsetMixin:
+    """Serialize only the fields named in the comma separated fields query
+    parameter, when it is given."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get("request")
+        requested = request and request.query_params.get("fields")
+        if not requested:
+            return
+
+        names = {name.strip() for name in requested.split(",") if name.strip()}
+        unknown = names - set(self.fields)
+        if unknown:
+            raise serializers.ValidationError(
+                {"fields": f"Unknown fields: {', '.join(sorted(unknown))}."}
+            )
+        for name in set(self.fields) - names:
+            self.fields.pop(name)
+
+
 class CreateImageSerializer(serializers.ModelSerializer):
     """Serializer for creating images."""
 
+    serializer_field_mapping = {
+        **serializers.ModelSerializer.serializer_field_mapping,
+        models.ImageField: ProbedImageField,
+    }
+
     class Meta:
         model = Image
         fields = ["id", "image", "description"]
@@ -19,7 +60,7 @@ class CreateImageSerializer(serializers.ModelSerializer):
         extra_kwargs = {"image": {"required": True}}
 
 
-class ListImageSerializer(serializers.ModelSerializer):
+class ListImageSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for viewing images details."""
 
     class Meta:
@@ -73,7 +114,7 @@ class UpdateImageSerializer(serializers.ModelSerializer):
         read_only_fields = ["id"]
 
 
-class ListResizedSerializer(serializers.ModelSerializer):
+class ListResizedSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for thumbnails."""
 
     name = serializers.SerializerMethodField()
@@ -121,7 +162,7 @@ class DetailResizedSerializer(serializers.ModelSerializer):
 
     @extend_schema_field(OpenApiTypes.STR)
     def get_image_id(self, obj):
-        return obj.image.id
+        return obj.image_id
 
     @extend_schema_field(OpenApiTypes.STR)
     def get_name(self, obj):
@@ -129,7 +170,7 @@ class DetailResizedSerializer(serializers.ModelSerializer):
 
     @extend_schema_field(OpenApiTypes.STR)
     def get_format(self, obj):
-        return obj.image.format
+        return obj.format or obj.image.format
 
     @extend_schema_field(OpenApiTypes.STR)
     def get_owner(self, obj):
@@ -150,6 +191,73 @@ class DetailResizedSerializer(serializers.ModelSerializer):
         return obj.image.description
 
 
+class BatchSizeSerializer(serializers.Serializer):
+    """Serializer for one target size of a batch resize."""
+
+    percent = serializers.IntegerField(min_value=1, required=False)
+    width = serializers.IntegerField(min_value=1, required=False)
+    height = serializers.IntegerField(min_value=1, required=False)
+    quality = serializers.IntegerField(min_value=1, max_value=100, default=75)
+    max_bytes = serializers.IntegerField(min_value=1, required=False)
+
+    def validate(self, attrs):
+        percent = attrs.get("percent")
+        width = attrs.get("width")
+        height = attrs.get("height")
+
+        if not (percent or width or height):
+            raise serializers.ValidationError("A new size must be specified.")
+
+        if percent and (width or height):
+            raise serializers.ValidationError(
+                "Either the percentage or the new size must be given, not both."
+            )
+
+        return attrs
+
+
+class BatchResizeSerializer(serializers.Serializer):
+    """Serializer for resizing an image to many sizes at once."""
+
+    sizes = BatchSizeSerializer(many=True, allow_empty=False)
+    format = serializers.CharField(required=False)
+
+    def validate_sizes(self, value):
+        if len(value) > settings.RESIZE_BATCH_MAX_SIZES:
+            raise serializers.ValidationError(
+                f"At most {settings.RESIZE_BATCH_MAX_SIZES} sizes can be given."
+            )
+
+        return value
+
+
+class ResizeJobSerializer(serializers.ModelSerializer):
+    """Serializer for viewing resize jobs."""
+
+    resolution = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ResizeJob
+        fields = [
+            "id",
+            "image",
+            "resized",
+            "status",
+            "resolution",
+            "quality",
+            "format",
+            "max_bytes",
+            "error",
+            "created_at",
+            "finished_at",
+        ]
+        read_only_fields = fields
+
+    @extend_schema_field(OpenApiTypes.STR)
+    def get_resolution(self, obj):
+        return f"{obj.width}x{obj.height}px"
+
+
 class LinkSerializer(serializers.ModelSerializer):
     """Serializer for generating links."""
 
@@ -0,0 +1,152 @@
+"""
+Tests for pixel budget admission of the image endpoints.
+"""
+
+import tempfile
+from unittest.mock import patch
+
+import PIL.Image
+
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core import models
+from core.utils.admission import get_pixel_budget
+
+IMAGE_URL = reverse("image:image-list")
+RESIZED_CREATE_URL = reverse("image:resized-create")
+METRICS_URL = reverse("image:metrics")
+
+
+def resized_get_url(id):
+    """Create and return a resize URL."""
+
+    return reverse("image:resized-get", args=[id])
+
+
+def create_image_file(width=40, height=20):
+    """Create and return a temporary JPEG file."""
+
+    image_file = tempfile.NamedTemporaryFile(suffix=".jpg")
+    PIL.Image.new("RGB", (width, height)).save(image_file, format="JPEG")
+    image_file.seek(0)
+
+    return image_file
+
+
+@override_settings(RESIZE_EXECUTOR_WORKERS=0, RESIZE_PRESETS_EAGER=False)
+class AdmissionTests(TestCase):
+    """Test rejecting and queueing resizes above the pixel budget."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="test@example.com",
+            name="test",
+            password="test1234",
+        )
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        for resized in models.Resized.objects.filter(user=self.user):
+            resized.delete()
+        for image in models.Image.objects.filter(user=self.user):
+            image.delete()
+
+    def upload(self):
+        with create_image_file() as image_file:
+            response = self.client.post(
+                IMAGE_URL, {"image": image_file}, format="multipart"
+            )
+        return response.data["id"]
+
+    @override_settings(IMAGE_MAX_SOURCE_PIXELS=500)
+    def test_upload_above_source_limit(self):
+        """Test an upload with too many pixels is rejected before storing."""
+
+        with create_image_file() as image_file:
+            response = self.client.post(
+                IMAGE_URL, {"image": image_file}, format="multipart"
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertFalse(models.Image.objects.exists())
+
+    def test_decompression_bomb_upload(self):
+        """Test an upload Pillow refuses to open is rejected as too large."""
+
+        with patch.object(
+            PIL.Image, "MAX_IMAGE_PIXELS", 100
+        ), create_image_file() as image_file:
+            response = self.client.post(
+                RESIZED_CREATE_URL + "?width=10",
+                {"image": image_file},
+                format="multipart",
+                HTTP_HOST="testserver",
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertFalse(models.Image.objects.exists())
+
+    @override_settings(IMAGE_MAX_TARGET_PIXELS=10000)
+    def test_upscale_above_target_limit(self):
+        """Test an upscale with too many pixels is rejected."""
+
+        image_id = self.upload()
+
+        response = self.client.get(
+            f"{resized_get_url(image_id)}?percent=1000", HTTP_HOST="testserver"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertFalse(models.Resized.objects.exists())
+
+    @override_settings(RESIZE_MEMORY_BUDGET=100000, RESIZE_BUDGET_RETRY_AFTER=7)
+    def test_full_budget_rejects_resize(self):
+        """Test a resize above the free budget returns 429 with Retry-After."""
+
+        image_id = self.upload()
+
+        with get_pixel_budget().reserve(99000):
+            response = self.client.get(
+                f"{resized_get_url(image_id)}?width=20", HTTP_HOST="testserver"
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response["Retry-After"], "7")
+        self.assertEqual(get_pixel_budget().stats()["rejected"], 1)
+
+    @override_settings(RESIZE_MEMORY_BUDGET=100000, RESIZE_BUDGET_OVERFLOW="queue")
+    def test_full_budget_queues_resize(self):
+        """Test a resize above the free budget is queued when configured."""
+
+        image_id = self.upload()
+
+        with get_pixel_budget().reserve(99000):
+            response = self.client.get(
+                f"{resized_get_url(image_id)}?width=20", HTTP_HOST="testserver"
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertTrue(
+            models.ResizeJob.objects.filter(id=response.data["job_id"]).exists()
+        )
+
+    @override_settings(RESIZE_MEMORY_BUDGET=100000)
+    def test_budget_in_metrics(self):
+        """Test the metrics report the use of the budget."""
+
+        admin = get_user_model().objects.create_superuser(
+            "admin@example.com", "admin", "test1234"
+        )
+        self.client.force_authenticate(admin)
+
+        with get_pixel_budget().reserve(25000):
+            response = self.client.get(METRICS_URL)
+
+        self.assertEqual(response.data["pixel_budget"]["in_use"], 25000)
+        self.assertEqual(response.data["pixel_budget"]["utilization"], 0.25)
@@ -0,0 +1,82 @@
+"""
+Tests for serving the image views as coroutines under ASGI.
+"""
+
+import asyncio
+import tempfile
+import threading
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+from PIL import Image
+
+from django.test import TransactionTestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from rest_framework import status
+
+from core import models
+from image import views
+
+IMAGE_URL = reverse("image:image-list")
+
+
+@override_settings(RESIZE_EXECUTOR_WORKERS=0, RESIZE_PRESETS_EAGER=False)
+class AsyncViewTests(TransactionTestCase):
+    """Test the image views run in the view pool in ASGI mode."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="test@example.com",
+            name="test",
+            password="test1234",
+        )
+        self.client.force_authenticate(self.user)
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as image_file:
+            Image.new("RGB", (40, 20)).save(image_file, format="JPEG")
+            image_file.seek(0)
+            response = self.client.post(
+                IMAGE_URL, {"image": image_file}, format="multipart"
+            )
+        self.image_id = response.data["id"]
+
+    def tearDown(self):
+        for resized in models.Resized.objects.filter(user=self.user):
+            resized.delete()
+        for image in models.Image.objects.filter(user=self.user):
+            image.delete()
+
+    def test_wsgi_mode_keeps_sync_views(self):
+        """Test views stay synchronous outside of ASGI mode."""
+
+        view = views.GetResizedAPIView.as_view()
+
+        self.assertFalse(asyncio.iscoroutinefunction(view))
+
+    @override_settings(SERVER_MODE="asgi")
+    def test_asgi_mode_runs_view_in_pool(self):
+        """Test a resize runs its view, queries included, in the view pool."""
+
+        view = views.GetResizedAPIView.as_view()
+        url = reverse("image:resized-get", args=[self.image_id])
+        request = APIRequestFactory().get(f"{url}?width=20", HTTP_HOST="testserver")
+        force_authenticate(request, self.user)
+        threads = []
+
+        def resize_image(*args):
+            threads.append(threading.current_thread().name)
+            return original(*args)
+
+        original = views.resize_image
+        with patch.object(views, "resize_image", side_effect=resize_image):
+            response = async_to_sync(view)(request, pk=self.image_id)
+
+        self.assertTrue(asyncio.iscoroutinefunction(view))
+        self.assertIs(view.cls, views.GetResizedAPIView)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.is_rendered)
+        self.assertTrue(threads[0].startswith("view"))
+        self.assertTrue(models.Resized.objects.filter(id=response.data["id"]).exists())
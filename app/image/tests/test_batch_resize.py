@@ -0,0 +1,161 @@
+"""
+Tests for the batch resize API.
+"""
+
+import tempfile
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core import models
+from core.utils import processing
+
+IMAGE_URL = reverse("image:image-list")
+
+
+def resized_batch_url(id):
+    """Create and return a batch resize URL."""
+
+    return reverse("image:resized-batch", args=[id])
+
+
+class BatchResizeAPITests(TestCase):
+    """Test resizing one image to many sizes."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="test@example.com",
+            name="test",
+            password="test1234",
+        )
+        self.client.force_authenticate(self.user)
+
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as image_file:
+            img = Image.new("RGB", (400, 200))
+            img.save(image_file, format="JPEG")
+            image_file.seek(0)
+            response = self.client.post(
+                IMAGE_URL, {"image": image_file}, format="multipart"
+            )
+        self.image_id = response.data["id"]
+        self.url = resized_batch_url(self.image_id)
+
+    def tearDown(self):
+        for resized in models.Resized.objects.filter(user=self.user):
+            resized.delete()
+        for image in models.Image.objects.filter(user=self.user):
+            image.delete()
+
+    @override_settings(RESIZE_EXECUTOR_WORKERS=0)
+    def test_batch_resize_decodes_once(self):
+        """Test all sizes are created from a single decode and one insert."""
+
+        payload = {
+            "sizes": [
+                {"width": 50},
+                {"width": 100, "quality": 60},
+                {"percent": 50},
+                {"width": 30, "height": 30},
+            ]
+        }
+        with patch.object(
+            processing, "decode", wraps=processing.decode
+        ) as patched_decode, self.assertNumQueries(4):
+            response = self.client.post(
+                self.url, payload, format="json", HTTP_HOST="testserver"
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        patched_decode.assert_called_once()
+        resolutions = [resized["resolution"] for resized in response.data["resized"]]
+        self.assertEqual(resolutions, ["50x25px", "100x50px", "200x100px", "30x30px"])
+        self.assertEqual(models.Resized.objects.count(), 4)
+        for resized in response.data["resized"]:
+            self.assertTrue(resized["resized_image"].startswith("http://testserver/"))
+
+    def test_batch_resize_reuses_cached_sizes(self):
+        """Test cached derivatives are returned instead of being recreated."""
+
+        first = self.client.post(
+            self.url, {"sizes": [{"width": 50}]}, format="json", HTTP_HOST="testserver"
+        )
+        second = self.client.post(
+            self.url,
+            {"sizes": [{"width": 50}, {"width": 80}]},
+            format="json",
+            HTTP_HOST="testserver",
+        )
+
+        self.assertEqual(
+            first.data["resized"][0]["id"], second.data["resized"][0]["id"]
+        )
+        self.assertEqual(models.Resized.objects.count(), 2)
+
+    @override_settings(RESIZE_EXECUTOR_WORKERS=0)
+    def test_batch_resize_clamped_qualities(self):
+        """Test sizes differing only in qualities clamped to the same value
+        share a derivative reporting the quality it was encoded at."""
+
+        response = self.client.post(
+            self.url,
+            {"sizes": [{"width": 50, "quality": 96}, {"width": 50, "quality": 99}]},
+            format="json",
+            HTTP_HOST="testserver",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        first, second = response.data["resized"]
+        self.assertEqual(first["id"], second["id"])
+        self.assertEqual((first["quality"], second["quality"]), (95, 95))
+        self.assertEqual(models.Resized.objects.get().quality, 95)
+
+    def test_batch_resize_invalid_size(self):
+        """Test a size with both percent and width is rejected."""
+
+        response = self.client.post(
+            self.url,
+            {"sizes": [{"width": 50, "percent": 10}]},
+            format="json",
+            HTTP_HOST="testserver",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(models.Resized.objects.count(), 0)
+
+    @override_settings(RESIZE_BATCH_MAX_SIZES=2)
+    def test_batch_resize_too_many_sizes(self):
+        """Test the number of sizes is limited."""
+
+        response = self.client.post(
+            self.url,
+            {"sizes": [{"width": 10}, {"width": 20}, {"width": 30}]},
+            format="json",
+            HTTP_HOST="testserver",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_batch_resize_of_other_user(self):
+        """Test another user cannot resize the image."""
+
+        other = get_user_model().objects.create_user(
+            email="other@example.com",
+            name="other",
+            password="test1234",
+        )
+        self.client.force_authenticate(other)
+
+        response = self.client.post(
+            self.url, {"sizes": [{"width": 50}]}, format="json", HTTP_HOST="testserver"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(models.Resized.objects.count(), 0)
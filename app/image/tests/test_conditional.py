@@ -0,0 +1,169 @@
+"""
+Tests for conditional GETs of images and resized images.
+"""
+
+import time
+import tempfile
+
+from PIL import Image
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils.http import http_date
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core import models
+
+IMAGE_URL = reverse("image:image-list")
+RESIZED_URL = reverse("image:resized-list")
+
+
+def image_detail_url(id):
+    """Create and return a image detail URL."""
+
+    return reverse("image:image-detail", args=[id])
+
+
+def resized_detail_url(id):
+    """Create and return a resized image detail URL."""
+
+    return reverse("image:resized-detail", args=[id])
+
+
+@override_settings(RESIZE_EXECUTOR_WORKERS=0, RESIZE_PRESETS_EAGER=False)
+class ConditionalGetTests(TestCase):
+    """Test validators and 304 responses."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="test@example.com",
+            name="test",
+            password="test1234",
+        )
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        for resized in models.Resized.objects.filter(user=self.user):
+            resized.delete()
+        for image in models.Image.objects.filter(user=self.user):
+            image.delete()
+
+    def upload(self, color="red"):
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as image_file:
+            Image.new("RGB", (40, 20), color).save(image_file, format="JPEG")
+            image_file.seek(0)
+            response = self.client.post(
+                IMAGE_URL, {"image": image_file}, format="multipart"
+            )
+        return response.data["id"]
+
+    def resize(self, image_id):
+        url = reverse("image:resized-get", args=[image_id])
+        response = self.client.get(f"{url}?width=20", HTTP_HOST="testserver")
+        return response.data["id"]
+
+    def test_detail_not_modified(self):
+        """Test a matching If-None-Match returns 304 from a single query
+        without a cached response."""
+
+        url = image_detail_url(self.upload())
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("Last-Modified", response)
+        etag = response["ETag"]
+        cache.clear()
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(response.content, b"")
+
+    def test_detail_if_modified_since(self):
+        """Test an up to date If-Modified-Since returns 304."""
+
+        url = image_detail_url(self.upload())
+        last_modified = self.client.get(url)["Last-Modified"]
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_update_changes_etag(self):
+        """Test updating an image returns the new representation."""
+
+        url = image_detail_url(self.upload())
+        etag = self.client.get(url)["ETag"]
+        self.client.patch(url, {"description": "new"}, format="multipart")
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.data["description"], "new")
+
+    def test_resized_detail_follows_image(self):
+        """Test a resized image shows the new description of its image."""
+
+        image_id = self.upload()
+        url = resized_detail_url(self.resize(image_id))
+        etag = self.client.get(url)["ETag"]
+        self.client.patch(
+            image_detail_url(image_id), {"description": "new"}, format="multipart"
+        )
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["description"], "new")
+
+    def test_list_etag_follows_rows(self):
+        """Test the list ETag changes when rows are added or removed."""
+
+        self.resize(self.upload())
+        etag = self.client.get(RESIZED_URL)["ETag"]
+
+        self.assertEqual(
+            self.client.get(RESIZED_URL, HTTP_IF_NONE_MATCH=etag).status_code,
+            status.HTTP_304_NOT_MODIFIED,
+        )
+        resized_id = self.resize(self.upload("blue"))
+        response = self.client.get(RESIZED_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response["ETag"]
+        self.client.delete(resized_detail_url(resized_id))
+        response = self.client.get(RESIZED_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_if_modified_since_after_delete(self):
+        """Test lists carry no Last-Modified, so a delete is never answered
+        with 304 to If-Modified-Since."""
+
+        self.resize(self.upload())
+        resized_id = self.resize(self.upload("blue"))
+        response = self.client.get(RESIZED_URL)
+        self.assertNotIn("Last-Modified", response)
+
+        self.client.delete(resized_detail_url(resized_id))
+        response = self.client.get(
+            RESIZED_URL, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60)
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 1)
+
+    def test_image_list_not_modified(self):
+        """Test the image list answers conditional GETs."""
+
+        self.upload()
+        etag = self.client.get(IMAGE_URL)["ETag"]
+
+        response = self.client.get(IMAGE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
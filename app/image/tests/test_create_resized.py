@@ -0,0 +1,113 @@
+"""
+Tests for uploading and resizing an image in one request.
+"""
+
+import tempfile
+from unittest.mock import patch
+
+import PIL.ImageFile
+from PIL import Image
+
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core import models
+from core.utils import processing
+from core.utils.exceptions import ExecutorBusy
+from core.utils.executor import ResizeExecutor
+
+RESIZED_CREATE_URL = reverse("image:resized-create")
+
+
+def create_image_file():
+    """Create and return a temporary JPEG file."""
+
+    image_file = tempfile.NamedTemporaryFile(suffix=".jpg")
+    Image.new("RGB", (400, 200)).save(image_file, format="JPEG")
+    image_file.seek(0)
+
+    return image_file
+
+
+@override_settings(RESIZE_EXECUTOR_WORKERS=0)
+class CreateResizedAPITests(TestCase):
+    """Test the single-decode upload and resize pipeline."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="test@example.com",
+            name="test",
+            password="test1234",
+        )
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        for resized in models.Resized.objects.filter(user=self.user):
+            resized.delete()
+        for image in models.Image.objects.filter(user=self.user):
+            image.delete()
+
+    def test_create_resized_decodes_once(self):
+        """Test the upload is decoded once and stored with two inserts after
+        the duplicate lookup."""
+
+        load = PIL.ImageFile.ImageFile.load
+        patched_decode = patch.object(processing, "decode", wraps=processing.decode)
+        patched_load = patch.object(
+            PIL.ImageFile.ImageFile, "load", autospec=True, side_effect=load
+        )
+
+        with create_image_file() as image_file, patched_decode as decode_mock:
+            with patched_load as load_mock, self.assertNumQueries(5):
+                response = self.client.post(
+                    f"{RESIZED_CREATE_URL}?width=100",
+                    {"image": image_file},
+                    format="multipart",
+                    HTTP_HOST="testserver",
+                )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        decode_mock.assert_called_once()
+        decoded = {id(call.args[0]) for call in load_mock.call_args_list}
+        self.assertEqual(len(decoded), 1)
+        resized = models.Resized.objects.get(id=response.data["resized_id"])
+        self.assertEqual(resized.image_id, response.data["id"])
+        self.assertEqual((resized.width, resized.height), (100, 50))
+        image = models.Image.objects.get(id=response.data["id"])
+        self.assertEqual((image.width, image.height, image.format), (400, 200, "JPEG"))
+
+    def test_invalid_parameters_store_nothing(self):
+        """Test invalid resize parameters are rejected before storing."""
+
+        with create_image_file() as image_file:
+            response = self.client.post(
+                f"{RESIZED_CREATE_URL}?width=abc",
+                {"image": image_file},
+                format="multipart",
+                HTTP_HOST="testserver",
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(models.Image.objects.count(), 0)
+
+    def test_busy_executor_stores_nothing(self):
+        """Test a rejected resize leaves no image behind."""
+
+        with create_image_file() as image_file, patch.object(
+            ResizeExecutor, "run", side_effect=ExecutorBusy(retry_after=3)
+        ):
+            response = self.client.post(
+                f"{RESIZED_CREATE_URL}?width=100",
+                {"image": image_file},
+                format="multipart",
+                HTTP_HOST="testserver",
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(models.Image.objects.count(), 0)
+        self.assertEqual(models.Resized.objects.count(), 0)
@@ -0,0 +1,129 @@
+"""
+Tests for deduplicating identical uploads.
+"""
+
+import os
+import tempfile
+
+from PIL import Image
+
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core import models
+
+IMAGE_URL = reverse("image:image-list")
+RESIZED_CREATE_URL = reverse("image:resized-create")
+
+
+def image_detail_url(id):
+    """Create and return a image detail URL."""
+
+    return reverse("image:image-detail", args=[id])
+
+
+def resized_get_url(id):
+    """Create and return a resize URL."""
+
+    return reverse("image:resized-get", args=[id])
+
+
+class DeduplicationTests(TestCase):
+    """Test sharing stored blobs between identical uploads."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="test@example.com",
+            name="test",
+            password="test1234",
+        )
+        self.client.force_authenticate(self.user)
+        self.image_file = tempfile.NamedTemporaryFile(suffix=".jpg")
+        Image.new("RGB", (40, 20), "red").save(self.image_file, format="JPEG")
+
+    def tearDown(self):
+        self.image_file.close()
+        for resized in models.Resized.objects.filter(user=self.user):
+            resized.delete()
+        for image in models.Image.objects.filter(user=self.user):
+            image.delete()
+
+    def upload(self, url=IMAGE_URL):
+        self.image_file.seek(0)
+        return self.client.post(
+            url, {"image": self.image_file}, format="multipart", HTTP_HOST="testserver"
+        )
+
+    def test_identical_uploads_share_blob(self):
+        """Test identical uploads create two rows and one file."""
+
+        first = models.Image.objects.get(id=self.upload().data["id"])
+        second = models.Image.objects.get(id=self.upload().data["id"])
+
+        self.assertNotEqual(first.id, second.id)
+        self.assertEqual(first.digest, second.digest)
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(len(os.listdir(os.path.dirname(first.image.path))), 1)
+
+    def test_blob_removed_with_last_reference(self):
+        """Test the shared file is only removed with the last image."""
+
+        first = models.Image.objects.get(id=self.upload().data["id"])
+        second = models.Image.objects.get(id=self.upload().data["id"])
+        path = first.image.path
+
+        response = self.client.delete(image_detail_url(first.id))
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertTrue(os.path.exists(path))
+
+        self.client.delete(image_detail_url(second.id))
+
+        self.assertFalse(os.path.exists(path))
+
+    def test_different_users_do_not_share_blobs(self):
+        """Test uploads of other users are stored separately."""
+
+        first = models.Image.objects.get(id=self.upload().data["id"])
+        other = get_user_model().objects.create_user(
+            email="other@example.com",
+            name="other",
+            password="test1234",
+        )
+        self.client.force_authenticate(other)
+        second = models.Image.objects.get(id=self.upload().data["id"])
+
+        self.assertNotEqual(first.image.name, second.image.name)
+        second.delete()
+
+    def test_derivatives_shared_between_duplicates(self):
+        """Test resizing a duplicate reuses the derivative of the original."""
+
+        first_id = self.upload().data["id"]
+        second_id = self.upload().data["id"]
+
+        first = self.client.get(
+            f"{resized_get_url(first_id)}?width=20", HTTP_HOST="testserver"
+        )
+        second = self.client.get(
+            f"{resized_get_url(second_id)}?width=20", HTTP_HOST="testserver"
+        )
+
+        self.assertEqual(first.data["id"], second.data["id"])
+        self.assertEqual(models.Resized.objects.count(), 1)
+
+    def test_create_resized_duplicate_reuses_derivative(self):
+        """Test uploading and resizing a duplicate reuses its derivative."""
+
+        first = self.upload(f"{RESIZED_CREATE_URL}?width=20")
+        second = self.upload(f"{RESIZED_CREATE_URL}?width=20")
+
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(first.data["resized_id"], second.data["resized_id"])
+        self.assertEqual(models.Image.objects.count(), 2)
+        self.assertEqual(models.Resized.objects.count(), 1)
@@ -0,0 +1,127 @@
+"""
+Tests for ephemeral resizes returning image bytes.
+"""
+
+import os
+import tempfile
+from io import BytesIO
+
+from PIL import Image
+
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core import models
+
+IMAGE_URL = reverse("image:image-list")
+
+
+def media_files():
+    """Return the paths of every file under MEDIA_ROOT."""
+
+    return {
+        os.path.join(root, name)
+        for root, _, names in os.walk(settings.MEDIA_ROOT)
+        for name in names
+    }
+
+
+@override_settings(RESIZE_EXECUTOR_WORKERS=0, RESIZE_PRESETS_EAGER=False)
+class EphemeralResizeTests(TestCase):
+    """Test ephemeral resizes stream bytes without storing anything."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="test@example.com",
+            name="test",
+            password="test1234",
+        )
+        self.client.force_authenticate(self.user)
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as image_file:
+            Image.new("RGB", (400, 200), "red").save(image_file, format="JPEG")
+            image_file.seek(0)
+            response = self.client.post(
+                IMAGE_URL, {"image": image_file}, format="multipart"
+            )
+        self.url = reverse("image:resized-get", args=[response.data["id"]])
+
+    def tearDown(self):
+        for resized in models.Resized.objects.filter(user=self.user):
+            resized.delete()
+        for image in models.Image.objects.filter(user=self.user):
+            image.delete()
+
+    def test_returns_bytes_without_storing(self):
+        """Test the resized bytes are returned and nothing is written."""
+
+        files = media_files()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {"width": 100, "ephemeral": 1})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        self.assertIn("private", response["Cache-Control"])
+        self.assertIn(
+            f"max-age={settings.RESIZE_EPHEMERAL_MAX_AGE}", response["Cache-Control"]
+        )
+        with Image.open(BytesIO(response.content)) as img:
+            self.assertEqual((img.format, img.size), ("JPEG", (100, 50)))
+        self.assertFalse(models.Resized.objects.exists())
+        self.assertEqual(media_files(), files)
+        self.assertFalse(
+            [query for query in queries if not query["sql"].startswith("SELECT")]
+        )
+
+    def test_output_format(self):
+        """Test the content type follows the negotiated format."""
+
+        response = self.client.get(
+            self.url, {"width": 100, "ephemeral": 1, "output_format": "PNG"}
+        )
+
+        self.assertEqual(response["Content-Type"], "image/png")
+        with Image.open(BytesIO(response.content)) as img:
+            self.assertEqual(img.format, "PNG")
+
+    def test_max_bytes(self):
+        """Test the bytes fit the byte budget."""
+
+        response = self.client.get(
+            self.url, {"width": 300, "ephemeral": 1, "max_bytes": 4000}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertLessEqual(len(response.content), 4000)
+
+    def test_missing_image(self):
+        """Test a missing image returns the usual error."""
+
+        url = reverse("image:resized-get", args=[0])
+        response = self.client.get(url, {"width": 100, "ephemeral": 1})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.data["error"], "Image does not exist.")
+
+    def test_image_of_other_user(self):
+        """Test the images of other users are not streamed."""
+
+        other = get_user_model().objects.create_user(
+            email="other@example.com",
+            name="other",
+            password="test1234",
+        )
+        client = APIClient()
+        client.force_authenticate(other)
+
+        response = client.get(self.url, {"width": 100, "ephemeral": 1})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.data["error"], "Image does not exist.")
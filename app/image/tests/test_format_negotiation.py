@@ -0,0 +1,127 @@
+"""
+Tests for output format negotiation of resized images.
+"""
+
+import tempfile
+
+from PIL import Image
+
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core import models
+
+IMAGE_URL = reverse("image:image-list")
+
+
+def resized_get_url(id):
+    """Create and return a resize URL."""
+
+    return reverse("image:resized-get", args=[id])
+
+
+@override_settings(RESIZE_EXECUTOR_WORKERS=0)
+class FormatNegotiationTests(TestCase):
+    """Test choosing the output format of a resize."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="test@example.com",
+            name="test",
+            password="test1234",
+        )
+        self.client.force_authenticate(self.user)
+
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as image_file:
+            img = Image.new("RGB", (40, 20))
+            img.save(image_file, format="JPEG")
+            image_file.seek(0)
+            response = self.client.post(
+                IMAGE_URL, {"image": image_file}, format="multipart"
+            )
+        self.image_id = response.data["id"]
+        self.url = f"{resized_get_url(self.image_id)}?width=20"
+
+    def tearDown(self):
+        for resized in models.Resized.objects.filter(user=self.user):
+            resized.delete()
+        for image in models.Image.objects.filter(user=self.user):
+            image.delete()
+
+    def test_source_format_by_default(self):
+        """Test the source format is kept without a preference."""
+
+        response = self.client.get(self.url, HTTP_HOST="testserver")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        resized = models.Resized.objects.get(id=response.data["id"])
+        self.assertEqual(resized.format, "JPEG")
+        self.assertTrue(resized.resized_image.name.endswith(".jpg"))
+        self.assertIn("Accept", response["Vary"])
+
+    def test_explicit_format_parameter(self):
+        """Test the output_format parameter selects the output format."""
+
+        response = self.client.get(
+            f"{self.url}&output_format=webp", HTTP_HOST="testserver"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        resized = models.Resized.objects.get(id=response.data["id"])
+        self.assertEqual(resized.format, "WEBP")
+        self.assertTrue(resized.resized_image.name.endswith(".webp"))
+        with Image.open(resized.resized_image.path) as img:
+            self.assertEqual(img.format, "WEBP")
+
+    def test_accept_header_selects_webp(self):
+        """Test an Accept header listing WebP gets WebP."""
+
+        response = self.client.get(
+            self.url,
+            HTTP_HOST="testserver",
+            HTTP_ACCEPT="image/webp,image/*;q=0.8",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            models.Resized.objects.get(id=response.data["id"]).format, "WEBP"
+        )
+
+    def test_accept_header_with_zero_quality_is_ignored(self):
+        """Test a media type excluded with q=0 is not chosen."""
+
+        response = self.client.get(
+            self.url, HTTP_HOST="testserver", HTTP_ACCEPT="image/webp;q=0, */*"
+        )
+
+        self.assertEqual(
+            models.Resized.objects.get(id=response.data["id"]).format, "JPEG"
+        )
+
+    def test_invalid_format_rejected(self):
+        """Test an unknown format returns an error."""
+
+        response = self.client.get(
+            f"{self.url}&output_format=bmp", HTTP_HOST="testserver"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(models.Resized.objects.exists())
+
+    def test_formats_are_cached_separately(self):
+        """Test the same transform in two formats creates two derivatives."""
+
+        jpeg = self.client.get(self.url, HTTP_HOST="testserver")
+        webp = self.client.get(f"{self.url}&output_format=webp", HTTP_HOST="testserver")
+        webp_again = self.client.get(
+            self.url, HTTP_HOST="testserver", HTTP_ACCEPT="image/webp"
+        )
+
+        self.assertNotEqual(jpeg.data["id"], webp.data["id"])
+        self.assertEqual(webp.data["id"], webp_again.data["id"])
+        self.assertEqual(models.Resized.objects.count(), 2)
@@ -0,0 +1,105 @@
+"""
+Tests for resizing within a byte budget.
+"""
+
+import tempfile
+
+from PIL import Image
+
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core import models
+
+IMAGE_URL = reverse("image:image-list")
+
+
+def resized_get_url(id):
+    """Create and return a resize URL."""
+
+    return reverse("image:resized-get", args=[id])
+
+
+@override_settings(RESIZE_EXECUTOR_WORKERS=0)
+class MaxBytesTests(TestCase):
+    """Test the max_bytes parameter of the resize endpoints."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="test@example.com",
+            name="test",
+            password="test1234",
+        )
+        self.client.force_authenticate(self.user)
+
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as image_file:
+            img = Image.effect_noise((400, 200), 64).convert("RGB")
+            img.save(image_file, format="JPEG", quality=95)
+            image_file.seek(0)
+            response = self.client.post(
+                IMAGE_URL, {"image": image_file}, format="multipart"
+            )
+        self.image_id = response.data["id"]
+        self.url = f"{resized_get_url(self.image_id)}?width=200"
+
+    def tearDown(self):
+        for resized in models.Resized.objects.filter(user=self.user):
+            resized.delete()
+        for image in models.Image.objects.filter(user=self.user):
+            image.delete()
+
+    def test_resized_fits_budget(self):
+        """Test the derivative fits the budget and records its quality."""
+
+        full = self.client.get(f"{self.url}&quality=90", HTTP_HOST="testserver")
+        max_bytes = full.data["size"] // 2
+
+        response = self.client.get(
+            f"{self.url}&quality=90&max_bytes={max_bytes}", HTTP_HOST="testserver"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        resized = models.Resized.objects.get(id=response.data["id"])
+        self.assertLessEqual(resized.size, max_bytes)
+        self.assertLess(resized.quality, 90)
+        self.assertEqual(resized.size, resized.resized_image.size)
+        self.assertEqual(response.data["quality"], resized.quality)
+
+    def test_budget_is_part_of_cache_key(self):
+        """Test the same transform with another budget is a new derivative."""
+
+        first = self.client.get(f"{self.url}&max_bytes=100000", HTTP_HOST="testserver")
+        second = self.client.get(f"{self.url}&max_bytes=5000", HTTP_HOST="testserver")
+        third = self.client.get(f"{self.url}&max_bytes=5000", HTTP_HOST="testserver")
+
+        self.assertNotEqual(first.data["id"], second.data["id"])
+        self.assertEqual(second.data["id"], third.data["id"])
+
+    def test_unreachable_budget(self):
+        """Test a budget no quality fits returns an error."""
+
+        response = self.client.get(f"{self.url}&max_bytes=10", HTTP_HOST="testserver")
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertFalse(models.Resized.objects.exists())
+
+    def test_lossless_format_rejected(self):
+        """Test a budget with a lossless output format returns an error."""
+
+        response = self.client.get(
+            f"{self.url}&max_bytes=5000&output_format=png", HTTP_HOST="testserver"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_budget(self):
+        """Test a non numeric budget returns an error."""
+
+        response = self.client.get(f"{self.url}&max_bytes=abc", HTTP_HOST="testserver")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
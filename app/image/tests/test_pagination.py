@@ -0,0 +1,98 @@
+"""
+Tests for cursor pagination and sparse fieldsets of the list endpoints.
+"""
+
+import tempfile
+
+from PIL import Image
+
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core import models
+
+IMAGE_URL = reverse("image:image-list")
+RESIZED_URL = reverse("image:resized-list")
+
+
+@override_settings(
+    API_PAGE_SIZE=2, RESIZE_EXECUTOR_WORKERS=0, RESIZE_PRESETS_EAGER=False
+)
+class PaginationTests(TestCase):
+    """Test paging through and trimming list responses."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="test@example.com",
+            name="test",
+            password="test1234",
+        )
+        self.client.force_authenticate(self.user)
+        self.image_ids = [self.upload(color) for color in ("red", "green", "blue")]
+
+    def tearDown(self):
+        for resized in models.Resized.objects.filter(user=self.user):
+            resized.delete()
+        for image in models.Image.objects.filter(user=self.user):
+            image.delete()
+
+    def upload(self, color):
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as image_file:
+            Image.new("RGB", (40, 20), color).save(image_file, format="JPEG")
+            image_file.seek(0)
+            response = self.client.post(
+                IMAGE_URL, {"image": image_file}, format="multipart"
+            )
+        return response.data["id"]
+
+    def test_images_are_paged_newest_first(self):
+        """Test the cursor walks every image once, newest first."""
+
+        first = self.client.get(IMAGE_URL)
+        second = self.client.get(first.data["next"])
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        ids = [row["id"] for row in first.data["results"] + second.data["results"]]
+        self.assertEqual(ids, self.image_ids[::-1])
+        self.assertIsNone(second.data["next"])
+
+    def test_page_size_parameter(self):
+        """Test clients can ask for larger pages up to the maximum."""
+
+        response = self.client.get(IMAGE_URL, {"page_size": 3})
+
+        self.assertEqual(len(response.data["results"]), 3)
+
+    def test_resized_are_paged(self):
+        """Test resized images are paged as well."""
+
+        url = reverse("image:resized-get", args=[self.image_ids[0]])
+        for width in (10, 20, 30):
+            self.client.get(f"{url}?width={width}", HTTP_HOST="testserver")
+
+        response = self.client.get(RESIZED_URL)
+
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertIsNotNone(response.data["next"])
+
+    def test_sparse_fieldset(self):
+        """Test only the requested fields are returned."""
+
+        response = self.client.get(IMAGE_URL, {"fields": "id,name"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for row in response.data["results"]:
+            self.assertEqual(set(row), {"id", "name"})
+
+    def test_unknown_field(self):
+        """Test an unknown field is rejected."""
+
+        response = self.client.get(IMAGE_URL, {"fields": "id,owner"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("owner", str(response.data["fields"]))
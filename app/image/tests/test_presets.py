@@ -0,0 +1,170 @@
+"""
+Tests for named resize presets.
+"""
+
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core import models
+from core.utils import functions
+
+IMAGE_URL = reverse("image:image-list")
+
+PRESETS = {
+    "thumb": {"width": 40, "height": None, "quality": 70, "format": "WEBP"},
+    "hero": {"width": 160, "height": 90, "quality": 85, "format": "JPEG"},
+}
+
+
+def preset_url(id, name):
+    """Create and return a preset URL."""
+
+    return reverse("image:image-preset", args=[id, name])
+
+
+@override_settings(RESIZE_PRESETS=PRESETS, RESIZE_EXECUTOR_WORKERS=0)
+class PresetTests(TestCase):
+    """Test generating and serving preset derivatives."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="test@example.com",
+            name="test",
+            password="test1234",
+        )
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        for resized in models.Resized.objects.filter(user=self.user):
+            resized.delete()
+        for image in models.Image.objects.filter(user=self.user):
+            image.delete()
+
+    def upload(self, color="black"):
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as image_file:
+            Image.new("RGB", (320, 160), color).save(image_file, format="JPEG")
+            image_file.seek(0)
+            response = self.client.post(
+                IMAGE_URL, {"image": image_file}, format="multipart"
+            )
+        return response.data["id"]
+
+    def test_upload_enqueues_presets(self):
+        """Test an upload queues one job per preset."""
+
+        image_id = self.upload()
+
+        jobs = models.ResizeJob.objects.filter(image_id=image_id)
+        self.assertEqual(
+            sorted((job.width, job.height, job.format) for job in jobs),
+            [(40, 20, "WEBP"), (160, 90, "JPEG")],
+        )
+
+    def test_preset_served_from_background_job(self):
+        """Test the endpoint serves the derivative made by the worker."""
+
+        image_id = self.upload()
+        call_command("resize_worker", "--once", stdout=StringIO())
+        job = models.ResizeJob.objects.get(image_id=image_id, format="WEBP")
+
+        response = self.client.get(
+            preset_url(image_id, "thumb"), HTTP_HOST="testserver"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["id"], job.resized_id)
+        self.assertEqual(response.data["resolution"], "40x20px")
+        self.assertEqual(response.data["format"], "WEBP")
+        self.assertEqual(models.Resized.objects.count(), 2)
+
+    @override_settings(RESIZE_PRESETS_EAGER=False)
+    def test_preset_created_on_demand(self):
+        """Test a preset is created when no job made it yet."""
+
+        image_id = self.upload()
+
+        first = self.client.get(preset_url(image_id, "hero"), HTTP_HOST="testserver")
+        second = self.client.get(preset_url(image_id, "hero"), HTTP_HOST="testserver")
+
+        self.assertFalse(models.ResizeJob.objects.exists())
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.data["id"], second.data["id"])
+        self.assertEqual(first.data["resolution"], "160x90px")
+
+    def test_unknown_preset(self):
+        """Test an unknown preset returns an error."""
+
+        image_id = self.upload()
+
+        response = self.client.get(
+            preset_url(image_id, "poster"), HTTP_HOST="testserver"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_other_user_image(self):
+        """Test presets of another user's image are not served."""
+
+        image_id = self.upload()
+        other = get_user_model().objects.create_user(
+            email="other@example.com",
+            name="other",
+            password="test1234",
+        )
+        self.client.force_authenticate(other)
+
+        response = self.client.get(
+            preset_url(image_id, "thumb"), HTTP_HOST="testserver"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(RESIZE_PRESETS_EAGER=False)
+    def test_backfill_command(self):
+        """Test the backfill command creates the presets of every image."""
+
+        image_ids = [self.upload("red"), self.upload("blue")]
+
+        call_command("backfill_presets", "--processes", "1", stdout=StringIO())
+
+        for image_id in image_ids:
+            self.assertEqual(
+                models.Resized.objects.filter(image_id=image_id).count(), 2
+            )
+
+    @override_settings(RESIZE_PRESETS_EAGER=False)
+    def test_backfill_command_batches(self):
+        """Test batches create the presets of same-shape images."""
+
+        image_ids = [self.upload("red"), self.upload("blue")]
+
+        with patch.object(functions, "get_cached_resized") as patched_cached:
+            call_command(
+                "backfill_presets",
+                "--processes",
+                "1",
+                "--batch-size",
+                "2",
+                stdout=StringIO(),
+            )
+
+        patched_cached.assert_not_called()
+
+        for image_id in image_ids:
+            resized = models.Resized.objects.filter(image_id=image_id)
+            self.assertEqual(resized.count(), 2)
+            self.assertEqual(
+                set(resized.values_list("format", flat=True)), {"WEBP", "JPEG"}
+            )
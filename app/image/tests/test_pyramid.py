@@ -0,0 +1,170 @@
+"""
+Tests for the resolution pyramid of uploaded images.
+"""
+
+import os
+import tempfile
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core import models
+from core.utils import processing
+
+IMAGE_URL = reverse("image:image-list")
+
+
+def image_detail_url(id):
+    """Create and return a image detail URL."""
+
+    return reverse("image:image-detail", args=[id])
+
+
+def resized_get_url(id):
+    """Create and return a resize URL."""
+
+    return reverse("image:resized-get", args=[id])
+
+
+@override_settings(IMAGE_PYRAMID_LEVELS=3, RESIZE_EXECUTOR_WORKERS=0)
+class PyramidTests(TestCase):
+    """Test building and using the pyramid levels of an image."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="test@example.com",
+            name="test",
+            password="test1234",
+        )
+        self.client.force_authenticate(self.user)
+        self.image_file = tempfile.NamedTemporaryFile(suffix=".jpg")
+        Image.new("RGB", (400, 200), "red").save(self.image_file, format="JPEG")
+
+    def tearDown(self):
+        self.image_file.close()
+        for resized in models.Resized.objects.filter(user=self.user):
+            resized.delete()
+        for image in models.Image.objects.filter(user=self.user):
+            image.delete()
+
+    def upload(self):
+        self.image_file.seek(0)
+        response = self.client.post(
+            IMAGE_URL, {"image": self.image_file}, format="multipart"
+        )
+        return models.Image.objects.get(id=response.data["id"])
+
+    def test_levels_created_on_upload(self):
+        """Test an upload stores halving pyramid levels."""
+
+        image = self.upload()
+
+        levels = list(image.levels.all())
+        self.assertEqual(
+            [(level.width, level.height) for level in levels],
+            [(200, 100), (100, 50), (50, 25)],
+        )
+        for level in levels:
+            self.assertTrue(os.path.exists(level.level_image.path))
+
+    def test_levels_of_palette_images(self):
+        """Test GIF and palette PNG uploads get their levels in a mode the
+        levels can be reduced in, keeping the transparency."""
+
+        for format, info in (("GIF", {}), ("PNG", {"transparency": 0})):
+            with self.subTest(format=format):
+                self.image_file.seek(0)
+                self.image_file.truncate()
+                Image.new("RGB", (400, 200), "red").quantize().save(
+                    self.image_file, format=format, **info
+                )
+
+                image = self.upload()
+
+                levels = list(image.levels.all())
+                self.assertEqual(len(levels), 3)
+                with Image.open(levels[0].level_image.path) as level:
+                    self.assertEqual(level.format, "PNG")
+                    self.assertEqual(level.mode, "RGBA" if info else "RGB")
+
+    def test_render_failure_leaves_image_without_levels(self):
+        """Test an image Pillow cannot render levels of is still uploaded."""
+
+        with patch.object(
+            processing, "render_pyramid", side_effect=OSError("broken data stream")
+        ):
+            image = self.upload()
+
+        self.assertFalse(image.levels.exists())
+
+    def test_resize_reads_smallest_sufficient_level(self):
+        """Test a resize decodes the smallest level at least the new size."""
+
+        image = self.upload()
+        level = image.levels.get(width=100)
+
+        with patch.object(
+            processing, "decode", wraps=processing.decode
+        ) as patched_decode:
+            response = self.client.get(
+                f"{resized_get_url(image.id)}?width=80", HTTP_HOST="testserver"
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(patched_decode.call_args.args[0], level.level_image.path)
+        resized = models.Resized.objects.get(id=response.data["id"])
+        self.assertEqual((resized.width, resized.height), (80, 40))
+
+    def test_resize_larger_than_levels_reads_original(self):
+        """Test a resize above every level decodes the original."""
+
+        image = self.upload()
+
+        with patch.object(
+            processing, "decode", wraps=processing.decode
+        ) as patched_decode:
+            self.client.get(
+                f"{resized_get_url(image.id)}?width=300", HTTP_HOST="testserver"
+            )
+
+        self.assertEqual(patched_decode.call_args.args[0], image.image.path)
+
+    def test_delete_removes_levels(self):
+        """Test deleting an image removes its pyramid files."""
+
+        image = self.upload()
+        paths = [level.level_image.path for level in image.levels.all()]
+
+        response = self.client.delete(image_detail_url(image.id))
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(models.ImageLevel.objects.exists())
+        for path in paths:
+            self.assertFalse(os.path.exists(path))
+
+    def test_duplicates_share_levels(self):
+        """Test a duplicate upload reuses the levels until the last delete."""
+
+        first = self.upload()
+        second = self.upload()
+        paths = [level.level_image.path for level in first.levels.all()]
+
+        self.assertEqual(
+            paths, [level.level_image.path for level in second.levels.all()]
+        )
+
+        self.client.delete(image_detail_url(first.id))
+        for path in paths:
+            self.assertTrue(os.path.exists(path))
+
+        self.client.delete(image_detail_url(second.id))
+        for path in paths:
+            self.assertFalse(os.path.exists(path))
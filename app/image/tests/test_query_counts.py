@@ -0,0 +1,110 @@
+"""
+Query count regression tests for the list and detail endpoints.
+"""
+
+import tempfile
+
+from PIL import Image
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core import models
+
+IMAGE_URL = reverse("image:image-list")
+RESIZED_URL = reverse("image:resized-list")
+COLORS = ("red", "green", "blue")
+
+
+@override_settings(RESIZE_EXECUTOR_WORKERS=0, RESIZE_PRESETS_EAGER=False)
+class QueryCountTests(TestCase):
+    """Test endpoints issue a fixed number of queries, whatever the rows."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_superuser(
+            email="admin@example.com",
+            name="admin",
+            password="test1234",
+        )
+        self.client.force_authenticate(self.user)
+        self.image_ids = []
+        self.resized_ids = []
+        for color in COLORS:
+            self.add(color)
+
+    def tearDown(self):
+        for resized in models.Resized.objects.filter(user=self.user):
+            resized.delete()
+        for image in models.Image.objects.filter(user=self.user):
+            image.delete()
+
+    def add(self, color):
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as image_file:
+            Image.new("RGB", (40, 20), color).save(image_file, format="JPEG")
+            image_file.seek(0)
+            response = self.client.post(
+                IMAGE_URL, {"image": image_file}, format="multipart"
+            )
+        self.image_ids.append(response.data["id"])
+        url = reverse("image:resized-get", args=[response.data["id"]])
+        response = self.client.get(f"{url}?width=20", HTTP_HOST="testserver")
+        self.resized_ids.append(response.data["id"])
+
+    def test_image_list(self):
+        """Test the image list reads the versions and one page."""
+
+        with self.assertNumQueries(2):
+            response = self.client.get(IMAGE_URL)
+
+        self.assertEqual(len(response.data["results"]), len(COLORS))
+
+    def test_image_detail(self):
+        """Test the image detail joins its owner."""
+
+        url = reverse("image:image-detail", args=[self.image_ids[0]])
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+
+        self.assertEqual(response.data["owner"], "admin")
+
+    def test_resized_list(self):
+        """Test the resized list joins the names of the images."""
+
+        with self.assertNumQueries(2):
+            response = self.client.get(RESIZED_URL)
+
+        self.assertEqual(len(response.data["results"]), len(COLORS))
+        self.assertTrue(all(row["name"] for row in response.data["results"]))
+
+    def test_resized_detail(self):
+        """Test the resized detail joins its image and owner."""
+
+        url = reverse("image:resized-detail", args=[self.resized_ids[0]])
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["image_id"], self.image_ids[0])
+        self.assertEqual(response.data["format"], "JPEG")
+
+    def test_admin_changelists(self):
+        """Test the admin changelists do not grow with the rows."""
+
+        self.client.force_login(self.user)
+        for name in ("admin:core_image_changelist", "admin:core_resized_changelist"):
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(reverse(name))
+            before = len(queries)
+            self.add("white")
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse(name))
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(queries), before)
@@ -0,0 +1,190 @@
+"""
+Tests for asynchronous resize jobs.
+"""
+
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core import models
+from core.utils import functions
+from core.utils.exceptions import ExecutorBusy
+
+IMAGE_URL = reverse("image:image-list")
+RESIZED_CREATE_URL = reverse("image:resized-create")
+
+
+def resized_get_url(id):
+    """Create and return a resize URL."""
+
+    return reverse("image:resized-get", args=[id])
+
+
+def job_detail_url(id):
+    """Create and return a resize job URL."""
+
+    return reverse("image:job-detail", args=[id])
+
+
+def create_image_file():
+    """Create and return a temporary JPEG file."""
+
+    image_file = tempfile.NamedTemporaryFile(suffix=".jpg")
+    Image.new("RGB", (40, 20)).save(image_file, format="JPEG")
+    image_file.seek(0)
+
+    return image_file
+
+
+class ResizeJobTests(TestCase):
+    """Test queueing resizes and running them in the worker command."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="test@example.com",
+            name="test",
+            password="test1234",
+        )
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        for resized in models.Resized.objects.filter(user=self.user):
+            resized.delete()
+        for image in models.Image.objects.filter(user=self.user):
+            image.delete()
+
+    def run_worker(self):
+        call_command("resize_worker", "--once", stdout=StringIO())
+
+    def test_async_get_resized_returns_job(self):
+        """Test an async resize returns 202 and is done by the worker."""
+
+        with create_image_file() as image_file:
+            response = self.client.post(
+                IMAGE_URL, {"image": image_file}, format="multipart"
+            )
+        url = f"{resized_get_url(response.data['id'])}?width=10&async=1"
+
+        response = self.client.get(url, HTTP_HOST="testserver")
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["status"], models.ResizeJob.PENDING)
+        self.assertEqual(models.Resized.objects.count(), 0)
+
+        self.run_worker()
+        job_response = self.client.get(job_detail_url(response.data["job_id"]))
+
+        self.assertEqual(job_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(job_response.data["status"], models.ResizeJob.DONE)
+        self.assertEqual(job_response.data["resolution"], "10x5px")
+        resized = models.Resized.objects.get(id=job_response.data["resized"])
+        self.assertEqual((resized.width, resized.height), (10, 5))
+
+    def test_async_create_resized_returns_job(self):
+        """Test an async upload and resize returns 202 and a job."""
+
+        with create_image_file() as image_file:
+            response = self.client.post(
+                f"{RESIZED_CREATE_URL}?percent=50&async=1",
+                {"image": image_file},
+                format="multipart",
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertTrue(models.Image.objects.filter(id=response.data["id"]).exists())
+
+        self.run_worker()
+        job = models.ResizeJob.objects.get(id=response.data["job_id"])
+
+        self.assertEqual(job.status, models.ResizeJob.DONE)
+        self.assertEqual(job.resized.image_id, response.data["id"])
+
+    def test_failed_job_is_recorded(self):
+        """Test a job whose source is gone is marked as failed."""
+
+        with create_image_file() as image_file:
+            response = self.client.post(
+                IMAGE_URL, {"image": image_file}, format="multipart"
+            )
+        image = models.Image.objects.get(id=response.data["id"])
+        job = models.ResizeJob.objects.create(
+            user=self.user, image=image, quality=75, width=10, height=5
+        )
+        models.Image.objects.filter(id=image.id).update(image="missing.jpg")
+
+        with self.assertLogs("core.utils.functions", "ERROR") as logs:
+            self.run_worker()
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, models.ResizeJob.FAILED)
+        self.assertEqual(job.error, functions.JOB_FAILED_MESSAGE)
+        self.assertNotIn(settings.MEDIA_ROOT, job.error)
+        self.assertIn("FileNotFoundError", logs.output[0])
+        self.assertIsNotNone(job.finished_at)
+        models.Image.objects.filter(id=image.id).update(image=image.image.name)
+
+    def test_busy_host_leaves_job_pending(self):
+        """Test a job rejected because the host is busy is kept for a later
+        try."""
+
+        with create_image_file() as image_file:
+            response = self.client.post(
+                IMAGE_URL, {"image": image_file}, format="multipart"
+            )
+        job = models.ResizeJob.objects.create(
+            user=self.user,
+            image=models.Image.objects.get(id=response.data["id"]),
+            quality=75,
+            width=10,
+            height=5,
+        )
+
+        with patch.object(functions, "admit", side_effect=ExecutorBusy(retry_after=3)):
+            self.run_worker()
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, models.ResizeJob.PENDING)
+        self.assertIsNone(job.error)
+        self.assertIsNone(job.finished_at)
+
+        self.run_worker()
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, models.ResizeJob.DONE)
+
+    def test_other_users_job_not_visible(self):
+        """Test users cannot see resize jobs of other users."""
+
+        other = get_user_model().objects.create_user(
+            email="other@example.com",
+            name="other",
+            password="test1234",
+        )
+        with create_image_file() as image_file:
+            response = self.client.post(
+                IMAGE_URL, {"image": image_file}, format="multipart"
+            )
+        job = models.ResizeJob.objects.create(
+            user=self.user,
+            image=models.Image.objects.get(id=response.data["id"]),
+            quality=75,
+            width=10,
+            height=5,
+        )
+        self.client.force_authenticate(other)
+
+        response = self.client.get(job_detail_url(job.id))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,101 @@
+"""
+Tests for the derivative cache of resized images.
+"""
+
+import tempfile
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core import models
+
+
+IMAGE_URL = reverse("image:image-list")
+
+
+def resized_get_url(id):
+    """Create and return a resize URL."""
+
+    return reverse("image:resized-get", args=[id])
+
+
+class ResizedCacheTests(TestCase):
+    """Test reusing derivatives for identical transforms."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="test@example.com",
+            name="test",
+            password="test1234",
+        )
+        self.client.force_authenticate(self.user)
+
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as image_file:
+            img = Image.new("RGB", (40, 20))
+            img.save(image_file, format="JPEG")
+            image_file.seek(0)
+            response = self.client.post(
+                IMAGE_URL, {"image": image_file}, format="multipart"
+            )
+        self.image_id = response.data["id"]
+
+    def tearDown(self):
+        for resized in models.Resized.objects.filter(user=self.user):
+            resized.delete()
+        for image in models.Image.objects.filter(user=self.user):
+            image.delete()
+
+    @override_settings(RESIZE_EXECUTOR_WORKERS=0)
+    def test_identical_transform_returns_cached_resized(self):
+        """Test the second identical request reuses the derivative."""
+
+        url = f"{resized_get_url(self.image_id)}?width=20&quality=80"
+        first = self.client.get(url, HTTP_HOST="testserver")
+
+        with patch("core.utils.processing.PIL.Image.open") as patched_open:
+            second = self.client.get(url, HTTP_HOST="testserver")
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.data["id"], second.data["id"])
+        self.assertEqual(models.Resized.objects.count(), 1)
+        patched_open.assert_not_called()
+
+    def test_normalized_quality_shares_cache_entry(self):
+        """Test qualities clamped to the same value share a derivative."""
+
+        url = resized_get_url(self.image_id)
+        first = self.client.get(f"{url}?width=20&quality=96", HTTP_HOST="testserver")
+        second = self.client.get(f"{url}?width=20&quality=99", HTTP_HOST="testserver")
+
+        self.assertEqual(first.data["id"], second.data["id"])
+
+    def test_different_transform_creates_new_resized(self):
+        """Test a different size creates a new derivative."""
+
+        url = resized_get_url(self.image_id)
+        first = self.client.get(f"{url}?width=20", HTTP_HOST="testserver")
+        second = self.client.get(f"{url}?width=10", HTTP_HOST="testserver")
+
+        self.assertNotEqual(first.data["id"], second.data["id"])
+        self.assertEqual(models.Resized.objects.count(), 2)
+
+    @override_settings(RESIZED_CACHE_MAX_PER_IMAGE=1)
+    def test_cache_size_is_bounded(self):
+        """Test the oldest cache entries are evicted above the limit."""
+
+        url = resized_get_url(self.image_id)
+        first = self.client.get(f"{url}?width=20", HTTP_HOST="testserver")
+        self.client.get(f"{url}?width=10", HTTP_HOST="testserver")
+
+        cached = models.Resized.objects.filter(cache_key__isnull=False)
+        self.assertEqual(cached.count(), 1)
+        self.assertFalse(cached.filter(id=first.data["id"]).exists())
+        self.assertEqual(models.Resized.objects.count(), 2)
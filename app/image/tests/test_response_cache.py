@@ -0,0 +1,217 @@
+"""
+Tests for the per-user response cache.
+"""
+
+import tempfile
+import threading
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.core.cache import cache
+from django.test import TestCase, SimpleTestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core import models
+from core.utils import response_cache
+
+IMAGE_URL = reverse("image:image-list")
+RESIZED_URL = reverse("image:resized-list")
+
+
+def image_detail_url(id):
+    """Create and return a image detail URL."""
+
+    return reverse("image:image-detail", args=[id])
+
+
+@override_settings(RESIZE_EXECUTOR_WORKERS=0, RESIZE_PRESETS_EAGER=False)
+class ResponseCacheTests(TestCase):
+    """Test caching list and detail responses per user."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="test@example.com",
+            name="test",
+            password="test1234",
+        )
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        for resized in models.Resized.objects.filter(user=self.user):
+            resized.delete()
+        for image in models.Image.objects.filter(user=self.user):
+            image.delete()
+
+    def upload(self, color="red"):
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as image_file:
+            Image.new("RGB", (40, 20), color).save(image_file, format="JPEG")
+            image_file.seek(0)
+            response = self.client.post(
+                IMAGE_URL, {"image": image_file}, format="multipart"
+            )
+        return response.data["id"]
+
+    def test_repeated_get_is_served_from_cache(self):
+        """Test a second identical GET runs no query."""
+
+        url = image_detail_url(self.upload())
+        first = self.client.get(url)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second["ETag"], first["ETag"])
+
+    def test_cached_response_answers_conditional_get(self):
+        """Test a cached response still returns 304 for its ETag."""
+
+        url = image_detail_url(self.upload())
+        etag = self.client.get(url)["ETag"]
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_query_parameters_are_keyed(self):
+        """Test different query parameters are cached apart."""
+
+        self.upload()
+        self.client.get(IMAGE_URL, {"fields": "id"})
+
+        response = self.client.get(IMAGE_URL, {"fields": "name"})
+
+        self.assertEqual(set(response.data["results"][0]), {"name"})
+
+    @override_settings(ALLOWED_HOSTS=["testserver", "proxy.example.com", "app"])
+    def test_hosts_do_not_share_responses(self):
+        """Test media URLs follow the host and scheme of each request."""
+
+        url = image_detail_url(self.upload())
+        self.client.get(url, HTTP_HOST="app")
+
+        response = self.client.get(url, HTTP_HOST="proxy.example.com", secure=True)
+
+        self.assertTrue(response.data["image"].startswith("https://proxy.example.com/"))
+
+    def test_users_do_not_share_responses(self):
+        """Test one user is never served another user's response."""
+
+        self.upload()
+        self.client.get(IMAGE_URL)
+        other = get_user_model().objects.create_user(
+            email="other@example.com",
+            name="other",
+            password="test1234",
+        )
+        self.client.force_authenticate(other)
+
+        response = self.client.get(IMAGE_URL)
+
+        self.assertEqual(response.data["results"], [])
+
+    def test_writes_invalidate(self):
+        """Test saves and deletes drop the cached responses of the owner."""
+
+        image_id = self.upload()
+        self.client.get(IMAGE_URL)
+        self.client.patch(
+            image_detail_url(image_id), {"description": "new"}, format="multipart"
+        )
+        response = self.client.get(IMAGE_URL)
+        self.assertEqual(response.data["results"][0]["description"], "new")
+
+        url = reverse("image:resized-get", args=[image_id])
+        self.client.get(RESIZED_URL)
+        resized_id = self.client.get(f"{url}?width=20", HTTP_HOST="testserver").data[
+            "id"
+        ]
+        self.assertEqual(len(self.client.get(RESIZED_URL).data["results"]), 1)
+
+        self.client.delete(reverse("image:resized-detail", args=[resized_id]))
+        self.assertEqual(self.client.get(RESIZED_URL).data["results"], [])
+        self.client.delete(image_detail_url(image_id))
+        self.assertEqual(self.client.get(IMAGE_URL).data["results"], [])
+
+    def test_batch_resize_invalidates(self):
+        """Test resized images created in bulk drop cached responses."""
+
+        image_id = self.upload()
+        self.client.get(RESIZED_URL)
+        url = reverse("image:resized-batch", args=[image_id])
+        self.client.post(
+            url,
+            {"sizes": [{"width": 20}, {"width": 10}]},
+            format="json",
+            HTTP_HOST="testserver",
+        )
+
+        response = self.client.get(RESIZED_URL)
+
+        self.assertEqual(len(response.data["results"]), 2)
+
+    def test_errors_are_not_cached(self):
+        """Test a missing object is looked up again."""
+
+        url = image_detail_url(1000)
+        self.client.get(url)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class StampedeTests(SimpleTestCase):
+    """Test a miss is built once."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_concurrent_misses_build_once(self):
+        """Test callers waiting on the lock get the value of the builder."""
+
+        started = threading.Event()
+        release = threading.Event()
+        builds = []
+
+        def build():
+            builds.append(1)
+            started.set()
+            release.wait(5)
+            return "value", True
+
+        results = []
+        builder = threading.Thread(
+            target=lambda: results.append(response_cache.get_or_build("key", build))
+        )
+        builder.start()
+        started.wait(5)
+        with patch.object(response_cache, "POLL_SECONDS", 0.01):
+            waiter = threading.Thread(
+                target=lambda: results.append(response_cache.get_or_build("key", build))
+            )
+            waiter.start()
+            release.set()
+            builder.join()
+            waiter.join()
+
+        self.assertEqual(len(builds), 1)
+        self.assertEqual(sorted(results), [("value", False), ("value", True)])
+
+    def test_evicted_generation_does_not_revive_old_entries(self):
+        """Test a lost generation starts a new one instead of reusing an old
+        value."""
+
+        old = response_cache.response_key(1, "view")
+        cache.delete(response_cache.generation_key(1))
+
+        self.assertNotEqual(response_cache.response_key(1, "view"), old)
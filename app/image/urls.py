@@ -18,7 +18,19 @@ urlpatterns = [
     path(
         "images/resize/<int:pk>/", views.GetResizedAPIView.as_view(), name="resized-get"
     ),
+    path(
+        "images/resize/<int:pk>/batch/",
+        views.BatchResizedAPIView.as_view(),
+        name="resized-batch",
+    ),
+    path(
+        "images/<int:pk>/preset/<str:name>/",
+        views.PresetResizedAPIView.as_view(),
+        name="image-preset",
+    ),
+    path("images/jobs/<int:pk>/", views.ResizeJobAPIView.as_view(), name="job-detail"),
     path("images/resized/", views.ResizedAPIView.as_view(), name="resized-list"),
+    path("images/metrics/", views.MetricsAPIView.as_view(), name="metrics"),
     path(
         "images/resized/<int:pk>/",
         views.DetailResizedAPIView.as_view(),
@@ -4,35 +4,241 @@ Views for the image API.
 
 import time
 import base64
+import hashlib
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
 
 from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiParameter
 from drf_spectacular.types import OpenApiTypes
 
 from rest_framework import status, generics, viewsets, mixins
 from rest_framework.views import APIView
-from rest_framework.parsers import MultiPartParser, FormParser
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
-from rest_framework_simplejwt.authentication import JWTAuthentication
-
-import PIL.Image
 
-from core.models import Image, Resized
+from core.models import Image, Resized, ResizeJob
+from core.authentication import CachedJWTAuthentication
+from core.uploadhandlers import StreamingImageUploadHandler
 from . import serializers
-from core.utils.functions import validate_new_size, cast_new_size, resize_image
+from .pagination import IdCursorPagination
+from core.utils.functions import (
+    validate_new_size,
+    cast_new_size,
+    resize_image,
+    resize_image_batch,
+    clamp_quality,
+    calculate_new_size,
+    derivative_cache_key,
+    get_cached_resized,
+    evict_cached_resized,
+    rejected_response,
+    enqueue_resize,
+    probe_image,
+    render_resized,
+    ephemeral_response,
+    save_resized,
+    get_digest,
+    find_duplicate_image,
+    negotiate_format,
+    validate_max_bytes,
+    build_pyramid,
+    get_resize_source,
+    generate_presets,
+    enqueue_presets,
+)
+from core.utils.exceptions import ResizeRejected, BudgetExceeded
+from core.utils.admission import check_pixels, get_pixel_budget
+from core.utils.executor import get_executor
+from core.utils.response_cache import get_or_build, response_key
+from core.utils.async_views import as_async_view
+
+
+class AsyncViewMixin:
+    """Serve the view as a coroutine when running under ASGI."""
+
+    @classmethod
+    def as_view(cls, *args, **kwargs):
+        return as_async_view(super().as_view(*args, **kwargs))
+
+
+class ResizeRejectedMixin:
+    """Turn rejected resize requests into responses with Retry-After."""
+
+    def handle_exception(self, exc):
+        if isinstance(exc, ResizeRejected):
+            return rejected_response(exc)
+        return super().handle_exception(exc)
+
+
+class ImageAcceptNegotiation(DefaultContentNegotiation):
+    """Fall back to the default renderer when the Accept header only names
+    image types, which select the output format instead."""
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        try:
+            return super().select_renderer(request, renderers, format_suffix)
+        except NotAcceptable:
+            return (renderers[0], renderers[0].media_type)
+
+
+class FormatNegotiationMixin:
+    """Choose the output format of a resize from the output_format parameter
+    or the Accept header."""
+
+    content_negotiation_class = ImageAcceptNegotiation
+
+    def negotiate_format(self, source_format, requested=None):
+        return negotiate_format(
+            requested or self.request.query_params.get("output_format"),
+            self.request.META.get("HTTP_ACCEPT", ""),
+            source_format,
+        )
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        patch_vary_headers(response, ("Accept",))
+        return response
+
+
+class StreamingUploadMixin:
+    """Stream image uploads to disk while hashing and probing them."""
+
+    def initialize_request(self, request, *args, **kwargs):
+        request.upload_handlers = [StreamingImageUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
+
+
+class ConditionalGetMixin:
+    """Answer conditional GETs from the versions of the rows a request would
+    return, with 304 before any of them is loaded or serialized. Lists only
+    get an ETag: deleting a row does not advance the modification time of the
+    rows left, so a Last-Modified would not change on deletes."""
+
+    version_fields = ["updated_at"]
+
+    def get_validators(self):
+        """Return the strong ETag and, for a single row, the last modification
+        time of the rows of the request, read with a single aggregate query."""
+
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        detail = lookup_url_kwarg in self.kwargs
+        if detail:
+            queryset = queryset.filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+        versions = queryset.aggregate(
+            count=Count("id"),
+            **{
+                f"version_{index}": Max(field)
+                for index, field in enumerate(self.version_fields)
+            },
+        )
+        stamps = [
+            versions[f"version_{index}"] for index in range(len(self.version_fields))
+        ]
+
+        parts = [
+            self.request.get_full_path(),
+            self.request.accepted_media_type,
+            self.request.user.name,
+            versions["count"],
+            *stamps,
+        ]
+        etag = quote_etag(hashlib.sha256(repr(parts).encode()).hexdigest())
+        stamps = [stamp for stamp in stamps if stamp]
+        last_modified = int(max(stamps).timestamp()) if detail and stamps else None
+
+        return etag, last_modified
+
+    def get(self, request, *args, **kwargs):
+        etag, last_modified = self.get_validators()
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response["ETag"] = etag
+            if last_modified:
+                response["Last-Modified"] = http_date(last_modified)
+        return response
+
+
+class ResponseCacheMixin:
+    """Serve GETs from the per-user response cache, answering conditional
+    requests from the validators stored with each response."""
+
+    def get(self, request, *args, **kwargs):
+        # Responses hold absolute media URLs built from the scheme and host.
+        key = response_key(
+            request.user.id,
+            type(self).__name__,
+            request.scheme,
+            request.get_host(),
+            request.get_full_path(),
+            request.accepted_media_type,
+        )
+        response = None
+
+        def build():
+            nonlocal response
+            response = super(ResponseCacheMixin, self).get(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return None, False
+            return {
+                "data": response.data,
+                "etag": response.get("ETag"),
+                "last_modified": response.get("Last-Modified"),
+            }, True
+
+        entry, cached = get_or_build(key, build)
+        if not cached:
+            return response
+
+        headers = {
+            name: value
+            for name, value in (
+                ("ETag", entry["etag"]),
+                ("Last-Modified", entry["last_modified"]),
+            )
+            if value
+        }
+        conditional = get_conditional_response(
+            request,
+            etag=entry["etag"],
+            last_modified=parse_http_date_safe(entry["last_modified"] or ""),
+        )
+        if conditional is not None:
+            for name, value in headers.items():
+                conditional[name] = value
+            return conditional
+        return Response(entry["data"], headers=headers)
 
 
 @extend_schema(tags=["images"])
-class DetailImageAPIView(generics.RetrieveUpdateDestroyAPIView):
+class DetailImageAPIView(
+    AsyncViewMixin,
+    ResponseCacheMixin,
+    ConditionalGetMixin,
+    generics.RetrieveUpdateDestroyAPIView,
+):
     queryset = Image.objects.all()
     serializer_class = serializers.UpdateImageSerializer
     parser_classes = [MultiPartParser, FormParser]
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
     allowed_methods = ["GET", "PATCH", "DELETE"]
 
     def get_queryset(self):
-        return Image.objects.filter(user=self.request.user)
+        return Image.objects.filter(user=self.request.user).select_related("user")
 
     def get_serializer_class(self):
         print(self)
@@ -41,12 +247,30 @@ class DetailImageAPIView(generics.RetrieveUpdateDestroyAPIView):
         return self.serializer_class
 
 
+FIELDS_PARAMETER = OpenApiParameter(
+    name="fields",
+    type=OpenApiTypes.STR,
+    location=OpenApiParameter.QUERY,
+    required=False,
+    description="Comma separated fields to return.",
+)
+
+
 @extend_schema(tags=["images"])
-class ImageAPIView(generics.ListCreateAPIView):
+@extend_schema_view(get=extend_schema(parameters=[FIELDS_PARAMETER]))
+class ImageAPIView(
+    AsyncViewMixin,
+    StreamingUploadMixin,
+    ResizeRejectedMixin,
+    ResponseCacheMixin,
+    ConditionalGetMixin,
+    generics.ListCreateAPIView,
+):
     queryset = Image.objects.all()
     serializer_class = serializers.ListImageSerializer
+    pagination_class = IdCursorPagination
     parser_classes = [MultiPartParser, FormParser]
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
     allowed_methods = ["GET", "POST"]
 
@@ -60,16 +284,29 @@ class ImageAPIView(generics.ListCreateAPIView):
         return self.serializer_class
 
     def perform_create(self, serializer):
-        serializer.validated_data["name"] = serializer.validated_data["image"].name
-        serializer.validated_data["size"] = serializer.validated_data["image"].size
-        img = PIL.Image.open(serializer.validated_data["image"])
+        upload = serializer.validated_data["image"]
+        serializer.validated_data["name"] = upload.name
+        serializer.validated_data["size"] = upload.size
         (
             serializer.validated_data["width"],
             serializer.validated_data["height"],
-        ) = img.size
-        serializer.validated_data["format"] = img.format
-        serializer.save(user=self.request.user)
-        img.close()
+            serializer.validated_data["format"],
+        ) = probe_image(upload)
+        check_pixels(
+            serializer.validated_data["width"], serializer.validated_data["height"]
+        )
+        serializer.validated_data["digest"] = get_digest(upload)
+
+        duplicate = find_duplicate_image(
+            self.request.user, serializer.validated_data["digest"]
+        )
+        if duplicate:
+            serializer.validated_data["image"] = duplicate.image.name
+
+        image = serializer.save(user=self.request.user)
+        build_pyramid(image, duplicate)
+        if settings.RESIZE_PRESETS_EAGER:
+            enqueue_presets(image)
 
     def create(self, request, *args, **kwargs):
         response = super().create(request, *args, **kwargs)
@@ -103,25 +340,50 @@ class ImageAPIView(generics.ListCreateAPIView):
             location=OpenApiParameter.QUERY,
             required=False,
         ),
+        OpenApiParameter(
+            name="async",
+            type=OpenApiTypes.BOOL,
+            location=OpenApiParameter.QUERY,
+            required=False,
+        ),
+        OpenApiParameter(
+            name="output_format",
+            type=OpenApiTypes.STR,
+            location=OpenApiParameter.QUERY,
+            required=False,
+        ),
+        OpenApiParameter(
+            name="max_bytes",
+            type=OpenApiTypes.INT,
+            location=OpenApiParameter.QUERY,
+            required=False,
+        ),
     ],
 )
-class CreateImageResizedAPIView(generics.CreateAPIView):
+class CreateImageResizedAPIView(
+    AsyncViewMixin,
+    StreamingUploadMixin,
+    FormatNegotiationMixin,
+    ResizeRejectedMixin,
+    generics.CreateAPIView,
+):
     queryset = Image.objects.all()
     serializer_class = serializers.CreateImageSerializer
     parser_classes = [MultiPartParser, FormParser]
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
     allowed_methods = ["POST"]
 
     def get_queryset(self):
         return Image.objects.filter(user=self.request.user)
 
-    def perform_create(self, serializer):
+    def create(self, request, *args, **kwargs):
         parameters = {}
         parameters["quality"] = self.request.query_params.get("quality", "75")
         parameters["percent"] = self.request.query_params.get("percent", None)
         parameters["width"] = self.request.query_params.get("width", None)
         parameters["height"] = self.request.query_params.get("height", None)
+        parameters["max_bytes"] = self.request.query_params.get("max_bytes", None)
 
         error_response = validate_new_size(parameters)
         if error_response:
@@ -131,81 +393,142 @@ class CreateImageResizedAPIView(generics.CreateAPIView):
         if isinstance(int_parameters, Response):
             return int_parameters
 
-        serializer.validated_data["name"] = serializer.validated_data["image"].name
-        serializer.validated_data["size"] = serializer.validated_data["image"].size
-        img = PIL.Image.open(serializer.validated_data["image"])
-        (
-            serializer.validated_data["width"],
-            serializer.validated_data["height"],
-        ) = img.size
-        serializer.validated_data["format"] = img.format
-        serializer.save(user=self.request.user)
-
-        if int_parameters["quality"] > 95:
-            proper_quality = 95
-        else:
-            proper_quality = int_parameters["quality"]
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
 
-        if int_parameters["percent"]:
-            new_width = int(
-                serializer.validated_data["width"] * (int_parameters["percent"] / 100)
-            )
-            new_height = int(
-                serializer.validated_data["height"] * (int_parameters["percent"] / 100)
-            )
+        upload = serializer.validated_data["image"]
+        width, height, format = probe_image(upload)
+        output_format = self.negotiate_format(format)
+        if isinstance(output_format, Response):
+            return output_format
 
-        if int_parameters["width"] and not int_parameters["height"]:
-            new_width = int(int_parameters["width"])
-            new_height = int(
-                serializer.validated_data["height"]
-                * (new_width / serializer.validated_data["width"])
-            )
+        max_bytes = int_parameters["max_bytes"]
+        error_response = validate_max_bytes(max_bytes, output_format)
+        if error_response:
+            return error_response
 
-        if int_parameters["height"] and not int_parameters["width"]:
-            new_height = int(int_parameters["height"])
-            new_width = int(
-                serializer.validated_data["width"]
-                * (new_height / serializer.validated_data["height"])
+        proper_quality = clamp_quality(int_parameters["quality"])
+        new_width, new_height = calculate_new_size(width, height, int_parameters)
+        check_pixels(width, height, [(new_width, new_height)])
+
+        image_data = {
+            "user": self.request.user,
+            "name": upload.name,
+            "size": upload.size,
+            "width": width,
+            "height": height,
+            "format": format,
+            "digest": get_digest(upload),
+        }
+
+        duplicate = find_duplicate_image(self.request.user, image_data["digest"])
+        if duplicate:
+            image_data["image"] = duplicate.image.name
+
+        run_async = self.request.query_params.get("async") == "1"
+
+        resized = None
+        if duplicate and not run_async:
+            resized = get_cached_resized(
+                derivative_cache_key(
+                    duplicate,
+                    new_width,
+                    new_height,
+                    proper_quality,
+                    output_format,
+                    max_bytes,
+                )
             )
 
-        if int_parameters["width"] and int_parameters["height"]:
-            new_width = int(int_parameters["width"])
-            new_height = int(int_parameters["height"])
-
-        resized = resize_image(
-            serializer.validated_data["image"],
-            int_parameters["quality"],
-            proper_quality,
-            new_width,
-            new_height,
-            serializer.validated_data["format"],
-            self.request.user,
-        )
-
-        self.resized_id = resized.id
-
-        img.close()
-
-    def create(self, request, *args, **kwargs):
-        response = super().create(request, *args, **kwargs)
-
-        resized_image = Resized.objects.get(id=self.resized_id)
-        resized_image.image = Image.objects.get(id=response.data["id"])
-        resized_image.save()
+        if not run_async and not resized:
+            # The upload is decoded once, in the executor, before anything is
+            # stored, so a busy executor leaves no rows or files behind.
+            try:
+                data, quality = render_resized(
+                    upload,
+                    new_width,
+                    new_height,
+                    output_format,
+                    proper_quality,
+                    max_bytes,
+                )
+            except BudgetExceeded:
+                if settings.RESIZE_BUDGET_OVERFLOW != "queue":
+                    raise
+                run_async = True
+
+        if run_async:
+            with transaction.atomic():
+                image = serializer.save(**image_data)
+                job = enqueue_resize(
+                    image,
+                    int_parameters["quality"],
+                    new_width,
+                    new_height,
+                    output_format,
+                    derivative_cache_key(
+                        image,
+                        new_width,
+                        new_height,
+                        proper_quality,
+                        output_format,
+                        max_bytes,
+                    ),
+                    self.request.user,
+                    max_bytes,
+                )
+            build_pyramid(image, duplicate)
+
+            response_data = serializer.data
+            response_data["name"] = image.name
+            response_data["job_id"] = job.id
+            response_data["status"] = job.status
+
+            return Response(response_data, status=status.HTTP_202_ACCEPTED)
+
+        if resized:
+            image = serializer.save(**image_data)
+        else:
+            with transaction.atomic():
+                image = serializer.save(**image_data)
+                resized = save_resized(
+                    data,
+                    upload.name,
+                    quality if max_bytes else int_parameters["quality"],
+                    new_width,
+                    new_height,
+                    output_format,
+                    self.request.user,
+                    image,
+                    derivative_cache_key(
+                        image,
+                        new_width,
+                        new_height,
+                        proper_quality,
+                        output_format,
+                        max_bytes,
+                    ),
+                )
+        build_pyramid(image, duplicate)
 
         host = f"http://{request.META['HTTP_HOST']}/static/media/"
-        response.data["name"] = resized_image.image.name
-        response.data["resized_id"] = resized_image.id
-        response.data["resized_image"] = f"{host}{resized_image.resized_image.name}"
+        response_data = serializer.data
+        response_data["name"] = image.name
+        response_data["resized_id"] = resized.id
+        response_data["resized_quality"] = resized.quality
+        response_data["resized_size"] = resized.size
+        response_data["resized_image"] = f"{host}{resized.resized_image.name}"
 
-        return response
+        return Response(response_data, status=status.HTTP_201_CREATED)
 
 
 @extend_schema(tags=["images"])
-class GetResizedAPIView(APIView):
+class GetResizedAPIView(
+    AsyncViewMixin, FormatNegotiationMixin, ResizeRejectedMixin, APIView
+):
     serializer_class = serializers.DetailResizedSerializer
     parser_classes = [MultiPartParser, FormParser]
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     @extend_schema(
@@ -234,6 +557,30 @@ class GetResizedAPIView(APIView):
                 location=OpenApiParameter.QUERY,
                 required=False,
             ),
+            OpenApiParameter(
+                name="async",
+                type=OpenApiTypes.BOOL,
+                location=OpenApiParameter.QUERY,
+                required=False,
+            ),
+            OpenApiParameter(
+                name="output_format",
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                required=False,
+            ),
+            OpenApiParameter(
+                name="max_bytes",
+                type=OpenApiTypes.INT,
+                location=OpenApiParameter.QUERY,
+                required=False,
+            ),
+            OpenApiParameter(
+                name="ephemeral",
+                type=OpenApiTypes.BOOL,
+                location=OpenApiParameter.QUERY,
+                required=False,
+            ),
         ]
     )
     def get(self, request, pk):
@@ -243,6 +590,7 @@ class GetResizedAPIView(APIView):
             parameters["percent"] = self.request.query_params.get("percent", None)
             parameters["width"] = self.request.query_params.get("width", None)
             parameters["height"] = self.request.query_params.get("height", None)
+            parameters["max_bytes"] = self.request.query_params.get("max_bytes", None)
 
             error_response = validate_new_size(parameters)
             if error_response:
@@ -252,77 +600,277 @@ class GetResizedAPIView(APIView):
             if isinstance(int_parameters, Response):
                 return int_parameters
 
-            image = Image.objects.get(id=pk)
-
-            if int_parameters["quality"] > 95:
-                proper_quality = 95
-            else:
-                proper_quality = int_parameters["quality"]
-
-            if int_parameters["percent"]:
-                new_width = int(image.width * (int_parameters["percent"] / 100))
-                new_height = int(image.height * (int_parameters["percent"] / 100))
-
-            if int_parameters["width"] and not int_parameters["height"]:
-                new_width = int(int_parameters["width"])
-                new_height = int(image.height * (new_width / image.width))
-
-            if int_parameters["height"] and not int_parameters["width"]:
-                new_height = int(int_parameters["height"])
-                new_width = int(image.width * (new_height / image.height))
-
-            if int_parameters["width"] and int_parameters["height"]:
-                new_width = int(int_parameters["width"])
-                new_height = int(int_parameters["height"])
-
-            resized = resize_image(
-                image.image,
-                int_parameters["quality"],
-                proper_quality,
-                new_width,
-                new_height,
-                image.format,
-                image.user,
-                image,
+            image = Image.objects.get(id=pk, user=request.user)
+
+            output_format = self.negotiate_format(image.format)
+            if isinstance(output_format, Response):
+                return output_format
+
+            max_bytes = int_parameters["max_bytes"]
+            error_response = validate_max_bytes(max_bytes, output_format)
+            if error_response:
+                return error_response
+
+            proper_quality = clamp_quality(int_parameters["quality"])
+            new_width, new_height = calculate_new_size(
+                image.width, image.height, int_parameters
+            )
+            check_pixels(image.width, image.height, [(new_width, new_height)])
+
+            if request.query_params.get("ephemeral") == "1":
+                data, _ = render_resized(
+                    get_resize_source(image, new_width, new_height),
+                    new_width,
+                    new_height,
+                    output_format,
+                    proper_quality,
+                    max_bytes,
+                )
+                return ephemeral_response(data, output_format)
+
+            cache_key = derivative_cache_key(
+                image, new_width, new_height, proper_quality, output_format, max_bytes
+            )
+            resized = get_cached_resized(cache_key)
+
+            run_async = request.query_params.get("async") == "1"
+
+            if not resized and not run_async:
+                try:
+                    resized = resize_image(
+                        get_resize_source(image, new_width, new_height),
+                        int_parameters["quality"],
+                        proper_quality,
+                        new_width,
+                        new_height,
+                        output_format,
+                        image.user,
+                        image,
+                        cache_key,
+                        max_bytes,
+                    )
+                except BudgetExceeded:
+                    if settings.RESIZE_BUDGET_OVERFLOW != "queue":
+                        raise
+                    run_async = True
+                else:
+                    evict_cached_resized(image)
+
+            if not resized:
+                job = enqueue_resize(
+                    image,
+                    int_parameters["quality"],
+                    new_width,
+                    new_height,
+                    output_format,
+                    cache_key,
+                    image.user,
+                    max_bytes,
+                )
+                return Response(
+                    {"job_id": job.id, "status": job.status},
+                    status=status.HTTP_202_ACCEPTED,
+                )
+
+        except Image.DoesNotExist:
+            return Response(
+                {"error": "Image does not exist."}, status=status.HTTP_404_NOT_FOUND
+            )
+        host = f"http://{request.META['HTTP_HOST']}/static/media/"
+        return Response(
+            {
+                "id": resized.id,
+                "quality": resized.quality,
+                "size": resized.size,
+                "resized_image": f"{host}{resized.resized_image.name}",
+            }
+        )
+
+
+@extend_schema(tags=["images"], request=serializers.BatchResizeSerializer)
+class BatchResizedAPIView(
+    AsyncViewMixin, FormatNegotiationMixin, ResizeRejectedMixin, APIView
+):
+    """Resize one image to many sizes with a single decode."""
+
+    serializer_class = serializers.BatchResizeSerializer
+    parser_classes = [JSONParser]
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            image = Image.objects.select_related("user").get(id=pk, user=request.user)
+        except Image.DoesNotExist:
+            return Response(
+                {"error": "Image does not exist."}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        output_format = self.negotiate_format(
+            image.format, serializer.validated_data.get("format")
+        )
+        if isinstance(output_format, Response):
+            return output_format
+
+        if any(size.get("max_bytes") for size in serializer.validated_data["sizes"]):
+            error_response = validate_max_bytes(True, output_format)
+            if error_response:
+                return error_response
+
+        sizes = []
+        for parameters in serializer.validated_data["sizes"]:
+            proper_quality = clamp_quality(parameters["quality"])
+            new_width, new_height = calculate_new_size(
+                image.width,
+                image.height,
+                {
+                    "percent": parameters.get("percent"),
+                    "width": parameters.get("width"),
+                    "height": parameters.get("height"),
+                },
+            )
+            sizes.append(
+                {
+                    "quality": parameters["quality"],
+                    "proper_quality": proper_quality,
+                    "width": new_width,
+                    "height": new_height,
+                    "max_bytes": parameters.get("max_bytes"),
+                    "cache_key": derivative_cache_key(
+                        image,
+                        new_width,
+                        new_height,
+                        proper_quality,
+                        output_format,
+                        parameters.get("max_bytes"),
+                    ),
+                }
+            )
+
+        resized_images = resize_image_batch(image, sizes, output_format, image.user)
+
+        host = f"http://{request.META['HTTP_HOST']}/static/media/"
+        return Response(
+            {
+                "id": image.id,
+                "resized": [
+                    {
+                        "id": resized.id,
+                        "resolution": f"{resized.width}x{resized.height}px",
+                        "quality": resized.quality,
+                        "size": resized.size,
+                        "format": resized.format,
+                        "resized_image": f"{host}{resized.resized_image.name}",
+                    }
+                    for resized in resized_images
+                ],
+            }
+        )
+
+
+@extend_schema(tags=["images"])
+class PresetResizedAPIView(AsyncViewMixin, ResizeRejectedMixin, APIView):
+    """Serve the derivative of a named preset, creating it if the background
+    job has not run yet."""
+
+    serializer_class = None
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk, name):
+        if name not in settings.RESIZE_PRESETS:
+            return Response(
+                {"error": "Preset does not exist."}, status=status.HTTP_404_NOT_FOUND
             )
 
+        try:
+            image = Image.objects.select_related("user").get(id=pk, user=request.user)
         except Image.DoesNotExist:
             return Response(
                 {"error": "Image does not exist."}, status=status.HTTP_404_NOT_FOUND
             )
+
+        resized = generate_presets(image, [name])[name]
+
         host = f"http://{request.META['HTTP_HOST']}/static/media/"
         return Response(
             {
                 "id": resized.id,
+                "preset": name,
+                "resolution": f"{resized.width}x{resized.height}px",
+                "format": resized.format,
                 "resized_image": f"{host}{resized.resized_image.name}",
             }
         )
 
 
+@extend_schema(tags=["images"])
+class ResizeJobAPIView(generics.RetrieveAPIView):
+    """Report the status of a queued resize."""
+
+    queryset = ResizeJob.objects.all()
+    serializer_class = serializers.ResizeJobSerializer
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    allowed_methods = ["GET"]
+
+    def get_queryset(self):
+        return ResizeJob.objects.filter(user=self.request.user)
+
+
+@extend_schema(tags=["metrics"])
+class MetricsAPIView(APIView):
+    """Report the state of the resize machinery of this worker process."""
+
+    serializer_class = None
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(
+            {
+                "executor": get_executor().stats(),
+                "decoded_cache": get_executor().cache_stats(),
+                "shared_cache": get_executor().shared_cache_stats(),
+                "pixel_budget": get_pixel_budget().stats(),
+            }
+        )
+
+
 @extend_schema(tags=["resized_images"])
-class DetailResizedAPIView(generics.RetrieveDestroyAPIView):
+class DetailResizedAPIView(
+    ResponseCacheMixin, ConditionalGetMixin, generics.RetrieveDestroyAPIView
+):
     queryset = Resized.objects.all()
     serializer_class = serializers.DetailResizedSerializer
+    version_fields = ["updated_at", "image__updated_at"]
     parser_classes = [FormParser]
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
     allowed_methods = ["GET", "DELETE"]
 
     def get_queryset(self):
-        return Resized.objects.filter(user=self.request.user)
+        return Resized.objects.filter(user=self.request.user).select_related(
+            "image", "user"
+        )
 
 
 @extend_schema(tags=["resized_images"])
-class ResizedAPIView(generics.ListAPIView):
+@extend_schema_view(get=extend_schema(parameters=[FIELDS_PARAMETER]))
+class ResizedAPIView(ResponseCacheMixin, ConditionalGetMixin, generics.ListAPIView):
     queryset = Resized.objects.all()
     serializer_class = serializers.ListResizedSerializer
+    pagination_class = IdCursorPagination
     parser_classes = [FormParser]
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
     allowed_methods = ["GET"]
 
     def get_queryset(self):
-        return Resized.objects.filter(user=self.request.user)
+        return Resized.objects.filter(user=self.request.user).select_related("image")
 
 
 @extend_schema(tags=["expiring_links"])
@@ -344,7 +892,7 @@ class LinkViewSet(
     """View for managing expiring_links."""
 
     serializer_class = serializers.LinkSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
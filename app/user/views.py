@@ -10,10 +10,10 @@ from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 
 from rest_framework_simplejwt.views import TokenObtainPairView
-from rest_framework_simplejwt.authentication import JWTAuthentication
 
 from user.serializers import UserSerializer, TokenObtainPairSerializer
 
+from core.authentication import CachedJWTAuthentication
 from core.utils.functions import set_cookies, delete_cookies
 
 from drf_spectacular.utils import extend_schema
@@ -33,7 +33,7 @@ class ManageUserView(RetrieveUpdateDestroyAPIView):
 
     serializer_class = UserSerializer
     parser_classes = [FormParser]
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
     allowed_methods = ["GET", "PATCH", "DELETE"]
 
@@ -80,7 +80,7 @@ class LogOutView(APIView):
     """Delete httponly cookies with jwt tokens."""
 
     serializer_class = None
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def post(self, request, *args, **kwargs):
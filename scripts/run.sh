@@ -6,4 +6,8 @@ python manage.py wait_for_db
 python manage.py collectstatic --noinput
 python manage.py migrate
 
-uwsgi --socket :9000 --workers 4 --master --enable-threads --module app.wsgi
+if [ "$SERVER_MODE" = "asgi" ]; then
+    uvicorn app.asgi:application --host 0.0.0.0 --port 9000 --workers "${RESIZE_WEB_WORKERS:-4}"
+else
+    uwsgi --socket :9000 --workers "${RESIZE_WEB_WORKERS:-4}" --master --enable-threads --module app.wsgi
+fi